@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class HotelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotel'
+
+    def ready(self):
+        # Signal receivers that keep the cached "user is active" state current
+        from . import authentication  # noqa: F401
@@ -0,0 +1,207 @@
+"""
+Async versions of the read-heavy endpoints, for deployments on the ASGI
+entry point (hotel_booking/asgi.py). They use the async ORM and cache APIs
+so one worker can hold many slow requests open at once, and mirror the
+responses of their DRF counterparts in views.py, filters and orderings
+included. Pagination is forward-only keyset pagination on the ordering,
+tied by id.
+"""
+import base64
+import functools
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, ValidationError as APIValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from .authentication import ais_active_user
+from .cache import (
+    BOOKINGS_VERSION_KEY, CATALOG_VERSION_KEY, acached_catalog, aget_versions, hotel_bookings_key, user_bookings_key,
+)
+from .conditional import set_validators, validators
+from .filters import HotelFilter
+from .models import Hotel, Room, Booking
+from .pagination import CreatedAtCursorPagination, keyset_after, position_of, unique_ordering
+from .serializers import HotelSerializer, RoomSerializer, BookingSerializer
+from .views import ApprovedHotelsView, approved_catalog, catalog_version_keys, stay_dates, stay_validator_state
+
+CURSOR_PARAM = 'cursor'
+
+
+def respond(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def async_api_view(role=None, version_keys=None, validator_state=None):
+    """
+    Authenticate the bearer token the same way the DRF views do (claims
+    plus the cached active-user check), optionally require a role, and turn DRF exceptions
+    into the usual `{"detail": ...}` responses. With `version_keys(request,
+    **kwargs)`, and `validator_state(request, **kwargs)` where the view has
+    one, requests are validated like ConditionalGetMixin does.
+    """
+    def decorator(view):
+        @require_GET
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                authenticated = JWTStatelessUserAuthentication().authenticate(request)
+                if authenticated is None:
+                    return respond({'detail': 'Authentication credentials were not provided.'}, status=401)
+                request.user = authenticated[0]
+                if not await ais_active_user(request.user.pk):
+                    return respond({'detail': 'User is inactive or no longer exists'}, status=401)
+                if role and request.user.role != role:
+                    return respond({'detail': 'You do not have permission to perform this action.'}, status=403)
+                keys = version_keys(request, **kwargs) if version_keys else None
+                if not keys:
+                    return await view(request, *args, **kwargs)
+                state = validator_state(request, **kwargs) if validator_state else ((), 0)
+                etag, last_modified = validators(request, keys, await aget_versions(keys), *state)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                if response.status_code in (200, 304):
+                    set_validators(response, etag, last_modified)
+                return response
+            except APIException as exc:
+                detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+                return respond(detail, status=exc.status_code)
+        return wrapper
+    return decorator
+
+
+def encode_cursor(obj, ordering):
+    position = json.dumps(position_of(obj, ordering))
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return position if isinstance(position, list) and len(position) == len(ordering) else None
+
+
+def requested_ordering(request, fields, default):
+    # Like OrderingFilter: unknown fields are dropped, and with none left the default applies
+    names = [name.strip() for name in request.GET.get(api_settings.ORDERING_PARAM, '').split(',')]
+    ordering = tuple(name for name in names if name.lstrip('-') in fields)
+    return ordering or default
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get(CreatedAtCursorPagination.page_size_query_param, 0))
+    except ValueError:
+        size = 0
+    if size <= 0:
+        return settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+    return min(size, CreatedAtCursorPagination.max_page_size)
+
+
+async def paginate(request, queryset, ordering=CreatedAtCursorPagination.ordering):
+    """
+    One page of `queryset` in `ordering` (newest first by default), plus the
+    URL of the next page. Uses the same keyset and indexes as
+    CreatedAtCursorPagination.
+    """
+    ordering = unique_ordering(ordering)
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor:
+        position = decode_cursor(cursor, ordering)
+        if position is None:
+            return None, None
+        try:
+            queryset = queryset.filter(keyset_after(ordering, position))
+        except (ValueError, ValidationError):
+            return None, None
+    size = page_size(request)
+    rows = [obj async for obj in queryset.order_by(*ordering)[:size + 1]]
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_url = replace_query_param(request.build_absolute_uri(), CURSOR_PARAM, encode_cursor(rows[-1], ordering))
+    return rows, next_url
+
+
+async def paginated_response(request, queryset, serializer_class):
+    rows, next_url = await paginate(request, queryset)
+    if rows is None:
+        return respond({'detail': 'Invalid cursor'}, status=404)
+    data = serializer_class(rows, many=True, context={'request': request}).data
+    return respond({'next': next_url, 'previous': None, 'results': data})
+
+
+def catalog_keys(request, **kwargs):
+    return catalog_version_keys(request.GET)
+
+
+def available_room_keys(request, **kwargs):
+    hotel_id = request.GET.get('hotel_id', '')
+    return [CATALOG_VERSION_KEY, hotel_bookings_key(int(hotel_id))] if hotel_id.isdigit() else None
+
+
+def available_room_state(request, **kwargs):
+    return stay_validator_state(request.GET)
+
+
+def booking_keys(request, **kwargs):
+    return [BOOKINGS_VERSION_KEY] if request.user.is_staff else [user_bookings_key(request.user.pk)]
+
+
+@async_api_view(version_keys=catalog_keys)
+async def approved_hotels(request):
+    # The filters and orderings of ApprovedHotelsView
+    filterset = HotelFilter(request.GET, queryset=approved_catalog(), request=request)
+    if not filterset.is_valid():
+        raise APIValidationError(filterset.errors)
+    ordering = requested_ordering(request, ApprovedHotelsView.ordering_fields, ApprovedHotelsView.ordering)
+
+    async def build_page():
+        rows, next_url = await paginate(request, filterset.qs, ordering)
+        if rows is None:
+            return None
+        return {'next': next_url, 'previous': None, 'results': HotelSerializer(rows, many=True).data}
+
+    data = await acached_catalog(
+        f'async-approved:{request.build_absolute_uri()}', build_page, catalog_version_keys(request.GET),
+    )
+    if data is None:
+        return respond({'detail': 'Invalid cursor'}, status=404)
+    return respond(data)
+
+
+@async_api_view(role='hotel_admin', version_keys=catalog_keys)
+async def approved_hotel_detail(request, pk):
+    async def build():
+        hotel = await Hotel.objects.filter(is_approved=True, is_declined=False, pk=pk).afirst()
+        return None if hotel is None else HotelSerializer(hotel).data
+
+    data = await acached_catalog(f'hotel:{pk}', build)
+    if data is None:
+        return respond({'detail': 'No Hotel matches the given query.'}, status=404)
+    return respond(data)
+
+
+@async_api_view(version_keys=available_room_keys, validator_state=available_room_state)
+async def available_rooms(request):
+    check_in, check_out = stay_dates(request.GET)
+    queryset = Room.objects.filter(hotel_id=request.GET.get('hotel_id')).available_between(check_in, check_out)
+    return await paginated_response(request, queryset, RoomSerializer)
+
+
+@async_api_view(version_keys=booking_keys)
+async def bookings(request):
+    queryset = Booking.objects.all()
+    if not request.user.is_staff:
+        queryset = queryset.filter(user_id=request.user.pk)
+    return await paginated_response(request, queryset, BookingSerializer)
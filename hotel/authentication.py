@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from .models import User
+
+
+class TokenPrincipal(TokenUser):
+    """
+    Request user built from the claims `User.tokens()` puts in the access
+    token, so authenticating a request costs no query. The User row is loaded,
+    once per request, only when a view reads `.user` or an attribute the
+    token doesn't carry.
+    """
+
+    @cached_property
+    def user(self):
+        return User.objects.get(pk=self.pk)
+
+    def _claim(self, name):
+        # Tokens issued before these claims existed fall back to the database
+        if name in self.token:
+            return self.token[name]
+        return getattr(self.user, name)
+
+    @cached_property
+    def role(self):
+        return self._claim('role')
+
+    @cached_property
+    def email(self):
+        return self._claim('email')
+
+    @cached_property
+    def is_verified(self):
+        return self._claim('is_verified')
+
+    @cached_property
+    def is_staff(self):
+        return self._claim('is_staff')
+
+    @property
+    def is_client(self):
+        return self.role == 'client'
+
+    @property
+    def is_hotel_admin(self):
+        return self.role == 'hotel_admin'
+
+    @property
+    def is_system_admin(self):
+        return self.role == 'system_admin'
+
+    def __str__(self):
+        return self.email
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or attr == 'token':
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.user, attr)
+
+
+def get_user_instance(user):
+    """
+    The User model instance behind `request.user`, whichever way it was authenticated.
+    """
+    if isinstance(user, TokenPrincipal):
+        return user.user
+    return user
+
+
+def auth_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def active_user_key(user_id):
+    return f'auth:active:{user_id}'
+
+
+def active_user_ttl():
+    return getattr(settings, 'ACTIVE_USER_CACHE_TTL', 60)
+
+
+def is_active_user(user_id):
+    """
+    Whether the user still exists and is active. Cached for a short while,
+    and updated as soon as a user is saved or deleted.
+    """
+    active = auth_cache().get(active_user_key(user_id))
+    if active is None:
+        active = User.objects.filter(pk=user_id, is_active=True).exists()
+        auth_cache().set(active_user_key(user_id), active, active_user_ttl())
+    return active
+
+
+async def ais_active_user(user_id):
+    active = await auth_cache().aget(active_user_key(user_id))
+    if active is None:
+        active = await User.objects.filter(pk=user_id, is_active=True).aexists()
+        await auth_cache().aset(active_user_key(user_id), active, active_user_ttl())
+    return active
+
+
+@receiver(post_save, sender=User)
+def remember_user_state(sender, instance, **kwargs):
+    # Rows changed with QuerySet.update() are picked up when the entry expires
+    auth_cache().set(active_user_key(instance.pk), instance.is_active, active_user_ttl())
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    auth_cache().set(active_user_key(instance.pk), False, active_user_ttl())
+
+
+class ActiveTokenAuthentication(JWTStatelessUserAuthentication):
+    """
+    Stateless JWT authentication that still refuses tokens of users who were
+    deactivated or deleted, as simplejwt's per-request user load would,
+    without a query on every request (see is_active_user).
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if not is_active_user(user.pk):
+            raise AuthenticationFailed('User is inactive or no longer exists', code='user_inactive')
+        return user
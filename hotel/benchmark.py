@@ -0,0 +1,454 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from datetime import date, timedelta
+
+import django
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.utils.encoding import smart_bytes
+from django.utils.http import urlencode, urlsafe_base64_encode
+
+from .models import Hotel, RoomCategory, Room, Booking, Review, FinanceReport, User, OneTimePassword
+from .querybudget import QueryCounter
+
+API_PREFIX = '/api/'
+BENCH_PASSWORD = 'bench-password'
+
+# Routes the harness leaves out: they send real email, call Google,
+# or consume/destroy the credentials the other scenarios run with
+SKIPPED_ROUTES = {
+    'register': 'sends a verification email per request',
+    'password-reset': 'sends a reset email per request',
+    'set-new-password': 'changes the benchmark user\'s password',
+    'google': 'needs a Google-issued ID token',
+    'logout': 'blacklists the refresh token it is given',
+    'send_test_email': 'sends through SMTP directly',
+    'delete-account': 'deletes the benchmark user',
+}
+
+
+@dataclass
+class Scenario:
+    """
+    One route to drive. `path` and `data` are callables of (fixture, i) so
+    that writes can target a different row or date range on every request.
+    """
+    name: str
+    method: str
+    path: object
+    user: str = None
+    data: object = None
+    expect: int = 200
+
+    def build(self, fixture, i, factory):
+        path = API_PREFIX + self.path(fixture, i)
+        data = self.data(fixture, i) if self.data else None
+        headers = {'HTTP_HOST': 'localhost'}
+        if self.user:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {fixture.tokens[self.user]}'
+        if self.method == 'get':
+            request = factory.get(path, data, **headers)
+        else:
+            request = factory.generic(
+                self.method.upper(), path, json.dumps(data or {}), content_type='application/json', **headers
+            )
+        return request.environ
+
+    def build_scope(self, fixture, i):
+        """The ASGI equivalent of build(): an HTTP scope and request body."""
+        path = API_PREFIX + self.path(fixture, i)
+        data = self.data(fixture, i) if self.data else None
+        path, _, query = path.partition('?')
+        headers = [(b'host', b'localhost')]
+        if self.user:
+            headers.append((b'authorization', f'Bearer {fixture.tokens[self.user]}'.encode()))
+        body = b''
+        if self.method == 'get':
+            if data:
+                query = '&'.join(filter(None, [query, urlencode(data)]))
+        else:
+            body = json.dumps(data or {}).encode()
+            headers += [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': self.method.upper(), 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '', 'headers': headers,
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        return scope, body
+
+
+@dataclass
+class Fixture:
+    """Rows seeded for one benchmark run, tagged so they can be removed afterwards."""
+    tag: str
+    users: dict = field(default_factory=dict)
+    tokens: dict = field(default_factory=dict)
+    hotels: list = field(default_factory=list)
+    pending_hotels: list = field(default_factory=list)
+    rooms: list = field(default_factory=list)
+    bookings: dict = field(default_factory=dict)
+    otp: str = ''
+    reset_path: str = ''
+    first_night: date = None
+
+    def shifted(self, offset):
+        """
+        The same fixture with the pay/cancel bookings and new-booking dates
+        starting `offset` requests later, so a second run gets fresh rows.
+        """
+        bookings = {kind: ids[offset:] + ids[:offset] for kind, ids in self.bookings.items()}
+        return replace(self, bookings=bookings, first_night=self.first_night + timedelta(days=offset))
+
+
+def seed_fixture(hotels=20, rooms_per_hotel=20, requests=200):
+    """
+    Seed a self-contained dataset: one user per role, approved and pending
+    hotels with rooms, plus one fresh booking per request for the pay and
+    cancel scenarios so every request exercises the real transition.
+    """
+    tag = uuid.uuid4().hex[:8]
+    fixture = Fixture(tag=tag, first_night=date.today() + timedelta(days=3650))
+    with transaction.atomic():
+        for role in ['client', 'hotel_admin', 'system_admin']:
+            user = User.objects.create_user(
+                email=f'bench-{role}-{tag}@example.com'.replace('_', '-'), first_name='Bench',
+                last_name=role, password=BENCH_PASSWORD, role=role, is_verified=True,
+                is_staff=role == 'system_admin',
+            )
+            fixture.users[role] = user
+            fixture.tokens[role] = user.tokens()['access']
+        admin, client = fixture.users['hotel_admin'], fixture.users['client']
+
+        fixture.hotels = Hotel.objects.bulk_create([
+            Hotel(name=f'bench-{tag}-{i}', address=f'{i} Bench Street', admin=admin, is_approved=True)
+            for i in range(hotels)
+        ])
+        fixture.pending_hotels = Hotel.objects.bulk_create([
+            Hotel(name=f'bench-{tag}-pending-{i}', address='-', admin=admin) for i in range(2)
+        ])
+        categories = RoomCategory.objects.bulk_create([
+            RoomCategory(hotel=hotel, name='Standard', price='100.00') for hotel in fixture.hotels
+        ])
+        fixture.rooms = Room.objects.bulk_create([
+            Room(hotel=category.hotel, category=category, number=str(n))
+            for category in categories for n in range(rooms_per_hotel)
+        ])
+        Review.objects.bulk_create([
+            Review(hotel=hotel, client=client, text='Benchmark stay') for hotel in fixture.hotels
+        ])
+        FinanceReport.objects.bulk_create([
+            FinanceReport(hotel=hotel, rooms_paid=0, money_earned=0) for hotel in fixture.hotels
+        ])
+        # One-night stays far in the future, spread over the rooms
+        for kind in ['pay', 'cancel']:
+            offset = 0 if kind == 'pay' else requests
+            fixture.bookings[kind] = [
+                booking.pk for booking in Booking.objects.bulk_create([
+                    Booking(
+                        user=client, room=fixture.rooms[i % len(fixture.rooms)],
+                        check_in=fixture.first_night + timedelta(days=offset + i),
+                        check_out=fixture.first_night + timedelta(days=offset + i + 1),
+                    )
+                    for i in range(requests)
+                ])
+            ]
+        fixture.otp = OneTimePassword.objects.create(user=client, code=tag[:6]).code
+        uid = urlsafe_base64_encode(smart_bytes(client.pk))
+        fixture.reset_path = f'password-reset-confirmed/{uid}/{PasswordResetTokenGenerator().make_token(client)}/'
+    return fixture
+
+
+def remove_fixture(fixture):
+    with transaction.atomic():
+        Hotel.objects.filter(name__startswith=f'bench-{fixture.tag}').delete()
+        User.objects.filter(pk__in=[user.pk for user in fixture.users.values()]).delete()
+
+
+def _nth(items, i):
+    return items[i % len(items)]
+
+
+def _night(fixture, i):
+    # Booking creation moves on by a night per request, after the seeded stays
+    return fixture.first_night + timedelta(days=2 * len(fixture.bookings['pay']) + i)
+
+
+SCENARIOS = [
+    Scenario('approved-hotels', 'get', lambda f, i: 'approved-hotels/', 'client'),
+    Scenario('approved-hotel-detail', 'get', lambda f, i: f'approved-hotels/{_nth(f.hotels, i).pk}/', 'hotel_admin'),
+    Scenario('available-rooms', 'get', lambda f, i: (
+        f'available-rooms/?hotel_id={_nth(f.hotels, i).pk}&check_in=2030-01-01&check_out=2030-01-04'
+    ), 'client'),
+    Scenario('hotel-list', 'get', lambda f, i: 'hotels/', 'client'),
+    Scenario('hotel-detail', 'get', lambda f, i: f'hotels/{_nth(f.hotels, i).pk}/', 'client'),
+    Scenario('hotel-pending', 'get', lambda f, i: 'hotels/pending/', 'system_admin'),
+    Scenario('pending-hotels', 'get', lambda f, i: 'pending-hotels/', 'system_admin'),
+    Scenario('hotel-approve', 'post', lambda f, i: f'hotels/{f.pending_hotels[0].pk}/approve/', 'system_admin'),
+    Scenario('approve-hotel', 'post', lambda f, i: f'approve-hotel/{f.pending_hotels[0].pk}/', 'system_admin'),
+    Scenario('decline-hotel', 'post', lambda f, i: f'decline-hotel/{f.pending_hotels[1].pk}/', 'system_admin'),
+    Scenario('room-category-list', 'get', lambda f, i: 'room-categories/', 'hotel_admin'),
+    Scenario('room-list', 'get', lambda f, i: 'rooms/', 'hotel_admin'),
+    Scenario('review-list', 'get', lambda f, i: 'reviews/', 'client'),
+    Scenario('finance-report-list', 'get', lambda f, i: 'finance_reports/', 'hotel_admin'),
+    Scenario('finance-report-month', 'get', lambda f, i: (
+        f'finance_reports/filter_by_year_month/?year={date.today().year}&month={date.today().month}'
+    ), 'hotel_admin'),
+    Scenario('finance-revenue', 'get', lambda f, i: f'finance_reports/revenue/?year={date.today().year}', 'hotel_admin'),
+    Scenario('booking-list', 'get', lambda f, i: 'bookings/', 'client'),
+    Scenario('booking-create', 'post', lambda f, i: 'bookings/', 'client', lambda f, i: {
+        'room': _nth(f.rooms, i).pk, 'check_in': str(_night(f, i)), 'check_out': str(_night(f, i) + timedelta(days=1)),
+    }, expect=201),
+    Scenario('booking-pay', 'post', lambda f, i: f'bookings/{_nth(f.bookings["pay"], i)}/pay/', 'client',
+             lambda f, i: {'payment_amount': '100.00'}),
+    Scenario('booking-cancel', 'post', lambda f, i: f'bookings/{_nth(f.bookings["cancel"], i)}/cancel/', 'client'),
+    Scenario('profile', 'get', lambda f, i: 'profile/', 'client'),
+    Scenario('outbox-status', 'get', lambda f, i: 'outbox-status/', 'system_admin'),
+    Scenario('login', 'post', lambda f, i: 'login/', None, lambda f, i: {
+        'email': f.users['client'].email, 'password': BENCH_PASSWORD,
+    }),
+    Scenario('verify-email', 'post', lambda f, i: 'verify-email/', None, lambda f, i: {
+        'email': f.users['client'].email, 'otp': f.otp,
+    }),
+    Scenario('password-reset-confirm', 'get', lambda f, i: f.reset_path),
+    # Async counterparts of the read endpoints (hotel/async_views.py)
+    Scenario('async-approved-hotels', 'get', lambda f, i: 'async/approved-hotels/', 'client'),
+    Scenario('async-approved-hotel-detail', 'get', lambda f, i: (
+        f'async/approved-hotels/{_nth(f.hotels, i).pk}/'
+    ), 'hotel_admin'),
+    Scenario('async-available-rooms', 'get', lambda f, i: (
+        f'async/available-rooms/?hotel_id={_nth(f.hotels, i).pk}&check_in=2030-01-01&check_out=2030-01-04'
+    ), 'client'),
+    Scenario('async-booking-list', 'get', lambda f, i: 'async/bookings/', 'client'),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class QueryTap(QueryCounter):
+    """
+    Counts queries and optionally holds each one for `latency` seconds, to
+    stand in for the round trip to a database on another machine.
+    """
+
+    def __init__(self, latency=0):
+        super().__init__()
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def attach(self, sender, connection, **kwargs):
+        # Under ASGI queries run on executor threads, each with its own connection
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def call(application, environ):
+    """Run one request through the WSGI application and return its status code."""
+    status_line = []
+
+    def start_response(status, headers, exc_info=None):
+        status_line.append(status)
+
+    result = application(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return int(status_line[0].split()[0])
+
+
+async def acall(application, scope, body):
+    """Run one request through the ASGI application and return its status code."""
+    status = []
+    finished = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # Django listens for a disconnect while the view runs; only send it afterwards
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            finished.set()
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        finished.set()
+    return status[0]
+
+
+def run_scenario(application, scenario, fixture, requests=200, concurrency=4, warmup=5, db_latency=0):
+    """
+    Drive one scenario through a WSGI application with `concurrency` threads
+    until `requests` requests have completed and summarise latency (ms),
+    throughput and queries per request. A concurrency of 1 runs in the
+    calling thread. Only reads are warmed up; writes would use up the rows
+    the measured requests target.
+    """
+    factory = RequestFactory()
+    for i in range(warmup if scenario.method == 'get' else 0):
+        call(application, scenario.build(fixture, requests + i, factory))
+
+    latencies, queries, statuses = [], [], {}
+    next_index = iter(range(requests))
+    lock = threading.Lock()
+
+    def work():
+        counter = QueryTap(db_latency)
+        with connection.execute_wrapper(counter):
+            while True:
+                with lock:
+                    i = next(next_index, None)
+                if i is None:
+                    return
+                environ = scenario.build(fixture, i, factory)
+                before = counter.count
+                started = time.perf_counter()
+                code = call(application, environ)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed * 1000)
+                    queries.append(counter.count - before)
+                    statuses[code] = statuses.get(code, 0) + 1
+
+    def threaded_work():
+        try:
+            work()
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        work()
+    else:
+        threads = [threading.Thread(target=threaded_work) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+    return summarise(scenario, concurrency, wall, latencies, statuses, sum(queries), max(queries))
+
+
+def run_scenario_asgi(application, scenario, fixture, requests=200, concurrency=4, warmup=5, db_latency=0):
+    """
+    run_scenario() for an ASGI application: `concurrency` client coroutines
+    share one event loop, as connections would on a single ASGI worker.
+    Queries are counted across all threads, so only the per-request average
+    is reported.
+    """
+    tap = QueryTap(db_latency)
+    latencies, statuses = [], {}
+
+    async def drive():
+        for i in range(warmup if scenario.method == 'get' else 0):
+            await acall(application, *scenario.build_scope(fixture, requests + i))
+        tap.count = 0
+        next_index = iter(range(requests))
+
+        async def client():
+            for i in next_index:
+                scope, body = scenario.build_scope(fixture, i)
+                started = time.perf_counter()
+                code = await acall(application, scope, body)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    connection_created.connect(tap.attach)
+    try:
+        wall = asyncio.run(drive())
+    finally:
+        connection_created.disconnect(tap.attach)
+    return summarise(scenario, concurrency, wall, latencies, statuses, tap.count, None)
+
+
+def summarise(scenario, concurrency, wall, latencies, statuses, total_queries, max_queries):
+    latencies.sort()
+    return {
+        'method': scenario.method.upper(),
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'requests_per_second': round(len(latencies) / wall, 1) if wall else None,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'queries_per_request': round(total_queries / len(latencies), 2),
+        'max_queries': max_queries,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'unexpected': sum(count for code, count in statuses.items() if code != scenario.expect),
+    }
+
+
+def environment():
+    """What the numbers were measured on, so results can be compared across commits."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'backend': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(baseline, current, tolerance=10.0):
+    """
+    Routes whose p95 latency grew by more than `tolerance` percent or that
+    now run more queries per request than in `baseline`.
+    """
+    regressions = []
+    for name, now in current['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + tolerance / 100):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now['queries_per_request'] > before['queries_per_request']:
+            regressions.append(
+                f"{name}: queries/request {before['queries_per_request']} -> {now['queries_per_request']}"
+            )
+    return regressions
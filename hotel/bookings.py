@@ -0,0 +1,147 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+from .cache import touch_bookings
+from .manager import BookingQuerySet
+from .models import Room, Booking
+
+# Name of the Postgres exclusion constraint added in migration 0010
+OVERLAP_CONSTRAINT = 'booking_no_overlap'
+
+
+def lock_rooms(room_ids):
+    """
+    Lock room rows until the end of the current transaction and return them
+    keyed by id. Rows are locked in id order so concurrent callers can't deadlock.
+    """
+    rooms = Room.objects.filter(pk__in=room_ids).order_by('pk')
+    if connection.features.has_select_for_update:
+        return {room.pk: room for room in rooms.select_for_update()}
+    # SQLite has no row locks: touching the rows takes the database write
+    # lock, so concurrent bookers queue behind each other until commit
+    Room.objects.filter(pk__in=room_ids).update(is_available=F('is_available'))
+    return {room.pk: room for room in rooms}
+
+
+def lock_room(room_id):
+    """
+    Lock a room row until the end of the current transaction.
+    """
+    room = lock_rooms([room_id]).get(room_id)
+    if room is None:
+        raise Room.DoesNotExist
+    return room
+
+
+def reserve_room(user, room, check_in, check_out, **extra_fields):
+    """
+    Create a booking for `room`, re-checking availability under the room lock
+    so two concurrent requests can never both get the same nights.
+    """
+    try:
+        with transaction.atomic():
+            room = lock_room(room.pk)
+            if not room.is_available:
+                raise ValidationError("This room is not available.")
+            if Booking.objects.overlapping(check_in, check_out).filter(room=room).exists():
+                raise ValidationError("This room is already booked for the selected dates.")
+            booking = Booking.objects.create(
+                user_id=user.pk, room=room, check_in=check_in, check_out=check_out, **extra_fields
+            )
+            touch_bookings([user.pk], [room.hotel_id])
+            return booking
+    except IntegrityError as e:
+        if OVERLAP_CONSTRAINT in str(e):
+            raise ValidationError("This room is already booked for the selected dates.")
+        raise
+
+
+def reserve_rooms(user, stays):
+    """
+    Book several rooms at once, all or nothing. `stays` is a list of dicts
+    with `room` (an id), `check_in` and `check_out`. Costs one locking query,
+    one availability query and one bulk insert regardless of group size.
+    """
+    stays = sorted(stays, key=lambda stay: (stay['room'], stay['check_in']))
+    for previous, stay in zip(stays, stays[1:]):
+        if previous['room'] == stay['room'] and stay['check_in'] < previous['check_out']:
+            raise ValidationError(f"Room {stay['room']} is requested twice for overlapping dates.")
+
+    room_ids = sorted({stay['room'] for stay in stays})
+    try:
+        with transaction.atomic():
+            rooms = lock_rooms(room_ids)
+            missing = [room_id for room_id in room_ids if room_id not in rooms]
+            if missing:
+                raise ValidationError({'rooms': missing, 'detail': 'These rooms do not exist.'})
+            closed = [room_id for room_id in room_ids if not rooms[room_id].is_available]
+            if closed:
+                raise ValidationError({'rooms': closed, 'detail': 'These rooms are not available.'})
+
+            # Group blocks usually share dates, so OR one clause per date range
+            rooms_by_dates = {}
+            for stay in stays:
+                rooms_by_dates.setdefault((stay['check_in'], stay['check_out']), []).append(stay['room'])
+            clash_filter = Q()
+            for (check_in, check_out), ids in rooms_by_dates.items():
+                clash_filter |= Q(room_id__in=ids, check_in__lt=check_out, check_out__gt=check_in)
+            clashes = sorted(set(Booking.objects.active().filter(clash_filter).values_list('room_id', flat=True)))
+            if clashes:
+                raise ValidationError({'rooms': clashes, 'detail': 'These rooms are already booked for the selected dates.'})
+
+            bookings = Booking.objects.bulk_create([
+                Booking(user_id=user.pk, room=rooms[stay['room']], check_in=stay['check_in'], check_out=stay['check_out'])
+                for stay in stays
+            ])
+            touch_bookings([user.pk], [room.hotel_id for room in rooms.values()])
+            return bookings
+    except IntegrityError as e:
+        if OVERLAP_CONSTRAINT in str(e):
+            raise ValidationError("One or more rooms are already booked for the selected dates.")
+        raise
+
+
+def transition(booking, target, **extra_fields):
+    """
+    Move a booking to status `target` with a single UPDATE of the changed
+    columns, guarded on the status we read so a concurrent change can't be
+    overwritten. Raises ValidationError for transitions the booking can't make.
+    Load the booking with its room to keep this at one query.
+    """
+    source = booking.payment_status
+    if target not in Booking.TRANSITIONS[source]:
+        raise ValidationError(f"A {source.lower()} booking cannot be changed to {target.lower()}.")
+    fields = {'payment_status': target, **extra_fields}
+    if not Booking.objects.filter(pk=booking.pk, payment_status=source).update(**fields):
+        raise ValidationError("This booking was changed by another request, please try again.")
+    touch_bookings([booking.user_id], [booking.room.hotel_id])
+    for name, value in fields.items():
+        setattr(booking, name, value)
+    return booking
+
+
+def reschedule(booking, **changes):
+    """
+    Change a booking's room and/or dates, re-checking availability under the
+    room lock and writing only the columns that actually changed.
+    """
+    changes = {name: value for name, value in changes.items() if getattr(booking, name) != value}
+    if not changes:
+        return booking
+    if booking.payment_status not in BookingQuerySet.ACTIVE_STATUSES:
+        raise ValidationError("Only reserved or paid bookings can be changed.")
+    room = changes.get('room', booking.room)
+    check_in = changes.get('check_in', booking.check_in)
+    check_out = changes.get('check_out', booking.check_out)
+    with transaction.atomic():
+        lock_room(room.pk)
+        clashes = Booking.objects.overlapping(check_in, check_out).filter(room=room).exclude(pk=booking.pk)
+        if clashes.exists():
+            raise ValidationError("This room is already booked for the selected dates.")
+        if not Booking.objects.filter(pk=booking.pk, payment_status=booking.payment_status).update(**changes):
+            raise ValidationError("This booking was changed by another request, please try again.")
+        touch_bookings([booking.user_id], [booking.room.hotel_id, room.hotel_id])
+    for name, value in changes.items():
+        setattr(booking, name, value)
+    return booking
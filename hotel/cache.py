@@ -0,0 +1,113 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'catalog:version'
+BOOKINGS_VERSION_KEY = 'bookings:version'
+
+
+def catalog_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')]
+
+
+def get_versions(keys):
+    """
+    Current version stamps for `keys`, fetched in one cache round trip.
+    A stamp is the time of the last change (time.time_ns()); one that is
+    missing (first read, or evicted) starts fresh, which only costs a miss.
+    """
+    cache = catalog_cache()
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+        return [versions.get(key, now) for key in keys]
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    catalog_cache().set_many(dict.fromkeys(keys, time.time_ns()), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog entry. Entries are keyed by version, so
+    old ones are never read again and simply age out of the backend.
+    """
+    bump_versions([CATALOG_VERSION_KEY])
+
+
+def invalidate_catalog():
+    # Bump once the change is committed so no reader can re-cache stale rows
+    transaction.on_commit(bump_catalog_version)
+
+
+def user_bookings_key(user_id):
+    return f'bookings:user:{user_id}'
+
+
+def hotel_bookings_key(hotel_id):
+    # Moves whenever a booking in the hotel changes, i.e. its room availability
+    return f'bookings:hotel:{hotel_id}'
+
+
+def touch_bookings(user_ids, hotel_ids):
+    """
+    Record that bookings of these users, in these hotels, changed. Like
+    invalidate_catalog(), the stamps move once the change is committed.
+    """
+    keys = [BOOKINGS_VERSION_KEY]
+    keys += [user_bookings_key(user_id) for user_id in set(user_ids)]
+    keys += [hotel_bookings_key(hotel_id) for hotel_id in set(hotel_ids)]
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+def versioned_catalog_key(key, versions):
+    digest = hashlib.md5(key.encode()).hexdigest()
+    return f"catalog:{':'.join(map(str, versions))}:{digest}"
+
+
+def cached_catalog(key, producer, version_keys=(CATALOG_VERSION_KEY,)):
+    """
+    Read-through cache for approved-hotel catalog data. `producer` builds
+    the value on a miss. Entries are keyed by the stamps in `version_keys`,
+    so data that also depends on bookings names their stamp too.
+    """
+    versioned_key = versioned_catalog_key(key, get_versions(list(version_keys)))
+    value = catalog_cache().get(versioned_key)
+    if value is None:
+        value = producer()
+        catalog_cache().set(versioned_key, value)
+    return value
+
+
+async def aget_versions(keys):
+    cache = catalog_cache()
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            await cache.aadd(key, now, timeout=None)
+        versions.update(await cache.aget_many(missing))
+        return [versions.get(key, now) for key in keys]
+    return [versions[key] for key in keys]
+
+
+async def acached_catalog(key, producer, version_keys=(CATALOG_VERSION_KEY,)):
+    """
+    cached_catalog() for async views; `producer` is a coroutine function.
+    Shares keys and versions with the sync views.
+    """
+    versioned_key = versioned_catalog_key(key, await aget_versions(list(version_keys)))
+    value = await catalog_cache().aget(versioned_key)
+    if value is None:
+        value = await producer()
+        await catalog_cache().aset(versioned_key, value)
+    return value
@@ -0,0 +1,80 @@
+"""
+Conditional GET for the endpoints mobile clients poll. Validators are built
+from version stamps in the catalog cache (hotel/cache.py) rather than from
+the response, so a matching If-None-Match or If-Modified-Since is answered
+with 304 after one cache read: no query, no serializer.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import get_versions
+
+
+def validators(request, keys, versions, state=(), not_before=0):
+    """
+    (etag, last_modified) for this URL at these versions. Query parameters
+    (filters, cursor) are part of the ETag; the keys carry who is asking
+    when the response depends on it, and `state` whatever else the view
+    resolved outside the URL. The response is never older than `not_before`.
+    """
+    state = '|'.join([request.get_full_path(), *keys, *map(str, versions), *state])
+    etag = 'W/"%s"' % hashlib.md5(state.encode()).hexdigest()
+    # Stamps are time.time_ns() of the last change
+    return etag, max(max(versions) // 1_000_000_000, not_before)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Clients may keep the body but must check back before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class NotModified(Exception):
+    # Carries the 304 (or the 412 of a failed If-Match) past the view handler
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified support for API views. `version_keys(request)` names
+    the stamps the response depends on, or returns None to skip validation
+    for the request; `validator_state(request)` returns what else it depends
+    on, as (strings, not_before) for validators(). Runs after authentication
+    and permission checks.
+    """
+
+    def version_keys(self, request):
+        raise NotImplementedError
+
+    def validator_state(self, request):
+        return (), 0
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        keys = self.version_keys(request)
+        if not keys:
+            return
+        self.validators = validators(request, keys, get_versions(keys), *self.validator_state(request))
+        etag, last_modified = self.validators
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            raise NotModified(not_modified)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'validators', None) and response.status_code in (200, 304):
+            set_validators(response, *self.validators)
+        return response
@@ -0,0 +1,400 @@
+import io
+import json
+import random
+import resource
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import JSONField, Max
+from django.utils import timezone
+
+from .models import Hotel, RoomCategory, Room, Booking, Review, FinanceReport, DailyRevenue, User
+
+# (name, share of a hotel's rooms, price range)
+PRICE_TIERS = [
+    ('Single', 0.35, (45, 120)),
+    ('Double', 0.45, (80, 220)),
+    ('Family', 0.12, (140, 320)),
+    ('Suite', 0.08, (260, 900)),
+]
+# Nights per stay and how common each length is
+STAY_LENGTHS = [1, 2, 3, 4, 5, 7, 10, 14]
+STAY_WEIGHTS = [28, 24, 17, 10, 7, 8, 3, 3]
+UNUSABLE_PASSWORD = '!synthetic'
+# Word lists hotel names and addresses are drawn from, so search has realistic text
+NAME_WORDS = [
+    'Grand', 'Royal', 'Seaside', 'Harbour', 'Garden', 'Palace', 'Lakeview', 'Riverside', 'Summit', 'Savannah',
+    'Coral', 'Sunset', 'Highland', 'Baobab', 'Acacia', 'Marina', 'Crystal', 'Golden', 'Silver', 'Orchid',
+    'Meadow', 'Cedar', 'Safari', 'Kilimanjaro', 'Pearl', 'Oasis', 'Horizon', 'Heritage', 'Willow', 'Jasmine',
+]
+NAME_KINDS = ['Hotel', 'Resort', 'Lodge', 'Inn', 'Suites', 'Guest House', 'Retreat', 'Villas', 'Camp', 'Residences']
+STREETS = ['Beach Road', 'Kenyatta Avenue', 'Moi Avenue', 'Harbour Drive', 'Park Lane', 'Church Street',
+           'Market Street', 'Ngong Road', 'Lake Road', 'Station Road', 'Hill View', 'Ocean Drive']
+CITIES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Malindi', 'Diani', 'Naivasha', 'Nanyuki',
+          'Lamu', 'Watamu', 'Kilifi', 'Thika', 'Machakos', 'Kericho', 'Nyeri']
+
+
+class MemoryCeilingExceeded(Exception):
+    pass
+
+
+def peak_memory_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Loader:
+    """
+    Streams row tuples for `fields` into a model's table in batches: COPY on
+    PostgreSQL, executemany INSERTs elsewhere. Columns that aren't listed are
+    filled with the field default, computed once. Rows skip model
+    instantiation and signals entirely, which is what makes this fast.
+    """
+
+    def __init__(self, model, fields, batch_size, report, max_memory_mb=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.report = report
+        self.max_memory_mb = max_memory_mb
+        by_name = {field.name: field for field in model._meta.concrete_fields}
+        given = [by_name[name] for name in fields]
+        rest = [field for field in model._meta.concrete_fields if field.name not in fields]
+        self.columns = [field.column for field in given + rest]
+        self.defaults = tuple(self.default_for(field) for field in rest)
+        self.rows = 0
+
+    @staticmethod
+    def default_for(field):
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            value = timezone.now()
+        else:
+            value = field.get_default()
+        if isinstance(field, JSONField):
+            # Plain text works for both COPY and INSERT
+            return json.dumps(value)
+        return field.get_db_prep_save(value, connection)
+
+    def load(self, rows):
+        table = self.model._meta.db_table
+        started = time.perf_counter()
+        batch = []
+        for row in rows:
+            batch.append(row + self.defaults)
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+                self.progress(table, started)
+        if batch:
+            self.flush(batch)
+        self.progress(table, started, done=True)
+        return self.rows
+
+    def flush(self, batch):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                self.copy(cursor, batch)
+            else:
+                placeholders = ', '.join(['%s'] * len(self.columns))
+                cursor.executemany(
+                    f'INSERT INTO {self.quote(self.model._meta.db_table)} ({self.column_list()}) VALUES ({placeholders})',
+                    batch,
+                )
+        self.rows += len(batch)
+
+    def copy(self, cursor, batch):
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write('\t'.join(copy_text(value) for value in row))
+            buffer.write('\n')
+        sql = f'COPY {self.quote(self.model._meta.db_table)} ({self.column_list()}) FROM STDIN'
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            # psycopg2
+            buffer.seek(0)
+            raw.copy_expert(sql, buffer)
+        else:
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+    def quote(self, name):
+        return connection.ops.quote_name(name)
+
+    def column_list(self):
+        return ', '.join(self.quote(column) for column in self.columns)
+
+    def progress(self, table, started, done=False):
+        elapsed = time.perf_counter() - started
+        memory = peak_memory_mb()
+        self.report(
+            f'{table}: {self.rows:,} rows, {self.rows / elapsed if elapsed else 0:,.0f} rows/s, '
+            f'peak memory {memory:,.0f} MB' + (' - done' if done else ''),
+            done,
+        )
+        if self.max_memory_mb and memory > self.max_memory_mb:
+            raise MemoryCeilingExceeded(
+                f'Peak memory {memory:,.0f} MB is over the {self.max_memory_mb} MB ceiling; '
+                f'use a smaller --batch-size.'
+            )
+
+
+def copy_text(value):
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class DatasetGenerator:
+    """
+    Generates a hotel catalog with users, rooms in price tiers, booking
+    histories, reviews and finance data. Everything is drawn from one seeded
+    RNG and primary keys are assigned up front, so the same seed run on the
+    same day against the same starting tables produces the same rows, and
+    foreign keys never need a round trip to the database.
+    """
+
+    def __init__(self, hotels, rooms, bookings, reviews, clients, seed=0, history_days=730,
+                 future_days=365, batch_size=50_000, max_memory_mb=None, report=print):
+        self.hotels = hotels
+        self.rooms = rooms
+        self.bookings = bookings
+        self.reviews = reviews
+        self.clients = max(clients, 1)
+        self.admins = max(hotels // 5, 1)
+        self.random = random.Random(seed)
+        self.today = timezone.localdate()
+        self.first_day = self.today - timedelta(days=history_days)
+        self.last_day = self.today + timedelta(days=future_days)
+        self.batch_size = batch_size
+        self.max_memory_mb = max_memory_mb
+        self.report = report
+        # SQLite keeps naive UTC timestamps; PostgreSQL needs the offset
+        self.utc_suffix = '' if connection.vendor == 'sqlite' else '+00:00'
+
+    def loader(self, model, fields):
+        return Loader(model, fields, self.batch_size, self.report, self.max_memory_mb)
+
+    def moment(self, day):
+        # A random UTC time on `day`, formatted the way the backend stores it.
+        # Building the string directly is several times faster than adapting
+        # an aware datetime per row.
+        minute = int(self.random.random() * 1440)
+        return f'{day} {minute // 60:02d}:{minute % 60:02d}:00{self.utc_suffix}'
+
+    def client_id(self):
+        return self.user_start + self.admins + int(self.random.random() * self.clients)
+
+    def history_day(self):
+        return self.first_day + timedelta(days=self.random.randrange((self.today - self.first_day).days or 1))
+
+    def run(self):
+        started = time.perf_counter()
+        self.user_start = next_id(User)
+        self.hotel_start = next_id(Hotel)
+        self.category_start = next_id(RoomCategory)
+        self.room_start = next_id(Room)
+        self.booking_start = next_id(Booking)
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # Durability of a throwaway dataset isn't worth an fsync per batch
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+        totals = {
+            'users': self.load_users(),
+            'hotels': self.load_hotels(),
+        }
+        totals['room_categories'], totals['rooms'] = self.load_rooms()
+        totals['bookings'] = self.load_bookings()
+        totals['reviews'] = self.load_reviews()
+        totals['finance_reports'] = self.load_finance_reports()
+        totals['daily_revenue'] = self.rollup_revenue()
+        self.reset_sequences()
+        elapsed = time.perf_counter() - started
+        rows = sum(totals.values())
+        return {
+            **totals,
+            'seconds': round(elapsed, 1),
+            'rows_per_second': round(rows / elapsed) if elapsed else None,
+            'peak_memory_mb': round(peak_memory_mb()),
+        }
+
+    def load_users(self):
+        # Hotel admins first, then clients; ids are contiguous from user_start
+        def rows():
+            for n in range(self.admins + self.clients):
+                pk = self.user_start + n
+                role = 'hotel_admin' if n < self.admins else 'client'
+                yield (pk, f'{role.replace("_", "-")}-{pk}@example.test', UNUSABLE_PASSWORD,
+                       'Synthetic', f'{role} {pk}', role, True, self.moment(self.history_day()))
+        return self.loader(User, ['id', 'email', 'password', 'first_name', 'last_name', 'role',
+                                  'is_verified', 'date_joined']).load(rows())
+
+    def load_hotels(self):
+        def rows():
+            for n in range(self.hotels):
+                roll = self.random.random()
+                approved, declined = roll < 0.9, 0.9 <= roll < 0.93
+                name = ' '.join(self.random.sample(NAME_WORDS, self.random.choice([1, 1, 2])))
+                name = f'{name} {self.random.choice(NAME_KINDS)}'
+                address = (f'{self.random.randint(1, 999)} {self.random.choice(STREETS)}, '
+                           f'{self.random.choice(CITIES)}')
+                yield (self.hotel_start + n, name, address,
+                       approved, declined, self.user_start + n % self.admins, self.moment(self.history_day()))
+        return self.loader(Hotel, ['id', 'name', 'address', 'is_approved', 'is_declined', 'admin',
+                                   'created_at']).load(rows())
+
+    def load_rooms(self):
+        # Rooms are spread evenly over hotels and split across price tiers;
+        # one category row per tier per hotel
+        per_hotel, extra = divmod(self.rooms, self.hotels)
+        plan = []
+        for n in range(self.hotels):
+            count = per_hotel + (n < extra)
+            tiers = [(name, round(count * share), prices) for name, share, prices in PRICE_TIERS]
+            # Rounding leftovers go to the cheapest tier
+            tiers[0] = (tiers[0][0], count - sum(size for _, size, _ in tiers[1:]), tiers[0][2])
+            plan.append([tier for tier in tiers if tier[1] > 0])
+
+        def categories():
+            pk = self.category_start
+            for n, tiers in enumerate(plan):
+                for name, _, (low, high) in tiers:
+                    price = Decimal(self.random.randrange(low * 100, high * 100, 500)) / 100
+                    yield (pk, self.hotel_start + n, name, str(price), self.moment(self.history_day()))
+                    pk += 1
+
+        def rooms():
+            pk, category = self.room_start, self.category_start
+            for n, tiers in enumerate(plan):
+                number = 100
+                for _, size, _ in tiers:
+                    for _ in range(size):
+                        number += 1
+                        yield (pk, self.hotel_start + n, category, str(number), self.moment(self.history_day()))
+                        pk += 1
+                    category += 1
+
+        category_rows = self.loader(RoomCategory, ['id', 'hotel', 'name', 'price', 'created_at']).load(categories())
+        room_rows = self.loader(Room, ['id', 'hotel', 'category', 'number', 'created_at']).load(rooms())
+        return category_rows, room_rows
+
+    def load_bookings(self):
+        """
+        Each room gets its own non-overlapping timeline of stays separated by
+        random gaps, so the data passes the overlap constraint. Past stays are
+        mostly checked out with some cancellations; future ones are reserved
+        or paid in advance.
+        """
+        rooms = self.rooms
+        per_room, extra = divmod(self.bookings, rooms) if rooms else (0, 0)
+        span = (self.last_day - self.first_day).days
+        mean_stay = sum(n * w for n, w in zip(STAY_LENGTHS, STAY_WEIGHTS)) / sum(STAY_WEIGHTS)
+
+        def rows():
+            pk = self.booking_start
+            for n in range(rooms):
+                count = per_room + (n < extra)
+                if not count:
+                    continue
+                room = self.room_start + n
+                # Busy rooms have their history start earlier rather than overlapping
+                length = max(span, int(count * (mean_stay + 1)))
+                day = self.last_day - timedelta(days=length)
+                mean_gap = max((length - count * mean_stay) / count, 0.01)
+                nights = self.random.choices(STAY_LENGTHS, STAY_WEIGHTS, k=count)
+                for stay in nights:
+                    day += timedelta(days=int(self.random.expovariate(1 / mean_gap)))
+                    check_out = day + timedelta(days=stay)
+                    if check_out <= self.today:
+                        roll = self.random.random()
+                        status = 'CANCELLED' if roll < 0.08 else 'CHECKED_OUT'
+                    else:
+                        status = 'PAID' if self.random.random() < 0.4 else 'RESERVED'
+                    booked = day - timedelta(days=self.random.randrange(1, 90))
+                    yield (pk, self.client_id(), room,
+                           str(day), str(check_out), status, status == 'CHECKED_OUT', self.moment(booked))
+                    pk += 1
+                    day = check_out
+
+        return self.loader(Booking, ['id', 'user', 'room', 'check_in', 'check_out', 'payment_status',
+                                     'is_checked_out', 'created_at']).load(rows())
+
+    def load_reviews(self):
+        phrases = ['Great location.', 'Friendly staff.', 'Room was clean.', 'Breakfast could be better.',
+                   'Noisy at night.', 'Would stay again.', 'Good value for money.', 'Slow check-in.']
+
+        def rows():
+            for _ in range(self.reviews):
+                text = ' '.join(self.random.sample(phrases, self.random.randint(1, 3)))
+                responded = self.random.random() < 0.3
+                created = self.moment(self.history_day())
+                yield (self.client_id(),
+                       self.hotel_start + self.random.randrange(self.hotels), text,
+                       'Thank you for your feedback.' if responded else None,
+                       created if responded else None, created)
+        return self.loader(Review, ['client', 'hotel', 'text', 'response', 'responded_at',
+                                    'created_at']).load(rows())
+
+    def load_finance_reports(self):
+        # One report per hotel per month of history
+        months = []
+        day = self.first_day.replace(day=1)
+        while day < self.today:
+            months.append(day)
+            day = (day + timedelta(days=32)).replace(day=1)
+
+        def rows():
+            for n in range(self.hotels):
+                for month in months:
+                    paid = self.random.randint(0, 60)
+                    money = paid * self.random.randint(60, 300)
+                    yield (self.hotel_start + n, paid, str(money), self.moment(month))
+        return self.loader(FinanceReport, ['hotel', 'rooms_paid', 'money_earned', 'created_at']).load(rows())
+
+    def rollup_revenue(self):
+        """
+        Build the per-hotel daily rollups for the new bookings in one
+        INSERT ... SELECT, counting a stay as paid/cancelled on its check-in day.
+        """
+        table = {model: connection.ops.quote_name(model._meta.db_table)
+                 for model in [DailyRevenue, Booking, Room, RoomCategory]}
+        started = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table[DailyRevenue]} (hotel_id, day, rooms_paid, money_earned, rooms_cancelled)
+                SELECT r.hotel_id, b.check_in,
+                       SUM(CASE WHEN b.payment_status IN ('PAID', 'CHECKED_OUT') THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN b.payment_status IN ('PAID', 'CHECKED_OUT') THEN c.price ELSE 0 END),
+                       SUM(CASE WHEN b.payment_status = 'CANCELLED' THEN 1 ELSE 0 END)
+                FROM {table[Booking]} b
+                JOIN {table[Room]} r ON r.id = b.room_id
+                JOIN {table[RoomCategory]} c ON c.id = r.category_id
+                WHERE b.id >= %s
+                GROUP BY r.hotel_id, b.check_in
+                """,
+                [self.booking_start],
+            )
+            rows = cursor.rowcount
+        self.report(f'{DailyRevenue._meta.db_table}: {rows:,} rows in {time.perf_counter() - started:.1f}s - done', True)
+        return rows
+
+    def reset_sequences(self):
+        # Ids were assigned explicitly, so move PostgreSQL sequences past them
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Hotel, RoomCategory, Room, Booking, Review, FinanceReport, DailyRevenue]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,104 @@
+"""
+Sparse fieldsets: `?fields=id,number` returns only those fields of each
+object, `?exclude=image,video` drops them. The views then load only the
+columns behind the remaining fields. Both apply to reads only; without
+either parameter, responses are unchanged.
+"""
+from django.core.exceptions import FieldDoesNotExist
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def requested_fieldset(request):
+    """
+    (fields, exclude) named in the query string, as sets; (None, None) when
+    the request does not ask for a sparse fieldset.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = getattr(request, 'query_params', request.GET)
+    fields, exclude = params.get('fields'), params.get('exclude')
+    if fields is None and exclude is None:
+        return None, None
+    return (names(fields) if fields is not None else None), names(exclude)
+
+
+def names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def cache_suffix(request):
+    # For cache keys that don't already include the query string
+    fields, exclude = requested_fieldset(request)
+    if fields is None and exclude is None:
+        return ''
+    fields = '*' if fields is None else ','.join(sorted(fields))
+    return f':fields={fields}:exclude={",".join(sorted(exclude))}'
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that drops the fields the request did not ask for.
+    Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, exclude = requested_fieldset(self.context.get('request'))
+        if fields is None and not exclude:
+            return
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or name in exclude:
+                self.fields.pop(name)
+
+
+def serializer_columns(serializer, model):
+    """
+    Model fields the serializer reads, or None when some field reads
+    something we can't see (a method, a property, a related path).
+    """
+    columns = {model._meta.pk.name}
+    for field in serializer.fields.values():
+        if field.source == '*' or '.' in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        columns.add(model_field.name)
+    return columns
+
+
+def ordering_names(queryset, paginator):
+    # Fields the queryset and a cursor paginator order by, without direction
+    ordering = list(queryset.query.order_by) + list(getattr(paginator, 'ordering', None) or ())
+    return list(dict.fromkeys(name.lstrip('-') for name in ordering if isinstance(name, str)))
+
+
+class SparseFieldsetViewMixin:
+    """
+    View mixin: with a sparse fieldset, the queryset only loads the columns
+    its serializer still needs, plus whatever ordering, cursor pagination
+    and select_related() rely on.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, exclude = requested_fieldset(self.request)
+        if fields is None and not exclude:
+            return queryset
+        columns = serializer_columns(self.get_serializer(), queryset.model)
+        if columns is None:
+            return queryset
+        needed = ordering_names(queryset, self.paginator)
+        if isinstance(queryset.query.select_related, dict):
+            needed += list(queryset.query.select_related)
+        for name in needed:
+            try:
+                columns.add(queryset.model._meta.get_field(name).name)
+            except FieldDoesNotExist:
+                # An annotation or a related path: leave the queryset alone
+                return queryset
+        return queryset.only(*columns)
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django import forms
+from django.db.models import Case, CharField, Count, Exists, OuterRef, Value, When
+from django.db.models.functions import Lower
+from django_filters import rest_framework as filters
+
+from .models import Hotel, Room
+
+# (label, lowest price, price it stays under); the last band is open-ended
+PRICE_BANDS = [
+    ('0-100', 0, 100),
+    ('100-200', 100, 200),
+    ('200-400', 200, 400),
+    ('400+', 400, None),
+]
+ROOM_FILTERS = ['min_price', 'max_price', 'category', 'check_in', 'check_out']
+
+
+class StayForm(forms.Form):
+    def clean(self):
+        data = super().clean()
+        check_in, check_out = data.get('check_in'), data.get('check_out')
+        if check_in and check_out and check_in >= check_out:
+            raise forms.ValidationError({'check_out': 'check_out must be after check_in.'})
+        return data
+
+
+def matching_rooms(rooms, data):
+    """
+    Narrow a Room queryset by the room-level filters in `data` (cleaned
+    filter form data). With only one stay date, the stay is one night.
+    """
+    if data.get('min_price') is not None:
+        rooms = rooms.filter(category__price__gte=data['min_price'])
+    if data.get('max_price') is not None:
+        rooms = rooms.filter(category__price__lte=data['max_price'])
+    if data.get('category'):
+        rooms = rooms.filter(category__name__iexact=data['category'])
+    check_in, check_out = data.get('check_in'), data.get('check_out')
+    if check_in or check_out:
+        check_in = check_in or check_out - timedelta(days=1)
+        check_out = check_out or check_in + timedelta(days=1)
+        rooms = rooms.available_between(check_in, check_out)
+    return rooms
+
+
+class RoomConditionsFilterSet(filters.FilterSet):
+    min_price = filters.NumberFilter(method='filter_rooms', help_text='Lowest nightly price.')
+    max_price = filters.NumberFilter(method='filter_rooms', help_text='Highest nightly price.')
+    category = filters.CharFilter(method='filter_rooms', help_text='Room category name, e.g. "Double".')
+    check_in = filters.DateFilter(method='filter_rooms', help_text='Only rooms free from this date.')
+    check_out = filters.DateFilter(method='filter_rooms', help_text='Only rooms free until this date.')
+
+    def filter_rooms(self, queryset, name, value):
+        # Room conditions are applied together in filter_queryset so that
+        # they all hold for the same room
+        return queryset
+
+    def room_filters_given(self):
+        return any(self.form.cleaned_data.get(name) not in (None, '') for name in ROOM_FILTERS)
+
+    def rooms(self):
+        return matching_rooms(Room.objects.all(), self.form.cleaned_data)
+
+
+class HotelFilter(RoomConditionsFilterSet):
+    """
+    Hotels with at least one room matching every given condition, e.g. an
+    available Double room under 150 for the requested nights.
+    """
+
+    class Meta:
+        model = Hotel
+        fields = []
+        form = StayForm
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.room_filters_given():
+            queryset = queryset.filter(Exists(self.rooms().filter(hotel_id=OuterRef('pk'))))
+        return queryset
+
+
+class RoomFilter(RoomConditionsFilterSet):
+    class Meta:
+        model = Room
+        fields = ['is_available']
+        form = StayForm
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.room_filters_given():
+            queryset = matching_rooms(queryset, self.form.cleaned_data)
+        return queryset
+
+
+def price_band():
+    whens = [
+        When(category__price__gte=low, then=Value(label)) if high is None
+        else When(category__price__gte=low, category__price__lt=high, then=Value(label))
+        for label, low, high in PRICE_BANDS
+    ]
+    return Case(*whens, output_field=CharField())
+
+
+def facet_counts(rooms):
+    """
+    Hotels per price band and per room category among `rooms`, as one
+    UNION ALL of two GROUP BYs so the database is asked once.
+    """
+    by_band = rooms.annotate(facet=Value('price_band'), key=price_band()).values('facet', 'key').annotate(
+        hotels=Count('hotel_id', distinct=True)
+    ).order_by()
+    by_category = rooms.annotate(facet=Value('category'), key=Lower('category__name')).values('facet', 'key').annotate(
+        hotels=Count('hotel_id', distinct=True)
+    ).order_by()
+    counts = {'price_bands': {label: 0 for label, _, _ in PRICE_BANDS}, 'categories': {}}
+    for row in by_band.union(by_category, all=True):
+        if row['facet'] == 'price_band':
+            counts['price_bands'][row['key']] = row['hotels']
+        else:
+            counts['categories'][row['key']] = row['hotels']
+    return {
+        'price_bands': [{'band': label, 'hotels': hotels} for label, hotels in counts['price_bands'].items()],
+        'categories': [{'name': name, 'hotels': hotels} for name, hotels in sorted(counts['categories'].items())],
+    }
@@ -0,0 +1,48 @@
+from datetime import date, datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DailyRevenue
+
+
+def record_revenue(hotel_id, day, rooms_paid=0, money_earned=0, rooms_cancelled=0):
+    """
+    Add to a hotel's rollup row for `day`, creating it on first use. Call it
+    inside the transaction that changes the booking so the two never disagree.
+    """
+    deltas = {
+        'rooms_paid': F('rooms_paid') + rooms_paid,
+        'money_earned': F('money_earned') + money_earned,
+        'rooms_cancelled': F('rooms_cancelled') + rooms_cancelled,
+    }
+    rollup = DailyRevenue.objects.filter(hotel_id=hotel_id, day=day)
+    if rollup.update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            DailyRevenue.objects.create(
+                hotel_id=hotel_id, day=day, rooms_paid=rooms_paid,
+                money_earned=money_earned, rooms_cancelled=rooms_cancelled,
+            )
+    except IntegrityError:
+        # A concurrent request created the row first
+        rollup.update(**deltas)
+
+
+def period_bounds(year, month=None):
+    """
+    Half-open [start, end) dates covering a year or one month of it.
+    Raises ValueError for a month outside 1-12 or a year date() can't hold.
+    """
+    if month is not None and not 1 <= month <= 12:
+        raise ValueError(f'month must be 1-12, got {month}')
+    start = date(year, month or 1, 1)
+    if month is None or month == 12:
+        return start, date(year + 1, 1, 1)
+    return start, date(year, month + 1, 1)
+
+
+def aware_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,105 @@
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+
+from hotel.bookings import reserve_room
+from hotel.models import Hotel, RoomCategory, Room, Booking, User
+
+
+def naive_reserve(user, room, check_in, check_out):
+    # The pre-locking booking path: check, then write, with nothing in between
+    if Booking.objects.overlapping(check_in, check_out).filter(room=room).exists():
+        raise ValidationError("This room is already booked for the selected dates.")
+    return Booking.objects.create(user=user, room=room, check_in=check_in, check_out=check_out)
+
+
+class Command(BaseCommand):
+    help = 'Hammer one room with concurrent bookings and report throughput and double bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent booking threads.')
+        parser.add_argument('--nights', type=int, default=50, help='Distinct one-night stays every worker tries to book.')
+        parser.add_argument('--naive', action='store_true', help='Use the unlocked check-then-create path for comparison.')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark hotel and bookings afterwards.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        admin = User.objects.create_user(
+            email=f'bench-{tag}@example.com', first_name='Bench', last_name='Runner',
+            password=None, role='hotel_admin', is_verified=True,
+        )
+        hotel = Hotel.objects.create(name=f'contention-bench-{tag}', address='-', admin=admin, is_approved=True)
+        category = RoomCategory.objects.create(hotel=hotel, name='Standard', price='100.00')
+        room = Room.objects.create(hotel=hotel, category=category, number='1')
+
+        reserve = naive_reserve if options['naive'] else reserve_room
+        first_night = date.today() + timedelta(days=365)
+        nights = [first_night + timedelta(days=i) for i in range(options['nights'])]
+        counters = {'booked': 0, 'rejected': 0, 'errors': 0}
+        counters_lock = threading.Lock()
+        start_barrier = threading.Barrier(options['workers'])
+
+        def worker(seed):
+            order = nights[:]
+            random.Random(seed).shuffle(order)
+            start_barrier.wait()
+            try:
+                for night in order:
+                    try:
+                        reserve(admin, room, night, night + timedelta(days=1))
+                        outcome = 'booked'
+                    except ValidationError:
+                        outcome = 'rejected'
+                    except Exception:
+                        outcome = 'errors'
+                    with counters_lock:
+                        counters[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        per_night = Booking.objects.filter(room=room).values('check_in').annotate(n=Count('id'))
+        double_bookings = sum(row['n'] - 1 for row in per_night if row['n'] > 1)
+        attempts = options['workers'] * options['nights']
+        results = {
+            'backend': connection.vendor,
+            'path': 'naive' if options['naive'] else 'locked',
+            'workers': options['workers'],
+            'attempts': attempts,
+            'seconds': round(elapsed, 4),
+            'attempts_per_second': round(attempts / elapsed, 1),
+            'bookings_per_second': round(counters['booked'] / elapsed, 1),
+            'double_bookings': double_bookings,
+            **counters,
+        }
+
+        if not options['keep']:
+            with transaction.atomic():
+                hotel.delete()
+                admin.delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        for key, value in results.items():
+            self.stdout.write(f'{key:>20}: {value}')
+        if double_bookings:
+            self.stdout.write(self.style.ERROR(f'{double_bookings} night(s) were double booked'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No double bookings'))
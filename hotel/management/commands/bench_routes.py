@@ -0,0 +1,101 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+
+from hotel.benchmark import (
+    SCENARIOS, SKIPPED_ROUTES, compare, environment, remove_fixture, run_scenario, run_scenario_asgi, seed_fixture,
+)
+
+
+class Command(BaseCommand):
+    help = ('Drive the API routes through the WSGI and/or ASGI application against a seeded dataset and '
+            'report throughput, latency percentiles and queries per request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per route.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads per route.')
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='wsgi',
+                            help='Entry point to drive. "both" runs every route under each, for comparison.')
+        parser.add_argument('--db-latency', type=float, default=0,
+                            help='Milliseconds added to every query, to simulate a remote database.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests sent to each read route first.')
+        parser.add_argument('--hotels', type=int, default=20, help='Approved hotels to seed.')
+        parser.add_argument('--rooms', type=int, default=20, help='Rooms to seed per hotel.')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Only run this route (repeatable). Defaults to all of them.')
+        parser.add_argument('--list', action='store_true', help='List the routes and exit.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+        parser.add_argument('--compare', help='Results file from an earlier run to check for regressions.')
+        parser.add_argument('--tolerance', type=float, default=10.0,
+                            help='Allowed p95 latency growth in percent when comparing.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows afterwards.')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep rate limiting on; by default it is off so login and verify-email are measured.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for scenario in SCENARIOS:
+                self.stdout.write(f'{scenario.name:<30} {scenario.method.upper():<5} {scenario.user or "anonymous"}')
+            for name, reason in SKIPPED_ROUTES.items():
+                self.stdout.write(f'{name:<30} skipped: {reason}')
+            return
+
+        scenarios = SCENARIOS
+        if options['routes']:
+            unknown = set(options['routes']) - {scenario.name for scenario in SCENARIOS}
+            if unknown:
+                raise CommandError(f'Unknown route(s): {", ".join(sorted(unknown))}. See --list.')
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['routes']]
+
+        servers = ['wsgi', 'asgi'] if options['server'] == 'both' else [options['server']]
+        runners = {
+            'wsgi': (get_wsgi_application, run_scenario),
+            'asgi': (get_asgi_application, run_scenario_asgi),
+        }
+        # Every server gets its own rows for the write scenarios
+        fixture_requests = options['requests'] * len(servers)
+        fixture = seed_fixture(options['hotels'], options['rooms'], fixture_requests)
+        results = {
+            'environment': {**environment(), 'db_latency_ms': options['db_latency']},
+            'routes': {},
+        }
+        try:
+            # Rate limiting would answer most repeated logins with 429s
+            with override_settings(THROTTLE_ENABLED=options['throttle']):
+                for offset, server in enumerate(servers):
+                    get_application, run = runners[server]
+                    application = get_application()
+                    for scenario in scenarios:
+                        name = scenario.name if len(servers) == 1 else f'{scenario.name}@{server}'
+                        results['routes'][name] = {'server': server, **run(
+                            application, scenario, fixture.shifted(offset * options['requests']),
+                            options['requests'], options['concurrency'], options['warmup'],
+                            options['db_latency'] / 1000,
+                        )}
+        finally:
+            if not options['keep']:
+                remove_fixture(fixture)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+        if options['json']:
+            self.stdout.write(json.dumps(results, sort_keys=True))
+        else:
+            self.stdout.write(f'{"route":<34} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8}  statuses')
+            for name, row in results['routes'].items():
+                line = (f'{name:<34} {row["requests_per_second"]:>8} {row["p50_ms"]:>8} {row["p95_ms"]:>8} '
+                        f'{row["p99_ms"]:>8} {row["queries_per_request"]:>8}  {row["statuses"]}')
+                self.stdout.write(self.style.ERROR(line) if row['unexpected'] else line)
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            regressions = compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against %s:\n%s' % (options['compare'], '\n'.join(regressions)))
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}'))
@@ -0,0 +1,96 @@
+import json
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from hotel.models import Hotel, RoomCategory, Room, Booking, User
+from hotel.rows import compile_fields, represent_rows
+from hotel.serializers import BookingSerializer, HotelSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/s of the ModelSerializer and values() paths used by the list endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Hotels and bookings to serialize.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best one is reported.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = []
+        # Everything seeded here is rolled back at the end
+        with transaction.atomic():
+            hotels, bookings = self.seed(options['rows'])
+            for serializer_class, queryset in [(HotelSerializer, hotels), (BookingSerializer, bookings)]:
+                results.append(self.compare(serializer_class, queryset, options['repeat']))
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['serializer']:>18}: {result['serializer_rows_per_second']:>10} rows/s, "
+                f"values() path {result['rows_rows_per_second']:>10} rows/s ({result['speedup']}x)"
+            )
+            if not result['identical']:
+                self.stdout.write(self.style.ERROR(f"{result['serializer']}: the two paths disagree"))
+
+    def seed(self, count):
+        tag = uuid.uuid4().hex[:8]
+        admin = User.objects.create_user(
+            email=f'bench-{tag}@example.com', first_name='Bench', last_name='Runner',
+            password=None, role='hotel_admin', is_verified=True,
+        )
+        Hotel.objects.bulk_create(
+            Hotel(name=f'serializer-bench-{tag}-{i}', address=f'{i} Bench Street', admin=admin, is_approved=True)
+            for i in range(count)
+        )
+        hotel = Hotel.objects.filter(admin=admin).first()
+        category = RoomCategory.objects.create(hotel=hotel, name='Standard', price='100.00')
+        room = Room.objects.create(hotel=hotel, category=category, number='1')
+        first_night = date.today() + timedelta(days=365)
+        Booking.objects.bulk_create(
+            Booking(user=admin, room=room, check_in=first_night + timedelta(days=i),
+                    check_out=first_night + timedelta(days=i + 1))
+            for i in range(count)
+        )
+        ordering = ('-created_at', '-id')
+        return (Hotel.objects.filter(admin=admin).order_by(*ordering),
+                Booking.objects.filter(room=room).order_by(*ordering))
+
+    def compare(self, serializer_class, queryset, repeat):
+        compiled = compile_fields(serializer_class(), queryset.model)
+        columns = [column for _, column, _ in compiled]
+
+        def serializer_path():
+            return serializer_class(list(queryset.all()), many=True).data
+
+        def rows_path():
+            return represent_rows(queryset.values(*columns), compiled)
+
+        timings = {}
+        for name, path in [('serializer', serializer_path), ('rows', rows_path)]:
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                data = path()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, data)
+
+        count = len(timings['rows'][1])
+        serializer_seconds, rows_seconds = timings['serializer'][0], timings['rows'][0]
+        return {
+            'backend': connection.vendor,
+            'serializer': serializer_class.__name__,
+            'rows': count,
+            'serializer_rows_per_second': round(count / serializer_seconds, 1),
+            'rows_rows_per_second': round(count / rows_seconds, 1),
+            'speedup': round(serializer_seconds / rows_seconds, 2),
+            # Both include fetching the rows, so the comparison is end to end
+            'identical': list(timings['serializer'][1]) == timings['rows'][1],
+        }
@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.dataset import DatasetGenerator, MemoryCeilingExceeded
+
+
+class Command(BaseCommand):
+    help = ('Bulk-load a synthetic hotel catalog with rooms, booking histories, reviews and finance data. '
+            'Defaults are production scale; pass smaller counts for a quick dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=10_000)
+        parser.add_argument('--rooms', type=int, default=500_000, help='Rooms in total, spread over the hotels.')
+        parser.add_argument('--bookings', type=int, default=20_000_000, help='Bookings in total, spread over the rooms.')
+        parser.add_argument('--reviews', type=int, default=None, help='Defaults to one per 20 bookings.')
+        parser.add_argument('--clients', type=int, default=None, help='Client users. Defaults to one per 200 bookings.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed reproduces the data.')
+        parser.add_argument('--history-days', type=int, default=730, help='How far back stays and records go.')
+        parser.add_argument('--future-days', type=int, default=365, help='How far ahead reservations go.')
+        parser.add_argument('--batch-size', type=int, default=50_000, help='Rows per INSERT/COPY batch.')
+        parser.add_argument('--max-memory', type=int, default=1024,
+                            help='Abort when peak memory passes this many MB (0 disables the check).')
+        parser.add_argument('--json', action='store_true', help='Print the totals as JSON.')
+
+    def handle(self, *args, **options):
+        if options['hotels'] < 1 or options['rooms'] < 0 or options['bookings'] < 0:
+            raise CommandError('--hotels must be positive and --rooms/--bookings not negative.')
+        if options['bookings'] and not options['rooms']:
+            raise CommandError('Bookings need rooms; pass --rooms.')
+        reviews = options['reviews'] if options['reviews'] is not None else options['bookings'] // 20
+        clients = options['clients'] if options['clients'] is not None else max(options['bookings'] // 200, 100)
+
+        def report(message, done):
+            if options['verbosity'] > 0 and not options['json']:
+                self.stdout.write(message, ending='\n' if done else '\r')
+                self.stdout.flush()
+
+        generator = DatasetGenerator(
+            hotels=options['hotels'], rooms=options['rooms'], bookings=options['bookings'], reviews=reviews,
+            clients=clients, seed=options['seed'], history_days=options['history_days'],
+            future_days=options['future_days'], batch_size=options['batch_size'],
+            max_memory_mb=options['max_memory'] or None, report=report,
+        )
+        try:
+            totals = generator.run()
+        except MemoryCeilingExceeded as exc:
+            raise CommandError(str(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps(totals))
+            return
+        for key, value in totals.items():
+            self.stdout.write(f'{key:>16}: {value:,}' if isinstance(value, int) else f'{key:>16}: {value}')
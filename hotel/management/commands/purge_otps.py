@@ -0,0 +1,30 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotel.utils import purge_expired_otps
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Delete expired one-time passwords in bounded batches, once or every --interval seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement.')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running and purge every this many seconds. By default purge once and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            removed = purge_expired_otps(options['batch_size'], options['pause'])
+            self.stdout.write(f'Removed {removed} expired one-time password(s)')
+            if not options['interval']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                logger.info('OTP purge stopped')
+                return
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from hotel.uploads import purge_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were opened but never completed, with their part files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Age after which an open upload is abandoned.')
+
+    def handle(self, *args, **options):
+        removed = purge_stale_sessions(timedelta(hours=options['hours']))
+        self.stdout.write(f'Removed {removed} abandoned upload(s)')
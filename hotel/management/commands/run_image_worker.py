@@ -0,0 +1,49 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from hotel.media import pending_count, process_pending
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail, medium and large variants of uploaded hotel and room images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Rendering processes. Defaults to one per CPU.')
+        parser.add_argument('--batch-size', type=int, default=20, help='Uploads claimed per model and round.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when nothing is pending.')
+        parser.add_argument('--once', action='store_true', help='Process everything pending once and exit.')
+        parser.add_argument('--stats', action='store_true', help='Print the number of pending uploads and exit.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for model, count in pending_count().items():
+                self.stdout.write(f'{model:>8}: {count}')
+            return
+
+        # Workers only decode and encode images, but unpickling the task imports hotel.media
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup) as executor:
+            logger.info('Image worker started')
+            try:
+                while True:
+                    try:
+                        handled = process_pending(executor, options['batch_size'])
+                    except Exception:
+                        logger.exception('Image worker failed to process a batch')
+                        handled = 0
+                    finally:
+                        connection.close_if_unusable_or_obsolete()
+                    if not handled:
+                        if options['once']:
+                            break
+                        time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                pass
+        logger.info(f'Image worker stopped, pending: {pending_count()}')
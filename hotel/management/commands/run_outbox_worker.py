@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from hotel.outbox import dispatch_pending, queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails with a pool of worker threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Number of sending threads.')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'OUTBOX_BATCH_SIZE', 50),
+                            help='Messages sent per SMTP connection.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--stats', action='store_true', help='Print the queue depth and exit.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for status, count in queue_depth().items():
+                self.stdout.write(f'{status:>8}: {count}')
+            return
+
+        stop = threading.Event()
+
+        def work():
+            try:
+                while not stop.is_set():
+                    try:
+                        handled = dispatch_pending(options['batch_size'])
+                    except Exception:
+                        logger.exception('Outbox worker failed to dispatch a batch')
+                        handled = 0
+                    if not handled:
+                        if options['once']:
+                            return
+                        stop.wait(options['interval'])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        logger.info(f"Outbox worker started with {options['threads']} thread(s)")
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(min(options['interval'], 1.0))
+        except KeyboardInterrupt:
+            stop.set()
+        for thread in threads:
+            thread.join()
+        logger.info(f'Outbox worker stopped, queue depth: {queue_depth()}')
@@ -1,4 +1,7 @@
+from django.apps import apps
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+from django.db.models import Exists, OuterRef
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import validate_email
@@ -42,3 +45,23 @@ class UserManager(BaseUserManager):
         user = self.create_user(email, first_name, last_name, password, **extra_fields)
         user.save(using=self._db)
         return user
+
+
+class BookingQuerySet(models.QuerySet):
+    # Bookings in these states hold their room for the booked nights
+    ACTIVE_STATUSES = ('RESERVED', 'PAID')
+
+    def active(self):
+        return self.filter(payment_status__in=self.ACTIVE_STATUSES)
+
+    def overlapping(self, check_in, check_out):
+        # Stays are half-open [check_in, check_out), so a guest checking out
+        # on the day another checks in does not clash
+        return self.active().filter(check_in__lt=check_out, check_out__gt=check_in)
+
+
+class RoomQuerySet(models.QuerySet):
+    def available_between(self, check_in, check_out):
+        Booking = apps.get_model('hotel', 'Booking')
+        clashes = Booking.objects.overlapping(check_in, check_out).filter(room=OuterRef('pk'))
+        return self.filter(is_available=True).exclude(Exists(clashes))
@@ -0,0 +1,267 @@
+"""
+Uploaded hotel and room media: resized image variants, and serving files
+from MEDIA_ROOT.
+
+Uploads are stored as-is; the image worker (manage.py run_image_worker)
+later renders each one at a few sizes, as WebP and JPEG, in a pool of
+processes. Variants are named after a hash of their bytes, so a URL never
+changes meaning and can be cached by browsers and CDNs for a year.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+from pathlib import Path
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from PIL import Image, ImageOps
+
+from .cache import invalidate_catalog
+from .models import IMAGE_PENDING, Hotel, Room
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels, largest first: each size is scaled down from the previous one
+VARIANTS = {'large': 1600, 'medium': 800, 'thumbnail': 320}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'variants'
+IMAGE_MODELS = [Hotel, Room]
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Originals keep their name when replaced in place, so they are only cached briefly
+ORIGINAL_MAX_AGE = 'public, max-age=3600'
+# Chunk size when the server cannot sendfile(): memory per response stays at this
+STREAM_BLOCK_SIZE = 256 * 1024
+
+
+def render_variants(data):
+    """
+    Decode an image and encode every variant. Runs in a worker process, so
+    it only takes and returns bytes: {variant: {format: bytes, 'size': (w, h)}}.
+    Images are never scaled up.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # Apply the camera's rotation before the EXIF data is dropped
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    rendered = {}
+    for variant, edge in VARIANTS.items():
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        rendered[variant] = {'size': image.size}
+        for extension, (pil_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            rendered[variant][extension] = buffer.getvalue()
+    return rendered
+
+
+def variant_name(source, data, extension):
+    # hotel_images/a.png -> hotel_images/variants/<hash>.webp
+    folder = source.rsplit('/', 1)[0] if '/' in source else ''
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return '/'.join(filter(None, [folder, VARIANT_DIR, f'{digest}.{extension}']))
+
+
+def store_variants(source, rendered, storage=default_storage):
+    """
+    Save rendered variants and return what Model.image_variants records. A
+    name that already exists holds the same bytes, so it is not written again.
+    """
+    variants = {'source': source}
+    for variant, encoded in rendered.items():
+        width, height = encoded['size']
+        variants[variant] = {'width': width, 'height': height}
+        for extension in FORMATS:
+            name = variant_name(source, encoded[extension], extension)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(encoded[extension]))
+            variants[variant][extension] = name
+    return variants
+
+
+def read_image(name, storage=default_storage):
+    with storage.open(name, 'rb') as fh:
+        return fh.read()
+
+
+def pending_count():
+    return {model._meta.model_name: model.objects.filter(IMAGE_PENDING).count() for model in IMAGE_MODELS}
+
+
+def process_pending(executor, batch_size=20):
+    """
+    Render variants for up to `batch_size` pending uploads per model on
+    `executor` (normally a process pool). Returns the number handled.
+    """
+    handled = 0
+    for model in IMAGE_MODELS:
+        pending = list(model.objects.filter(IMAGE_PENDING).order_by('pk').values_list('pk', 'image')[:batch_size])
+        jobs = []
+        for pk, source in pending:
+            try:
+                jobs.append((pk, source, executor.submit(render_variants, read_image(source))))
+            except OSError as e:
+                jobs.append((pk, source, e))
+        for pk, source, job in jobs:
+            try:
+                if isinstance(job, Exception):
+                    raise job
+                variants = store_variants(source, job.result())
+            except Exception as e:
+                # Recorded so a broken upload is not picked up again
+                logger.error(f'Could not render variants of {model._meta.model_name} {pk} ({source}): {e}')
+                variants = {'source': source, 'error': str(e)}
+            # Only if the upload is still the one that was rendered; a newer one stays pending
+            model.objects.filter(pk=pk, image=source).update(image_variants=variants)
+        if pending:
+            # Hotel and room payloads (the catalog, available rooms) carry the variants
+            invalidate_catalog()
+        handled += len(pending)
+    return handled
+
+
+def variant_urls(variants, storage=default_storage):
+    """
+    The public form of Model.image_variants: {variant: {width, height, webp, jpeg}}
+    with URLs in place of storage names. Empty until the variants exist.
+    """
+    urls = {}
+    for variant in VARIANTS:
+        if variant in variants:
+            urls[variant] = {
+                key: storage.url(value) if key in FORMATS else value for key, value in variants[variant].items()
+            }
+    return urls
+
+
+class FileRange:
+    """
+    A window onto an open file for a 206 response: reads stop at the end of
+    the range, and fileno() lets a sendfile-capable server (gunicorn) send
+    it straight from the page cache, starting at the current offset.
+    """
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single `bytes=` range, inclusive, or None to send the
+    whole file (no header, several ranges, or a unit we don't know).
+    Raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = int(first), int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first and last and end < start:
+        # Malformed ("bytes=5-3"): ignored, like an unknown unit
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with single-range requests (206) and
+    conditional requests, so seeking in a video only fetches what is
+    played. The file is streamed from disk, never read into memory, and
+    sent with sendfile() where the server supports it.
+
+    With MEDIA_ACCEL_REDIRECT set (an internal nginx location aliased to
+    MEDIA_ROOT), only the headers are produced here and nginx sends the
+    body, ranges included.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        full_path = Path(safe_join(settings.MEDIA_ROOT, path))
+        stat = full_path.stat()
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('No such file')
+    if not S_ISREG(stat.st_mode):
+        raise Http404('No such file')
+
+    is_variant = f'/{VARIANT_DIR}/' in f'/{path}'
+    content_type = mimetypes.guess_type(full_path.name)[0] or 'application/octet-stream'
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        'Cache-Control': IMMUTABLE if is_variant else ORIGINAL_MAX_AGE,
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+    }
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT', '')
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(path)
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    size = stat.st_size
+    requested = request.headers.get('Range')
+    # If-Range: the client's partial copy is of an older version, so send it all
+    if_range = request.headers.get('If-Range')
+    if requested and if_range and if_range not in (etag, headers['Last-Modified']):
+        requested = None
+    try:
+        window = byte_range(requested, size)
+    except ValueError:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    fh = full_path.open('rb')
+    if window is None:
+        response = FileResponse(fh, content_type=content_type, headers=headers)
+    else:
+        start, end = window
+        response = FileResponse(FileRange(fh, start, end - start + 1), status=206,
+                                content_type=content_type, headers=headers)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        size = end - start + 1
+    response['Content-Length'] = str(size)
+    response.block_size = STREAM_BLOCK_SIZE
+    return response
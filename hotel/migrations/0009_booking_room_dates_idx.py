@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:36
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def reopen_rooms(apps, schema_editor):
+    # Room.is_available used to be cleared by saving a reserved booking and
+    # set again by cancelling it; it now only marks rooms taken out of
+    # service. Reopen the rooms a booking that was never cancelled closed,
+    # and leave the ones without such a booking as their admin set them.
+    Room = apps.get_model('hotel', 'Room')
+    Booking = apps.get_model('hotel', 'Booking')
+    booked = Booking.objects.filter(room_id=OuterRef('pk')).exclude(payment_status='CANCELLED')
+    Room.objects.filter(Exists(booked), is_available=False).update(is_available=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0008_onetimepassword_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'check_in', 'check_out'], name='booking_room_dates_idx'),
+        ),
+        migrations.RunPython(reopen_rooms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def add_overlap_constraint(apps, schema_editor):
+    # Postgres can refuse overlapping stays itself; other backends rely on
+    # the room lock taken in hotel.bookings.reserve_room
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        "ALTER TABLE hotel_booking ADD CONSTRAINT booking_no_overlap "
+        "EXCLUDE USING gist (room_id WITH =, daterange(check_in, check_out) WITH &&) "
+        "WHERE (payment_status IN ('RESERVED', 'PAID'))"
+    )
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE hotel_booking DROP CONSTRAINT IF EXISTS booking_no_overlap')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0009_booking_room_dates_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:38
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_created_at(apps, schema_editor):
+    # Existing rows all got the same default; space them a microsecond apart, in id order
+    now = django.utils.timezone.now()
+    for model_name in ('Hotel', 'Room', 'RoomCategory'):
+        model = apps.get_model('hotel', model_name)
+        rows = list(model.objects.order_by('id').only('id'))
+        for position, row in enumerate(rows):
+            row.created_at = now - timedelta(microseconds=len(rows) - position)
+        model.objects.bulk_update(rows, ['created_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_booking_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotel',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='roomcategory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['created_at', 'id'], name='hotel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['created_at', 'id'], name='room_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('rooms_paid', models.IntegerField(default=0)),
+                ('money_earned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rooms_cancelled', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='financereport',
+            index=models.Index(fields=['hotel', 'created_at'], name='finance_hotel_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyrevenue',
+            name='hotel',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='hotel.hotel'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('hotel', 'day'), name='daily_revenue_hotel_day'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0013_dailyrevenue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='onetimepassword',
+            name='code',
+            field=models.CharField(db_index=True, max_length=6),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_declined', False)), fields=['created_at', 'id'], name='hotel_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(condition=models.Q(('is_approved', False), ('is_declined', False)), fields=['created_at', 'id'], name='hotel_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['hotel', 'created_at'], name='review_hotel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['hotel', 'is_available'], name='room_hotel_available_idx'),
+        ),
+    ]
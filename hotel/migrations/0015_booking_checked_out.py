@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+def mark_checked_out(apps, schema_editor):
+    # Bookings checked out before the status existed only have the flag
+    Booking = apps.get_model('hotel', 'Booking')
+    Booking.objects.filter(is_checked_out=True).exclude(payment_status='CANCELLED').update(payment_status='CHECKED_OUT')
+
+
+def unmark_checked_out(apps, schema_editor):
+    Booking = apps.get_model('hotel', 'Booking')
+    Booking.objects.filter(payment_status='CHECKED_OUT').update(payment_status='PAID')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0014_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='payment_status',
+            field=models.CharField(choices=[('RESERVED', 'Reserved'), ('PAID', 'Paid'), ('CHECKED_OUT', 'Checked out'), ('CANCELLED', 'Cancelled')], default='RESERVED', max_length=11),
+        ),
+        migrations.RunPython(mark_checked_out, unmark_checked_out),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over hotel_hotel, kept in step by
+# triggers, plus a view of its vocabulary that search uses to correct typos.
+# Django rebuilds a table for some SQLite schema changes, which drops its
+# triggers, so a later migration that remakes hotel_hotel must run
+# SQLITE_TRIGGERS again.
+SQLITE_TABLES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hotel_search USING fts5("
+    "name, address, content='hotel_hotel', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hotel_search_vocab USING fts5vocab(hotel_search, 'row')",
+]
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS hotel_search_insert AFTER INSERT ON hotel_hotel BEGIN
+        INSERT INTO hotel_search(rowid, name, address) VALUES (new.id, new.name, new.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hotel_search_delete AFTER DELETE ON hotel_hotel BEGIN
+        INSERT INTO hotel_search(hotel_search, rowid, name, address) VALUES ('delete', old.id, old.name, old.address);
+    END
+    """,
+    # Only name/address changes touch the index, not approvals
+    """
+    CREATE TRIGGER IF NOT EXISTS hotel_search_update AFTER UPDATE OF name, address ON hotel_hotel BEGIN
+        INSERT INTO hotel_search(hotel_search, rowid, name, address) VALUES ('delete', old.id, old.name, old.address);
+        INSERT INTO hotel_search(rowid, name, address) VALUES (new.id, new.name, new.address);
+    END
+    """,
+]
+
+# PostgreSQL: expression indexes, which the database maintains on every write
+POSTGRES_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS hotel_search_tsv_idx ON hotel_hotel "
+    "USING gin (to_tsvector('simple', name || ' ' || address))",
+    'CREATE INDEX IF NOT EXISTS hotel_name_trgm_idx ON hotel_hotel USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS hotel_address_trgm_idx ON hotel_hotel USING gin (address gin_trgm_ops)',
+]
+
+
+def add_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQLITE_TABLES + SQLITE_TRIGGERS:
+            schema_editor.execute(sql)
+        schema_editor.execute("INSERT INTO hotel_search(hotel_search) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        for sql in POSTGRES_INDEXES:
+            schema_editor.execute(sql)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for event in ['insert', 'delete', 'update']:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS hotel_search_{event}')
+        schema_editor.execute('DROP TABLE IF EXISTS hotel_search_vocab')
+        schema_editor.execute('DROP TABLE IF EXISTS hotel_search')
+    elif vendor == 'postgresql':
+        for index in ['hotel_search_tsv_idx', 'hotel_name_trgm_idx', 'hotel_address_trgm_idx']:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0015_booking_checked_out'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
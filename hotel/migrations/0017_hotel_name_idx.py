@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0016_hotel_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['name', 'id'], name='hotel_name_idx'),
+        ),
+    ]
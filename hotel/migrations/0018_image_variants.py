@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:04
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search = import_module('hotel.migrations.0016_hotel_search')
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding a column with a default makes SQLite rebuild hotel_hotel, which drops its triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in search.SQLITE_TRIGGERS:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0017_hotel_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotel',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='room',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(condition=models.Q(('image_variants', {}), models.Q(('image', ''), _negated=True)), fields=['id'], name='hotel_image_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('image_variants', {}), models.Q(('image', ''), _negated=True)), fields=['id'], name='room_image_pending_idx'),
+        ),
+    ]
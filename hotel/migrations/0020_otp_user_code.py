@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0019_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='onetimepassword',
+            name='code',
+            field=models.CharField(max_length=6),
+        ),
+        migrations.AddIndex(
+            model_name='onetimepassword',
+            index=models.Index(fields=['user', 'code'], name='otp_user_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onetimepassword',
+            index=models.Index(fields=['created_at'], name='otp_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0020_otp_user_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomcategory',
+            index=models.Index(fields=['created_at', 'id'], name='category_created_idx'),
+        ),
+    ]
@@ -4,7 +4,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
-from .manager import UserManager
+from .manager import UserManager, RoomQuerySet, BookingQuerySet
 from rest_framework_simplejwt.tokens import RefreshToken
 
 AUTH_PROVIDERS = {'email': 'email', 'google': 'google'}
@@ -14,7 +14,23 @@ ROLE_CHOICES = [
     ('system_admin', 'System Admin'),
 ]
 
-class Hotel(models.Model):
+IMAGE_PENDING = models.Q(image_variants={}) & ~models.Q(image='')
+
+class ImageVariantsMixin(models.Model):
+    # Resized copies of `image`, written by the image worker (hotel/media.py).
+    # Empty until the current upload has been processed.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # A new upload, or a removed image, makes the old variants stale
+        if not self.image or not self.image._committed:
+            self.image_variants = {}
+        super().save(*args, **kwargs)
+
+class Hotel(ImageVariantsMixin, models.Model):
     name = models.CharField(max_length=255)
     address = models.TextField()
     is_approved = models.BooleanField(default=False)
@@ -22,6 +38,24 @@ class Hotel(models.Model):
     admin = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hotels')
     image = models.ImageField(upload_to='hotel_images/', null=True, blank=True)
     video = models.FileField(upload_to='hotel_videos/', null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='hotel_created_idx'),
+            models.Index(fields=['name', 'id'], name='hotel_name_idx'),
+            # The image worker's queue: uploads without variants yet
+            models.Index(fields=['id'], name='hotel_image_pending_idx', condition=IMAGE_PENDING),
+            # Partial indexes for the approved catalog and the moderation queue
+            models.Index(
+                fields=['created_at', 'id'], name='hotel_approved_idx',
+                condition=models.Q(is_approved=True, is_declined=False),
+            ),
+            models.Index(
+                fields=['created_at', 'id'], name='hotel_pending_idx',
+                condition=models.Q(is_approved=False, is_declined=False),
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -30,16 +64,34 @@ class RoomCategory(models.Model):
     hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='room_categories', default=0)
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='category_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
-class Room(models.Model):
+class Room(ImageVariantsMixin, models.Model):
     hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='rooms')
     category = models.ForeignKey(RoomCategory, on_delete=models.CASCADE, related_name='rooms')
     number = models.CharField(max_length=10)
+    # Whether the room can be booked at all (e.g. not closed for maintenance).
+    # Availability for particular dates comes from its bookings.
     is_available = models.BooleanField(default=True)
     image = models.ImageField(upload_to='room_images/', null=True, blank=True)
     video = models.FileField(upload_to='room_videos/', null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = RoomQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='room_created_idx'),
+            models.Index(fields=['hotel', 'is_available'], name='room_hotel_available_idx'),
+            models.Index(fields=['id'], name='room_image_pending_idx', condition=IMAGE_PENDING),
+        ]
 
     def __str__(self):
         return f"{self.hotel.name} - {self.number} - {self.category.name}"
@@ -47,27 +99,35 @@ class Booking(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('RESERVED', 'Reserved'),
         ('PAID', 'Paid'),
+        ('CHECKED_OUT', 'Checked out'),
         ('CANCELLED', 'Cancelled')
     ]
+    # Allowed status changes, see hotel.bookings.transition
+    TRANSITIONS = {
+        'RESERVED': ['PAID', 'CANCELLED'],
+        'PAID': ['CHECKED_OUT'],
+        'CHECKED_OUT': [],
+        'CANCELLED': [],
+    }
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings')
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='bookings')
     check_in = models.DateField()
     check_out = models.DateField()
-    payment_status = models.CharField(max_length=10, choices=PAYMENT_STATUS_CHOICES, default='RESERVED')
+    payment_status = models.CharField(max_length=11, choices=PAYMENT_STATUS_CHOICES, default='RESERVED')
     is_checked_out = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
-    def __str__(self):
-        return f"{self.user.username} - {self.room.hotel.name} - {self.room.category.name}"
+    objects = BookingQuerySet.as_manager()
 
-    def save(self, *args, **kwargs):
-        # Ensure room availability is updated when booking status changes
-        if self.payment_status == 'RESERVED':
-            self.room.is_available = False
-        elif self.payment_status == 'CANCELLED':
-            self.room.is_available = True
-        self.room.save()
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'check_in', 'check_out'], name='booking_room_dates_idx'),
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.room.hotel.name} - {self.room.category.name}"
 
 
 class Review(models.Model):
@@ -78,6 +138,12 @@ class Review(models.Model):
     response = models.TextField(null=True, blank=True)
     responded_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+            models.Index(fields=['hotel', 'created_at'], name='review_hotel_created_idx'),
+        ]
+
     def __str__(self):
         return f'Review by {self.client} on {self.hotel.name}'
 
@@ -87,9 +153,30 @@ class FinanceReport(models.Model):
     money_earned = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['hotel', 'created_at'], name='finance_hotel_created_idx'),
+        ]
+
     def __str__(self):
         return f'Finance report for {self.hotel.name}'
 
+class DailyRevenue(models.Model):
+    # Per-hotel, per-day totals kept up to date as bookings are paid or cancelled
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='daily_revenue')
+    day = models.DateField()
+    rooms_paid = models.IntegerField(default=0)
+    money_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rooms_cancelled = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'day'], name='daily_revenue_hotel_day'),
+        ]
+
+    def __str__(self):
+        return f'Revenue for {self.hotel_id} on {self.day}'
+
 class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(verbose_name=_('email address'), unique=True)
     first_name = models.CharField(verbose_name=_('first name'), max_length=30, blank=True)
@@ -110,6 +197,18 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
     
+    @property
+    def is_client(self):
+        return self.role == 'client'
+
+    @property
+    def is_hotel_admin(self):
+        return self.role == 'hotel_admin'
+
+    @property
+    def is_system_admin(self):
+        return self.role == 'system_admin'
+
     @property
     def get_full_name(self):
         full_name = f'{self.first_name} {self.last_name}'
@@ -117,15 +216,112 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     def tokens(self):
         refresh = RefreshToken.for_user(self)
+        # Carried into the access token so requests can be authorised
+        # without loading the user (see hotel.authentication.TokenPrincipal)
+        refresh['role'] = self.role
+        refresh['email'] = self.email
+        refresh['is_verified'] = self.is_verified
+        refresh['is_staff'] = self.is_staff
         return {
             'refresh': str(refresh),
             'access': str(refresh.access_token)
         }
 
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {", ".join(self.to)} ({self.status})'
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of a hotel or room image/video, sent as fixed-size
+    chunks in any order (see hotel/uploads.py).
+    """
+    TARGET_CHOICES = [
+        ('hotel', 'Hotel'),
+        ('room', 'Room'),
+    ]
+    FIELD_CHOICES = [
+        ('image', 'Image'),
+        ('video', 'Video'),
+    ]
+    STATUS_CHOICES = [
+        ('OPEN', 'Open'),
+        ('COMPLETE', 'Complete'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=5, choices=TARGET_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=5, choices=FIELD_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Optional sha256 of the whole file, checked when the upload completes
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default='OPEN')
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='upload_status_created_idx'),
+        ]
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def __str__(self):
+        return f'{self.filename} for {self.target} {self.object_id} ({self.status})'
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='upload_chunk_unique'),
+        ]
+
 class OneTimePassword(models.Model):
+    LIFETIME = timedelta(minutes=10)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    # Six digits repeat across users, so a code is only ever looked up with its user
     code = models.CharField(max_length=6)
-    created_at = models.DateTimeField(default=timezone.now)  
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'code'], name='otp_user_code_idx'),
+            # Expired codes are purged oldest first (hotel.utils.purge_expired_otps)
+            models.Index(fields=['created_at'], name='otp_created_idx'),
+        ]
+
     def is_valid(self):
-        expiration_time = self.created_at + timedelta(minutes=10)
-        return timezone.now() <= expiration_time
\ No newline at end of file
+        return timezone.now() <= self.created_at + self.LIFETIME
\ No newline at end of file
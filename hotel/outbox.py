@@ -0,0 +1,124 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# A claimed batch older than this belongs to a worker that died mid-send
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """
+    Queue an email for the outbox worker instead of talking SMTP in the request.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Atomically take up to `batch_size` due messages for this worker. The claim
+    is a conditional UPDATE, so concurrent workers never get the same row.
+    """
+    now = timezone.now()
+    stale = OutboundEmail.objects.filter(status='SENDING', claimed_at__lt=now - CLAIM_TIMEOUT)
+    for message in stale.only('pk', 'to', 'attempts', 'claim_token'):
+        # The send may have been what killed the worker: count it, or the message could be retried forever
+        if record_failure(message, 'Claim expired before the send was recorded', now, claim_token=message.claim_token):
+            logger.warning(f"Email {message.pk} to {message.to} was claimed by a worker that stopped; requeued")
+    due = list(
+        OutboundEmail.objects.filter(status='PENDING', next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    token = uuid.uuid4().hex
+    OutboundEmail.objects.filter(pk__in=due, status='PENDING').update(
+        status='SENDING', claim_token=token, claimed_at=now
+    )
+    # Only the rows just chosen can carry the token, so the pk index finds them
+    return list(OutboundEmail.objects.filter(pk__in=due, claim_token=token, status='SENDING'))
+
+
+def record_failure(message, error, now, **claim):
+    """
+    Count a failed attempt at `message`: it is retried with exponential
+    backoff until OUTBOX_MAX_ATTEMPTS is reached, then marked FAILED.
+    `claim` narrows the update to the claim the caller saw. Returns whether
+    the row was updated.
+    """
+    attempts = message.attempts + 1
+    give_up = attempts >= getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    retry_delay = getattr(settings, 'OUTBOX_RETRY_DELAY', 30)
+    return OutboundEmail.objects.filter(pk=message.pk, **claim).update(
+        status='FAILED' if give_up else 'PENDING',
+        attempts=attempts,
+        next_attempt_at=now + timedelta(seconds=retry_delay * 2 ** (attempts - 1)),
+        last_error=error,
+        claim_token='',
+    ) > 0
+
+
+def send_batch(messages):
+    """
+    Send claimed messages over a single SMTP connection, then record the
+    outcome of each. Failures are retried with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS is reached.
+    """
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+        for message in messages:
+            try:
+                EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=message.from_email,
+                    to=message.to,
+                    connection=connection,
+                ).send(fail_silently=False)
+                sent.append(message.pk)
+            except Exception as e:
+                failed.append((message, str(e)))
+    except Exception as e:
+        # Could not even connect: every message in the batch failed
+        failed = [(message, str(e)) for message in messages if message.pk not in sent]
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    if sent:
+        OutboundEmail.objects.filter(pk__in=sent).update(status='SENT', sent_at=now, claim_token='')
+    for message, error in failed:
+        record_failure(message, error, now)
+        logger.error(f"Error sending email {message.pk} to {message.to} (attempt {message.attempts + 1}): {error}")
+    return len(sent), len(failed)
+
+
+def dispatch_pending(batch_size=None):
+    """
+    Claim and send one batch. Returns the number of messages handled.
+    """
+    messages = claim_batch(batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50))
+    if messages:
+        send_batch(messages)
+    return len(messages)
+
+
+def queue_depth():
+    counts = dict(OutboundEmail.objects.values_list('status').annotate(n=Count('id')).order_by())
+    return {status: counts.get(status, 0) for status, _ in OutboundEmail.STATUS_CHOICES}
@@ -0,0 +1,118 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the indexed (created_at, id) columns, newest first.
+    Fetching page N costs the same as fetching the first page.
+
+    DRF's CursorPagination keeps only the first ordering field in the cursor
+    and steps over rows that share it with an OFFSET. Here the cursor holds
+    the whole ordering tuple, the pk always ends it, and a page is the rows
+    strictly after that tuple, so ties never cost an OFFSET.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        return unique_ordering(super().get_ordering(request, queryset, view))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if reverse:
+            queryset = queryset.order_by(*(flip(name) for name in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            try:
+                # The model fields parse the cursor's values as the filter is built
+                queryset = queryset.filter(self.after(self.cursor.position, reverse))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            # Walking back from a later page
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.cursor is not None, has_more
+        return self.page
+
+    def after(self, position, reverse):
+        """Q for the rows past `position` in the ordering, or before it when `reverse`."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return keyset_after(self.ordering, values, reverse)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Nothing comes before the cursor, so the next page is the first one
+            return self.encode_cursor(Cursor(offset=0, reverse=False, position=None))
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps(position_of(instance, ordering))
+
+
+def unique_ordering(ordering):
+    # The pk breaks ties in the direction of the last field, so every row has its own position
+    if any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+        return tuple(ordering)
+    return (*ordering, '-id' if ordering[-1].startswith('-') else 'id')
+
+
+def position_of(row, ordering):
+    # The row's ordering values as strings; the model fields parse them back in keyset_after()
+    values = []
+    for name in ordering:
+        field = name.lstrip('-')
+        value = row[field] if isinstance(row, dict) else getattr(row, field)
+        values.append(None if value is None else str(value))
+    return values
+
+
+def keyset_after(ordering, values, reverse=False):
+    """Q for the rows past `values` in `ordering`, or before them when `reverse`."""
+    # (a, b) < (x, y) is a < x, or a = x and b < y: one term per field
+    condition, equal = Q(pk__in=[]), {}
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') != reverse else 'gt'
+        condition |= Q(**equal, **{f'{field}__{lookup}': value})
+        equal[field] = value
+    return condition
+
+
+def flip(name):
+    return name[1:] if name.startswith('-') else f'-{name}'
@@ -1,23 +1,33 @@
 # users/permissions.py
 from rest_framework.permissions import BasePermission
 
+from .models import Hotel
+
 class IsSystemAdmin(BasePermission):
     """
     Permission class for system administrators.
     """
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == 'system_admin'
-class IsHotelAdmin(BasePermission):
+class HasHotelAdminRole(BasePermission):
     """
-    Permission class for hotel managers.
+    Hotel managers, with no object check: for views whose queryset is
+    already scoped to the caller's own objects.
     """
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == 'hotel_admin'
 
+class IsHotelAdmin(HasHotelAdminRole):
+    """
+    Permission class for hotel managers.
+    """
+
     def has_object_permission(self, request, view, obj):
         # Ensure hotel admin can only manage rooms if associated hotel is approved
-        if view.action in ['create', 'update', 'partial_update', 'destroy']:
-            return obj.admin == request.user and obj.admin.hotel.is_approved
+        if getattr(view, 'action', None) in ['create', 'update', 'partial_update', 'destroy']:
+            # Rooms and categories are checked against their hotel; select_related('hotel') keeps this query-free
+            hotel = obj if isinstance(obj, Hotel) else obj.hotel
+            return hotel.admin_id == request.user.pk and hotel.is_approved
         return True
 
 class IsClient(BasePermission):
@@ -0,0 +1,88 @@
+import logging
+import re
+from contextlib import ContextDecorator, nullcontext
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Transaction control is not a query: whether a BEGIN or SAVEPOINT shows up
+# depends on the backend and on whether a transaction is already open
+TRANSACTION_CONTROL = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not TRANSACTION_CONTROL.match(sql):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail if the wrapped block runs more than `max_queries` queries:
+
+        with query_budget(2):
+            client.get('/api/bookings/')
+
+        @query_budget(3)
+        def view(request): ...
+    """
+
+    def __init__(self, max_queries, label='block'):
+        self.max_queries = max_queries
+        self.label = label
+
+    def _recreate_cm(self):
+        # Decorated functions may run concurrently; give every call its own counter
+        return query_budget(self.max_queries, self.label)
+
+    def __enter__(self):
+        self.counter = QueryCounter()
+        self._wrapper = connection.execute_wrapper(self.counter)
+        self._wrapper.__enter__()
+        return self.counter
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        if exc_info[0] is None and self.counter.count > self.max_queries:
+            raise QueryBudgetExceeded(
+                f'{self.label} ran {self.counter.count} queries, its budget is {self.max_queries}'
+            )
+        return False
+
+
+class QueryBudgetMixin:
+    """
+    Per-action query budgets for API views, e.g. `query_budgets = {'list': 2}`.
+    Plain views are keyed by HTTP method ('get', 'post', ...). Going over
+    budget raises when QUERY_BUDGET_ENFORCE is on (development and tests)
+    and is logged otherwise. Enforced writes run in a transaction, so one
+    that goes over budget is rolled back rather than failing after commit.
+    """
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        enforce = getattr(settings, 'QUERY_BUDGET_ENFORCE', settings.DEBUG)
+        writes = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        counter = QueryCounter()
+        with transaction.atomic() if enforce and writes else nullcontext():
+            with connection.execute_wrapper(counter):
+                response = super().dispatch(request, *args, **kwargs)
+            key = getattr(self, 'action', None) or request.method.lower()
+            budget = self.query_budgets.get(key)
+            if budget is not None and counter.count > budget:
+                message = f'{self.__class__.__name__}.{key} ran {counter.count} queries, its budget is {budget}'
+                if enforce:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+        return response
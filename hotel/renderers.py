@@ -0,0 +1,71 @@
+"""
+JSON renderer and parser backed by orjson, several times faster than the
+json module on large lists. Output is byte-for-byte what DRF's
+JSONRenderer produces with the default settings (compact, UTF-8, U+2028/
+U+2029 escaped); anything orjson would encode differently goes through
+DRF's own encoder. The one exception is NaN and infinity, which DRF
+refuses to encode and orjson writes as null. Without orjson installed
+both classes behave exactly like DRF's.
+"""
+import codecs
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Dates and times are handed to DRF's encoder, which formats them its own way
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# Floats the json module writes in exponent form (1e+16, 1e-07) come out of
+# orjson as 1e16, 1e-7 or 0.00001. A match may also be text inside a string,
+# which only costs a fallback.
+FLOAT_MISMATCH = re.compile(rb'(?:^|[:\[,])-?(?:[0-9.]+e|0\.0000)')
+
+
+def can_use_orjson():
+    # orjson matches only the default output: compact, non-ASCII kept, NaN rejected
+    return (
+        orjson is not None
+        and api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.STRICT_JSON
+        and getattr(settings, 'FAST_JSON', True)
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not can_use_orjson() or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, ValueError):
+            # Integers beyond 64 bits and the like: let the json module decide
+            return super().render(data, accepted_media_type, renderer_context)
+        if FLOAT_MISMATCH.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Valid JSON but not valid JavaScript; DRF escapes them too
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (ValueError, LookupError) as exc:
+            # orjson.JSONDecodeError and UnicodeDecodeError are ValueErrors
+            raise ParseError('JSON parse error - %s' % str(exc))
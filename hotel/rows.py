@@ -0,0 +1,124 @@
+"""
+A read-only serialization path for list endpoints.
+
+A ModelSerializer builds each object with a get_attribute() and a
+to_representation() call per field, on a model instance that was itself
+built from the row. For serializers made only of columns and foreign keys
+that is mostly overhead: here the fields are compiled once per request into
+(name, column, converter) triples, rows are fetched with values(), and each
+dict is built in one loop. Values still go through the field's own
+to_representation(), so the output is exactly the serializer's.
+
+Serializers with anything else (method fields, file fields, nested or
+dotted sources, a custom to_representation) are served the usual way.
+"""
+from datetime import date
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from .fieldsets import SAFE_METHODS, ordering_names
+
+# Fields whose to_representation() is exactly this builtin
+BUILTIN_CONVERTERS = {
+    serializers.IntegerField.to_representation: int,
+    serializers.CharField.to_representation: str,
+}
+
+
+def converter(field):
+    method = type(field).to_representation
+    if method is serializers.ReadOnlyField.to_representation:
+        return None
+    if method is serializers.DateField.to_representation:
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format and output_format.lower() == ISO_8601:
+            return date.isoformat
+    return BUILTIN_CONVERTERS.get(method, field.to_representation)
+
+
+def compile_fields(serializer, model):
+    """
+    [(field name, values() column, converter or None)] for `serializer`, or
+    None when it reads anything but the model's own columns.
+    """
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return None
+    compiled = []
+    for field in serializer._readable_fields:
+        if field.source == '*' or '.' in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many or isinstance(model_field, FileField):
+            return None
+        if model_field.is_relation:
+            # The stored key is the representation only for a plain pk field to the related pk
+            if (not isinstance(field, PrimaryKeyRelatedField) or field.pk_field is not None
+                    or not model_field.target_field.primary_key):
+                return None
+            compiled.append((field.field_name, model_field.attname, None))
+        else:
+            compiled.append((field.field_name, model_field.attname, converter(field)))
+    return compiled
+
+
+def represent_rows(rows, compiled):
+    data = []
+    for row in rows:
+        item = {}
+        for name, column, convert in compiled:
+            value = row[column]
+            # Like Serializer.to_representation, None is never converted
+            item[name] = value if value is None or convert is None else convert(value)
+        data.append(item)
+    return data
+
+
+class RowListSerializer:
+    """Stands in for `serializer_class(rows, many=True)` where only .data is read."""
+    many = True
+
+    def __init__(self, rows, compiled):
+        self.instance = rows
+        self.compiled = compiled
+
+    @property
+    def data(self):
+        return ReturnList(represent_rows(self.instance, self.compiled), serializer=self)
+
+
+class RowListViewMixin:
+    """
+    View mixin: GET list actions fetch values() and serialize the rows with
+    compiled fields. Listed before SparseFieldsetViewMixin, so a sparse
+    fieldset narrows the compiled fields and values() replaces its only().
+    """
+    row_fields = None
+
+    def is_row_list(self):
+        # Plain list views (ListAPIView) have no action
+        return self.request.method in SAFE_METHODS and getattr(self, 'action', 'list') == 'list'
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.is_row_list():
+            return queryset
+        self.row_fields = compile_fields(self.get_serializer(), queryset.model)
+        if self.row_fields is None:
+            return queryset
+        columns = [column for _, column, _ in self.row_fields]
+        # The cursor paginator reads its position from the row
+        columns += [name for name in ordering_names(queryset, self.paginator) if name not in columns]
+        return queryset.values(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many') and self.row_fields is not None:
+            return RowListSerializer(args[0], self.row_fields)
+        return super().get_serializer(*args, **kwargs)
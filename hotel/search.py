@@ -0,0 +1,134 @@
+import re
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Hotel, Room
+
+MAX_TERMS = 8
+# Typo tolerance on SQLite: at most this many corrections per term
+MAX_CORRECTIONS = 5
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions
+    and swapped neighbours), or limit + 1 once it is known to be over `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def allowed_typos(term):
+    return 1 if len(term) <= 5 else 2
+
+
+def search_hotels(query, limit=20):
+    """
+    Approved, bookable hotels matching `query` on name or address, best
+    match first. Terms match whole words or word prefixes ("sea" finds
+    "Seaside"); when that finds too little, near misses ("seasdie",
+    "coarl") fill the remaining places. Names count for more than addresses.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'postgresql':
+        ids = _postgres_search(terms, limit)
+    elif connection.vendor == 'sqlite':
+        ids = _sqlite_search(terms, limit)
+    else:
+        return _fallback_search(terms, limit)
+    hotels = Hotel.objects.in_bulk(ids)
+    return [hotels[pk] for pk in ids if pk in hotels]
+
+
+# Appended to every search: only hotels the approved catalog would list
+CATALOG_FILTER = (
+    'h.is_approved AND NOT h.is_declined AND EXISTS (SELECT 1 FROM hotel_room r WHERE r.hotel_id = h.id)'
+)
+
+
+def _sqlite_search(terms, limit):
+    with connection.cursor() as cursor:
+        ids = _sqlite_match(cursor, [f'"{term}"*' for term in terms], limit)
+        if len(ids) >= limit:
+            return ids
+        # Typo tolerance: swap in indexed words within a small edit distance.
+        # Only words sharing the term's first letter are compared, which keeps
+        # the vocabulary scan short.
+        initials = sorted({term[0] for term in terms})
+        cursor.execute(
+            ' UNION ALL '.join(['SELECT term FROM hotel_search_vocab WHERE term >= %s AND term < %s'] * len(initials)),
+            [bound for initial in initials for bound in (initial, chr(ord(initial) + 1))],
+        )
+        vocabulary = [word for (word,) in cursor.fetchall()]
+        groups = []
+        for term in terms:
+            close = sorted(
+                (distance, word) for word in vocabulary
+                if word[0] == term[0]
+                and (distance := edit_distance(term, word, allowed_typos(term))) <= allowed_typos(term)
+            )
+            alternatives = [f'"{term}"*'] + [f'"{word}"' for _, word in close[:MAX_CORRECTIONS]]
+            groups.append('(' + ' OR '.join(alternatives) + ')')
+        if groups == [f'("{term}"*)' for term in terms]:
+            return ids
+        more = _sqlite_match(cursor, groups, limit + len(ids))
+    return ids + [pk for pk in more if pk not in ids][:limit - len(ids)]
+
+
+def _sqlite_match(cursor, groups, limit):
+    cursor.execute(
+        f'SELECT h.id FROM hotel_search JOIN hotel_hotel h ON h.id = hotel_search.rowid '
+        f'WHERE hotel_search MATCH %s AND {CATALOG_FILTER} '
+        f'ORDER BY bm25(hotel_search, 10.0, 1.0) LIMIT %s',
+        [' AND '.join(groups), limit],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_search(terms, limit):
+    # Prefix tsquery for whole-word matches plus trigram word similarity for typos;
+    # both predicates are served by the indexes from migration 0016
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    text = ' '.join(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT h.id FROM hotel_hotel h
+            WHERE ({CATALOG_FILTER})
+              AND (to_tsvector('simple', h.name || ' ' || h.address) @@ to_tsquery('simple', %s)
+                   OR %s <%% h.name OR %s <%% h.address)
+            ORDER BY ts_rank(to_tsvector('simple', h.name || ' ' || h.address), to_tsquery('simple', %s))
+                     + 2 * word_similarity(%s, h.name) + word_similarity(%s, h.address) DESC, h.id
+            LIMIT %s
+            """,
+            [tsquery, text, text, tsquery, text, text, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_search(terms, limit):
+    # Unindexed substring search for backends without a search index
+    queryset = Hotel.objects.filter(
+        Exists(Room.objects.filter(hotel_id=OuterRef('pk'))), is_approved=True, is_declined=False,
+    )
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(address__icontains=term))
+    return list(queryset.order_by('name', 'id')[:limit])
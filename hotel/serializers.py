@@ -1,5 +1,7 @@
+import re
+
 from rest_framework import serializers
-from .models import User, Hotel, Review, FinanceReport, Room, Booking, RoomCategory, ROLE_CHOICES, OneTimePassword
+from .models import User, Hotel, Review, FinanceReport, DailyRevenue, Room, Booking, RoomCategory, ROLE_CHOICES, OneTimePassword, UploadSession
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth import authenticate
 from django.conf import settings
@@ -9,50 +11,123 @@ from django.contrib.sites.shortcuts import get_current_site
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.urls import reverse
 from .utils import send_email, Google, register_social_user
+from .bookings import reschedule, reserve_room, reserve_rooms
+from .authentication import get_user_instance
+from .fieldsets import SparseFieldsetMixin
+from .media import variant_urls
+from .uploads import open_session
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 
-class HotelSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of the resized copies of `image`, e.g. {"thumbnail": {"webp": ..., "jpeg": ..., "width": 320, ...}}."""
+
+    def to_representation(self, value):
+        return variant_urls(value)
+
+class HotelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Hotel
-        fields = ['name', 'address','id']
-class ReviewSerializer(serializers.ModelSerializer):
+        fields = ['name', 'address','id', 'image_variants']
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = '__all__'
 
-class FinanceReportSerializer(serializers.ModelSerializer):
+class FinanceReportSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = FinanceReport
         fields = '__all__'
 
-class RoomCategorySerializer(serializers.ModelSerializer):
+class DailyRevenueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DailyRevenue
+        fields = ['hotel', 'day', 'rooms_paid', 'money_earned', 'rooms_cancelled']
+
+class RoomCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = RoomCategory
         fields = '__all__'
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Room
         fields = '__all__'
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = '__all__'
-        read_only_fields = ['user'] 
+        # Status changes go through the pay/cancel/checkout actions
+        read_only_fields = ['user', 'payment_status', 'is_checked_out']
+        # Browsable API forms label each room choice with Room.__str__
+        extra_kwargs = {'room': {'queryset': Room.objects.select_related('hotel', 'category')}}
 
     def validate(self, data):
-        room = data['room']
+        room = data.get('room', getattr(self.instance, 'room', None))
+        check_in = data.get('check_in', getattr(self.instance, 'check_in', None))
+        check_out = data.get('check_out', getattr(self.instance, 'check_out', None))
+        if check_in >= check_out:
+            raise serializers.ValidationError("Check-out must be after check-in.")
         if not room.is_available:
             raise serializers.ValidationError("This room is not available.")
+        clashes = Booking.objects.overlapping(check_in, check_out).filter(room=room)
+        if self.instance is not None:
+            clashes = clashes.exclude(pk=self.instance.pk)
+        if clashes.exists():
+            raise serializers.ValidationError("This room is already booked for the selected dates.")
         return data
 
     def create(self, validated_data):
-        room = validated_data['room']
-        booking = Booking.objects.create(**validated_data)
-        room.is_available = False
-        room.save()
-        return booking
+        # validate() ran without locks; reserve_room re-checks under the room lock
+        return reserve_room(**validated_data)
+
+    def update(self, instance, validated_data):
+        return reschedule(instance, **validated_data)
+
+class UploadSessionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    chunk_count = serializers.IntegerField(read_only=True)
+    # Lets a client resume: everything else still has to be sent
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'target', 'object_id', 'field', 'filename', 'size', 'chunk_size', 'chunk_count', 'sha256',
+            'status', 'created_at', 'completed_at', 'received_chunks',
+        ]
+        read_only_fields = ['status', 'created_at', 'completed_at']
+
+    def get_received_chunks(self, session):
+        return sorted(chunk.index for chunk in session.chunks.all())
+
+    def validate_sha256(self, value):
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError('Expected a hex sha256 digest.')
+        return value
+
+    def create(self, validated_data):
+        return open_session(user=self.context['request'].user, **validated_data)
+
+class GroupBookingItemSerializer(serializers.Serializer):
+    # A plain id: rooms are resolved and locked in one query by reserve_rooms
+    room = serializers.IntegerField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+
+    def validate(self, data):
+        if data['check_in'] >= data['check_out']:
+            raise serializers.ValidationError("Check-out must be after check-in.")
+        return data
+
+class GroupBookingSerializer(serializers.Serializer):
+    bookings = GroupBookingItemSerializer(many=True, allow_empty=False, max_length=200)
+
+    def create(self, validated_data):
+        return reserve_rooms(validated_data['user'], validated_data['bookings'])
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(max_length=68, min_length=6, write_only=True)
@@ -227,7 +302,7 @@ class DeleteAccountSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         password = attrs.get('password', '')
-        user = self.context['request'].user
+        user = get_user_instance(self.context['request'].user)
         
         if not user.check_password(password):
             raise serializers.ValidationError('Incorrect password, please try again')
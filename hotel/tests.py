@@ -1,3 +1,1450 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import re
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+import rsa
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail, signals
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.wsgi import get_wsgi_application
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import close_old_connections, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from google.auth import crypt, jwt as google_jwt
+from PIL import Image
+from rest_framework.exceptions import ErrorDetail, ParseError, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+from rest_framework.test import APIClient
+
+from . import benchmark, media, uploads, utils
+from .authentication import active_user_key, auth_cache
+from .bookings import reserve_room, transition
+from .cache import catalog_cache, invalidate_catalog
+from .dataset import DatasetGenerator
+from .search import search_hotels
+from .models import (
+    Hotel, RoomCategory, Room, Booking, Review, User, OneTimePassword, OutboundEmail, DailyRevenue, UploadChunk,
+    UploadSession,
+)
+from .outbox import dispatch_pending, queue_depth
+from .querybudget import QueryBudgetExceeded, query_budget
+from .renderers import FastJSONParser, FastJSONRenderer
+from .rows import compile_fields
+from .throttling import local_buckets, parse_rate, throttle_cache
+from .serializers import BookingSerializer, HotelSerializer, ReviewSerializer, RoomSerializer
+from .views import BookingViewSet
+
+
+class HotelFixturesMixin:
+    def setUp(self):
+        catalog_cache().clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', first_name='Hotel', last_name='Admin',
+            password='secret123', role='hotel_admin', is_verified=True,
+        )
+        self.client_user = User.objects.create_user(
+            email='client@example.com', first_name='Jane', last_name='Client',
+            password='secret123', is_verified=True,
+        )
+        self.hotel = Hotel.objects.create(name='Seaside', address='1 Beach Road', admin=self.admin, is_approved=True)
+        self.category = RoomCategory.objects.create(hotel=self.hotel, name='Double', price='100.00')
+        self.room = Room.objects.create(hotel=self.hotel, category=self.category, number='101')
+        # A real access token, so requests go through ActiveTokenAuthentication and see a TokenPrincipal
+        self.api = self.bearer(self.client_user)
+
+    def bearer(self, user):
+        # Authenticates through ActiveTokenAuthentication, as a real client does
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {user.tokens()['access']}")
+        return api
+
+    def book(self, room, check_in, check_out, **extra):
+        return Booking.objects.create(user=self.client_user, room=room, check_in=check_in, check_out=check_out, **extra)
+
+
+class RoomAvailabilityTests(HotelFixturesMixin, TestCase):
+    def test_booking_only_blocks_its_own_dates(self):
+        self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        free = Room.objects.available_between(date(2030, 5, 12), date(2030, 5, 14))
+        taken = Room.objects.available_between(date(2030, 5, 11), date(2030, 5, 13))
+        self.assertIn(self.room, free)
+        self.assertNotIn(self.room, taken)
+
+    def test_cancelled_booking_frees_dates(self):
+        self.book(self.room, date(2030, 5, 10), date(2030, 5, 12), payment_status='CANCELLED')
+        self.assertIn(self.room, Room.objects.available_between(date(2030, 5, 10), date(2030, 5, 12)))
+
+    def test_available_rooms_view_filters_by_dates(self):
+        self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        url = reverse('available-rooms')
+        response = self.api.get(url, {'hotel_id': self.hotel.id, 'check_in': '2030-05-11', 'check_out': '2030-05-12'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        response = self.api.get(url, {'hotel_id': self.hotel.id, 'check_in': '2030-06-01', 'check_out': '2030-06-03'})
+        self.assertEqual([room['id'] for room in response.data['results']], [self.room.id])
+
+    def test_overlapping_booking_is_rejected(self):
+        self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        response = self.api.post(reverse('booking-list'), {
+            'room': self.room.id, 'check_in': '2030-05-11', 'check_out': '2030-05-15',
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.api.post(reverse('booking-list'), {
+            'room': self.room.id, 'check_in': '2030-05-12', 'check_out': '2030-05-15',
+        })
+        self.assertEqual(response.status_code, 201)
+
+
+class ReserveRoomTests(HotelFixturesMixin, TestCase):
+    def test_rejects_clash_found_under_lock(self):
+        reserve_room(self.client_user, self.room, date(2030, 5, 10), date(2030, 5, 12))
+        with self.assertRaises(ValidationError):
+            reserve_room(self.client_user, self.room, date(2030, 5, 11), date(2030, 5, 12))
+        self.assertEqual(Booking.objects.filter(room=self.room).count(), 1)
+
+
+class BookingStateTests(HotelFixturesMixin, TestCase):
+    def test_transitions_write_only_the_booking_status(self):
+        booking = self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        with CaptureQueriesContext(connection) as queries:
+            transition(booking, 'PAID')
+        writes = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"hotel_booking"', writes[0])
+        self.assertNotIn('"check_in"', writes[0])
+        self.assertEqual(Booking.objects.get(pk=booking.pk).payment_status, 'PAID')
+
+    def test_invalid_and_stale_transitions_are_rejected(self):
+        booking = self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        with self.assertRaises(ValidationError):
+            transition(booking, 'CHECKED_OUT')
+        stale = Booking.objects.get(pk=booking.pk)
+        transition(booking, 'CANCELLED')
+        with self.assertRaises(ValidationError):
+            transition(stale, 'PAID')
+        self.assertEqual(Booking.objects.get(pk=booking.pk).payment_status, 'CANCELLED')
+
+    def test_checkout_follows_payment(self):
+        booking = self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        url = reverse('booking-checkout', args=[booking.pk])
+        self.assertEqual(self.api.post(url).status_code, 400)
+        self.api.post(reverse('booking-pay', args=[booking.pk]), {'payment_amount': '100.00'})
+        self.assertEqual(self.api.post(url).status_code, 200)
+        booking.refresh_from_db()
+        self.assertEqual(booking.payment_status, 'CHECKED_OUT')
+        self.assertTrue(booking.is_checked_out)
+
+    def test_reschedule_rechecks_availability(self):
+        booking = self.book(self.room, date(2030, 5, 10), date(2030, 5, 12))
+        self.book(self.room, date(2030, 5, 14), date(2030, 5, 16))
+        url = reverse('booking-detail', args=[booking.pk])
+        response = self.api.patch(url, {'check_out': '2030-05-15'})
+        self.assertEqual(response.status_code, 400)
+        response = self.api.patch(url, {'check_out': '2030-05-14', 'payment_status': 'PAID'})
+        self.assertEqual(response.status_code, 200)
+        booking.refresh_from_db()
+        self.assertEqual(booking.check_out, date(2030, 5, 14))
+        self.assertEqual(booking.payment_status, 'RESERVED')
+
+
+class GroupBookingTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.rooms = [self.room] + [
+            Room.objects.create(hotel=self.hotel, category=self.category, number=str(200 + i)) for i in range(39)
+        ]
+
+    def group_payload(self, rooms, check_in='2030-07-01', check_out='2030-07-04'):
+        return {'bookings': [{'room': room.id, 'check_in': check_in, 'check_out': check_out} for room in rooms]}
+
+    def test_books_a_block_in_a_constant_number_of_queries(self):
+        with self.assertNumQueries(6):
+            response = self.api.post(reverse('booking-group'), self.group_payload(self.rooms), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 40)
+        self.assertEqual(Booking.objects.count(), 40)
+
+    def test_block_is_all_or_nothing(self):
+        self.book(self.rooms[-1], date(2030, 7, 3), date(2030, 7, 5))
+        response = self.api.post(reverse('booking-group'), self.group_payload(self.rooms), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['rooms'], [str(self.rooms[-1].id)])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_rejects_overlapping_stays_within_the_request(self):
+        payload = self.group_payload([self.room])
+        payload['bookings'].append({'room': self.room.id, 'check_in': '2030-07-02', 'check_out': '2030-07-03'})
+        response = self.api.post(reverse('booking-group'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Booking.objects.count(), 0)
+
+
+class CursorPaginationTests(HotelFixturesMixin, TestCase):
+    def test_walks_bookings_newest_first_without_gaps(self):
+        bookings = [self.book(self.room, date(2030, 8, day), date(2030, 8, day + 1)) for day in range(1, 6)]
+        seen = []
+        url = reverse('booking-list') + '?page_size=2'
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(booking['id'] for booking in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [booking.id for booking in reversed(bookings)])
+
+    def test_rows_sharing_created_at_are_paged_by_id_without_offset(self):
+        for day in range(1, 6):
+            self.book(self.room, date(2030, 8, day), date(2030, 8, day + 1))
+        Booking.objects.update(created_at=timezone.now())
+        expected = list(Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        pages, url = [], reverse('booking-list') + '?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.get(url)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+            pages.append([booking['id'] for booking in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(sum(pages, []), expected)
+
+        # Walking back from the last page returns the same pages
+        url, back = response.data['previous'], []
+        while url:
+            response = self.api.get(url)
+            back.insert(0, [booking['id'] for booking in response.data['results']])
+            url = response.data['previous']
+        self.assertEqual(back, pages[:-1])
+
+    def test_other_orderings_are_tied_by_id(self):
+        for number in range(4):
+            hotel = Hotel.objects.create(name='Twin', address=f'{number} Pier', admin=self.admin, is_approved=True)
+            Room.objects.create(hotel=hotel, category=self.category, number='1')
+        invalidate_catalog()
+        seen, url = [], reverse('approved-hotels') + '?ordering=name&page_size=2'
+        while url:
+            response = self.api.get(url)
+            seen += [hotel['id'] for hotel in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, list(Hotel.objects.order_by('name', 'id').values_list('id', flat=True)))
+
+    def test_malformed_cursor_is_not_found(self):
+        for position in ['nope', '["2030-01-01", "1", "2"]', '["not a date", "1"]']:
+            cursor = base64.b64encode(urlencode({'p': position}).encode()).decode()
+            response = self.api.get(reverse('booking-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+class CatalogCacheTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.system_admin = User.objects.create_user(
+            email='root@example.com', first_name='Sys', last_name='Admin',
+            password='secret123', role='system_admin', is_verified=True,
+        )
+        self.other = Hotel.objects.create(name='Hilltop', address='2 Hill Road', admin=self.admin)
+        other_category = RoomCategory.objects.create(hotel=self.other, name='Single', price='80.00')
+        Room.objects.create(hotel=self.other, category=other_category, number='1')
+
+    def approved_names(self):
+        response = self.api.get(reverse('approved-hotels'))
+        self.assertEqual(response.status_code, 200)
+        return [hotel['name'] for hotel in response.data['results']]
+
+    def test_repeat_reads_skip_the_database(self):
+        self.assertEqual(self.approved_names(), ['Seaside'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.approved_names(), ['Seaside'])
+
+    def test_approval_invalidates_the_catalog(self):
+        self.assertEqual(self.approved_names(), ['Seaside'])
+        admin_api = self.bearer(self.system_admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = admin_api.post(reverse('approve-hotel', args=[self.other.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.approved_names(), ['Hilltop', 'Seaside'])
+
+    def test_stay_filtered_results_follow_bookings(self):
+        stay = {'check_in': '2030-03-01', 'check_out': '2030-03-02'}
+        auth = {'Authorization': f"Bearer {self.client_user.tokens()['access']}"}
+        self.assertEqual([hotel['name'] for hotel in self.api.get(reverse('approved-hotels'), stay).data['results']],
+                         ['Seaside'])
+        etag = self.api.get(reverse('approved-hotels'), stay)['ETag']
+        async_etag = self.client.get(reverse('async-approved-hotels'), stay, headers=auth)['ETag']
+        self.assertEqual(self.api.get(reverse('approved-hotel-facets'), stay).data['categories'],
+                         [{'name': 'double', 'hotels': 1}])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_room(self.client_user, self.room, date(2030, 3, 1), date(2030, 3, 2))
+
+        # Seaside's only room is taken: neither the cache nor a 304 may keep it listed
+        response = self.api.get(reverse('approved-hotels'), stay, headers={'If-None-Match': etag})
+        self.assertEqual((response.status_code, response.data['results']), (200, []))
+        response = self.client.get(reverse('async-approved-hotels'), stay, headers={**auth, 'If-None-Match': async_etag})
+        self.assertEqual((response.status_code, response.json()['results']), (200, []))
+        self.assertEqual(self.api.get(reverse('approved-hotel-facets'), stay).data['categories'], [])
+
+    def test_category_changes_invalidate_the_catalog(self):
+        self.assertEqual(self.approved_names(), ['Seaside'])
+        self.assertEqual(self.api.get(reverse('approved-hotels'), {'max_price': 90}).data['results'], [])
+        admin_api = self.bearer(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = admin_api.patch(reverse('roomcategory-detail', args=[self.category.id]), {'price': '85.00'})
+        self.assertEqual(response.status_code, 200)
+        response = self.api.get(reverse('approved-hotels'), {'max_price': 90})
+        self.assertEqual([hotel['name'] for hotel in response.data['results']], ['Seaside'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(admin_api.delete(reverse('roomcategory-detail', args=[self.category.id])).status_code, 204)
+        self.assertEqual(self.approved_names(), [])
+
+
+class RefusingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        throttle_cache().clear()
+
+    def register(self):
+        return APIClient().post(reverse('register'), {
+            'email': 'new@example.com', 'first_name': 'New', 'last_name': 'Guest',
+            'password': 'secret123', 'password2': 'secret123',
+        })
+
+    def test_signup_queues_the_otp_and_the_worker_sends_it(self):
+        self.assertEqual(self.register().status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(queue_depth()['PENDING'], 1)
+
+        self.assertEqual(dispatch_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertEqual(queue_depth()['SENT'], 1)
+        self.assertEqual(dispatch_pending(), 0)
+
+    @override_settings(EMAIL_BACKEND='hotel.tests.RefusingEmailBackend', OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_sends_back_off_then_give_up(self):
+        self.register()
+        self.assertEqual(dispatch_pending(), 1)
+        message = OutboundEmail.objects.get()
+        self.assertEqual((message.status, message.attempts), ('PENDING', 1))
+        self.assertGreater(message.next_attempt_at, message.created_at)
+        self.assertEqual(dispatch_pending(), 0)
+
+        OutboundEmail.objects.update(next_attempt_at=message.created_at)
+        self.assertEqual(dispatch_pending(), 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('FAILED', 2))
+        self.assertIn('SMTP server unavailable', message.last_error)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_stale_claims_count_as_attempts(self):
+        self.register()
+        message = OutboundEmail.objects.get()
+        # A worker claimed it and died before recording the send
+        stale = timezone.now() - timedelta(minutes=11)
+        OutboundEmail.objects.update(status='SENDING', claim_token='dead', claimed_at=stale)
+        self.assertEqual(dispatch_pending(), 0)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.claim_token), ('PENDING', 1, ''))
+        self.assertGreater(message.next_attempt_at, timezone.now())
+
+        OutboundEmail.objects.update(status='SENDING', claim_token='dead', claimed_at=stale)
+        self.assertEqual(dispatch_pending(), 0)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('FAILED', 2))
+        self.assertEqual(mail.outbox, [])
+
+
+class GoogleTokenTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        public_key, private_key = rsa.newkeys(1024)
+        cls.signer = crypt.RSASigner.from_string(private_key.save_pkcs1().decode(), key_id='stub-key')
+        cls.key_set = {'stub-key': public_key.save_pkcs1().decode()}
+
+    def setUp(self):
+        self.fetches = 0
+        self.certs = utils.GoogleCertCache(fetch=self.fetch_stub_keys)
+        patcher = mock.patch.object(utils, 'google_certs', self.certs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch_stub_keys(self):
+        self.fetches += 1
+        return self.key_set, {'Cache-Control': 'public, max-age=600, must-revalidate', 'Age': '100'}
+
+    def make_token(self, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': 'cid', 'sub': '42',
+            'email': 'guest@example.com', 'iat': now, 'exp': now + 300, **claims,
+        }
+        return google_jwt.encode(self.signer, payload).decode()
+
+    def test_keys_are_fetched_once_and_reused(self):
+        for _ in range(3):
+            self.assertEqual(utils.Google.validate_google_token(self.make_token())['sub'], '42')
+        self.assertEqual(self.fetches, 1)
+
+    def test_keys_are_refetched_after_max_age(self):
+        utils.Google.validate_google_token(self.make_token())
+        # max-age 600 minus Age 100
+        self.assertAlmostEqual(self.certs._expires_at - self.certs._fetched_at, 500)
+        self.certs._expires_at = 0
+        utils.Google.validate_google_token(self.make_token())
+        self.assertEqual(self.fetches, 2)
+
+    def test_rejects_wrong_audience_and_issuer(self):
+        with self.assertRaises(utils.AuthenticationFailed):
+            utils.Google.validate_google_token(self.make_token(aud='someone-else'))
+        with self.assertRaises(utils.AuthenticationFailed):
+            utils.Google.validate_google_token(self.make_token(iss='https://evil.example.com'))
+        with self.assertRaises(utils.AuthenticationFailed):
+            utils.Google.validate_google_token('not-a-token')
+
+
+class StatelessTokenTests(HotelFixturesMixin, TestCase):
+    def test_authenticated_reads_do_not_load_the_user(self):
+        booking = self.book(self.room, date(2030, 9, 1), date(2030, 9, 3))
+        api = self.bearer(self.client_user)
+        with self.assertNumQueries(1):
+            response = api.get(reverse('booking-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [booking.id])
+
+    def test_role_comes_from_the_token(self):
+        api = self.bearer(self.admin)
+        with self.assertNumQueries(1):
+            response = api.get(reverse('room-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [self.room.id])
+        self.assertEqual(self.bearer(self.client_user).get(reverse('room-list')).status_code, 403)
+
+    def test_writes_and_full_user_access_still_work(self):
+        api = self.bearer(self.client_user)
+        response = api.post(reverse('booking-list'), {'room': self.room.id, 'check_in': '2030-09-01', 'check_out': '2030-09-02'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.get().user, self.client_user)
+        response = api.post(reverse('delete-account'), {'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.filter(pk=self.client_user.pk).exists())
+
+    def test_writes_of_each_endpoint_family_accept_a_token(self):
+        # request.user is a TokenPrincipal here, not a User
+        admin = self.bearer(self.admin)
+        response = admin.post(reverse('hotel-list'), {'name': 'Harbour', 'address': '3 Quay'})
+        self.assertEqual((response.status_code, Hotel.objects.get(name='Harbour').admin), (201, self.admin))
+        response = admin.post(reverse('roomcategory-list'), {'hotel': self.hotel.id, 'name': 'Suite', 'price': '250.00'})
+        self.assertEqual(response.status_code, 201)
+        response = admin.post(reverse('room-list'), {
+            'hotel': self.hotel.id, 'category': response.data['id'], 'number': '201',
+        })
+        self.assertEqual(response.status_code, 201)
+        response = self.api.post(reverse('review-list'), {
+            'client': self.client_user.id, 'hotel': self.hotel.id, 'text': 'Quiet rooms',
+        })
+        self.assertEqual(response.status_code, 201)
+        review = Review.objects.get()
+        self.assertEqual(admin.post(reverse('review-respond', args=[review.id]), {'response': 'Thanks'}).status_code, 200)
+        self.assertEqual(self.api.get(reverse('profile')).status_code, 200)
+
+        system_admin = User.objects.create_user(
+            email='root@example.com', first_name='Sys', last_name='Admin',
+            password='secret123', role='system_admin', is_verified=True,
+        )
+        self.assertEqual(self.bearer(system_admin).get(reverse('outbox-status')).status_code, 200)
+        self.assertEqual(self.bearer(system_admin).get(reverse('pending-hotels')).status_code, 200)
+
+
+class RevenueRollupTests(HotelFixturesMixin, TestCase):
+    def test_pay_and_cancel_update_the_daily_rollup(self):
+        paid = self.book(self.room, date(2030, 10, 1), date(2030, 10, 2))
+        other_room = Room.objects.create(hotel=self.hotel, category=self.category, number='102')
+        also_paid = self.book(other_room, date(2030, 10, 1), date(2030, 10, 2))
+        cancelled = self.book(self.room, date(2030, 10, 5), date(2030, 10, 6))
+        self.assertEqual(self.api.post(reverse('booking-pay', args=[paid.id]), {'payment_amount': '100.00'}).status_code, 200)
+        self.assertEqual(self.api.post(reverse('booking-pay', args=[also_paid.id]), {'payment_amount': '120.50'}).status_code, 200)
+        self.assertEqual(self.api.post(reverse('booking-pay', args=[paid.id]), {'payment_amount': '100.00'}).status_code, 400)
+        self.assertEqual(self.api.post(reverse('booking-cancel', args=[cancelled.id])).status_code, 200)
+
+        today = timezone.localdate()
+        rollup = DailyRevenue.objects.get(hotel=self.hotel, day=today)
+        self.assertEqual((rollup.rooms_paid, rollup.money_earned, rollup.rooms_cancelled), (2, Decimal('220.50'), 1))
+
+        admin_api = self.bearer(self.admin)
+        response = admin_api.get(reverse('financereport-revenue'), {'year': today.year, 'month': today.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rooms_paid'], 2)
+        self.assertEqual(response.data['money_earned'], '220.50')
+        self.assertEqual(len(response.data['days']), 1)
+        self.assertEqual(admin_api.get(reverse('financereport-revenue'), {'year': 'x'}).status_code, 400)
+        for month in [0, 13, -1]:
+            response = admin_api.get(reverse('financereport-revenue'), {'year': today.year, 'month': month})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(admin_api.get(reverse('financereport-revenue'), {'year': 10000}).status_code, 400)
+        params = {'year': today.year, 'hotel_id': 'x'}
+        self.assertEqual(admin_api.get(reverse('financereport-revenue'), params).status_code, 400)
+        params['hotel_id'] = self.hotel.id
+        self.assertEqual(admin_api.get(reverse('financereport-revenue'), params).data['rooms_paid'], 2)
+
+
+class QueryPlanTests(HotelFixturesMixin, TestCase):
+    """
+    Replays the SELECTs each hot endpoint issues through EXPLAIN and fails if
+    any of them reads a whole table instead of going through an index.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            hotel = Hotel.objects.create(name=f'Hotel {i}', address=f'{i} Main St', admin=self.admin, is_approved=i % 2 == 0)
+            category = RoomCategory.objects.create(hotel=hotel, name='Single', price='50.00')
+            for number in range(3):
+                room = Room.objects.create(hotel=hotel, category=category, number=str(number))
+                self.book(room, date(2030, 1, 1 + number), date(2030, 1, 3 + number))
+            Review.objects.create(client=self.client_user, hotel=hotel, text='Lovely')
+        OneTimePassword.objects.create(user=self.client_user, code='123456')
+        self.system_admin = User.objects.create_user(
+            email='root@example.com', first_name='Sys', last_name='Admin',
+            password='secret123', role='system_admin', is_verified=True,
+        )
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a sequential scan the cheapest plan; only
+            # fall back to one when no index can serve the query
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan TO off')
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall() if 'Seq Scan' in row[0]]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            # SQLite reports "SCAN <table>" for full scans and
+            # "SCAN <table> USING [COVERING] INDEX ..." for index walks
+            return [row[-1] for row in cursor.fetchall() if re.fullmatch(r'SCAN (TABLE )?\w+', row[-1])]
+
+    def assertIndexedEndpoint(self, user, method, url, data=None):
+        api = self.bearer(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(api, method)(url, data)
+        self.assertLess(response.status_code, 400, response.data)
+        selects = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql), [], sql)
+
+    def test_approved_hotels(self):
+        self.assertIndexedEndpoint(self.client_user, 'get', reverse('approved-hotels'))
+
+    def test_pending_hotels(self):
+        self.assertIndexedEndpoint(self.system_admin, 'get', reverse('pending-hotels'))
+
+    def test_available_rooms(self):
+        self.assertIndexedEndpoint(self.client_user, 'get', reverse('available-rooms'), {
+            'hotel_id': self.hotel.id, 'check_in': '2030-01-02', 'check_out': '2030-01-04',
+        })
+
+    def test_client_bookings(self):
+        self.assertIndexedEndpoint(self.client_user, 'get', reverse('booking-list'))
+
+    def test_hotel_admin_reviews(self):
+        self.assertIndexedEndpoint(self.admin, 'get', reverse('review-list'))
+
+    def test_verify_email(self):
+        self.assertIndexedEndpoint(self.client_user, 'post', reverse('verify'), {
+            'email': self.client_user.email, 'otp': '123456',
+        })
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin_api = self.bearer(self.admin)
+
+    def seed(self, count):
+        for i in range(count):
+            room = Room.objects.create(hotel=self.hotel, category=self.category, number=f'B{i}')
+            self.book(room, date(2030, 11, 1), date(2030, 11, 2))
+            Review.objects.create(client=self.client_user, hotel=self.hotel, text='Nice')
+
+    def test_list_endpoints_stay_within_budget_as_data_grows(self):
+        for count in (1, 30):
+            self.seed(count)
+            with query_budget(1):
+                self.assertEqual(self.api.get(reverse('booking-list')).status_code, 200)
+            with query_budget(1):
+                self.assertEqual(self.admin_api.get(reverse('room-list')).status_code, 200)
+            with query_budget(1):
+                self.assertEqual(self.admin_api.get(reverse('review-list')).status_code, 200)
+
+    def test_room_update_permission_check_is_query_free(self):
+        with query_budget(2):
+            response = self.admin_api.patch(reverse('room-detail', args=[self.room.id]), {'number': '102'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_pay_reads_price_without_extra_queries(self):
+        booking = self.book(self.room, date(2030, 11, 1), date(2030, 11, 2))
+        # booking + its room and category in one SELECT, then the writes
+        with query_budget(4):
+            response = self.api.post(reverse('booking-pay', args=[booking.id]), {'payment_amount': '100'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_exceeding_a_budget_fails_loudly(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                list(Hotel.objects.all())
+                list(Room.objects.all())
+        with mock.patch.object(BookingViewSet, 'query_budgets', {'list': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.api.get(reverse('booking-list'))
+
+    def test_transaction_control_is_not_counted(self):
+        with query_budget(1):
+            with transaction.atomic():
+                list(Hotel.objects.all())
+
+    def test_write_over_budget_is_rolled_back(self):
+        with mock.patch.object(BookingViewSet, 'query_budgets', {'create': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.api.post(reverse('booking-list'), {
+                    'room': self.room.id, 'check_in': '2030-11-01', 'check_out': '2030-11-02',
+                })
+        self.assertFalse(Booking.objects.exists())
+
+
+class AsyncViewTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.auth = {'Authorization': f"Bearer {self.client_user.tokens()['access']}"}
+
+    async def test_booking_list_pages_with_a_keyset_cursor(self):
+        for night in range(3):
+            await Booking.objects.acreate(
+                user=self.client_user, room=self.room,
+                check_in=date(2030, 8, 1 + night), check_out=date(2030, 8, 2 + night),
+            )
+        response = await self.async_client.get('/api/async/bookings/', {'page_size': 2}, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual(len(first['results']), 2)
+        response = await self.async_client.get(first['next'], headers=self.auth)
+        second = response.json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, [pk async for pk in Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True)])
+
+    async def test_requires_a_token_and_valid_dates(self):
+        response = await self.async_client.get('/api/async/available-rooms/', {'hotel_id': self.hotel.id})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/available-rooms/', {
+            'hotel_id': self.hotel.id, 'check_in': '2030-05-12', 'check_out': '2030-05-10',
+        }, headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get('/api/async/available-rooms/', {'hotel_id': self.hotel.id}, headers=self.auth)
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.room.id])
+
+    async def test_approved_hotels_match_the_sync_view(self):
+        response = await self.async_client.get('/api/async/approved-hotels/', headers=self.auth)
+        self.assertEqual(response.json()['results'], [
+            {'name': 'Seaside', 'address': '1 Beach Road', 'id': self.hotel.id, 'image_variants': {}},
+        ])
+        response = await self.async_client.get(f'/api/async/approved-hotels/{self.hotel.id}/', headers=self.auth)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_approved_hotels_take_the_sync_filters_and_orderings(self):
+        for number, price in enumerate(['80.00', '300.00']):
+            hotel = await Hotel.objects.acreate(name=f'Inn {number}', address='Pier', admin=self.admin, is_approved=True)
+            category = await RoomCategory.objects.acreate(hotel=hotel, name='Single', price=price)
+            await Room.objects.acreate(hotel=hotel, category=category, number='1')
+        for params in [{'max_price': 150}, {'ordering': 'name'}, {'ordering': 'bogus,-name'}]:
+            expected = await sync_to_async(self.api.get)(reverse('approved-hotels'), params)
+            seen, url, query = [], '/api/async/approved-hotels/', {**params, 'page_size': 1}
+            while url:
+                page = (await self.async_client.get(url, query, headers=self.auth)).json()
+                seen += [hotel['id'] for hotel in page['results']]
+                url, query = page['next'], None
+            self.assertEqual(seen, [hotel['id'] for hotel in expected.data['results']])
+        response = await self.async_client.get('/api/async/approved-hotels/', {'check_in': 'soon'}, headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(HotelFixturesMixin, TestCase):
+    def get(self, name, params=None, **headers):
+        return self.api.get(reverse(name), params, headers=headers)
+
+    def test_catalog_answers_304_without_queries(self):
+        response = self.get('approved-hotels')
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        with self.assertNumQueries(0):
+            response = self.get('approved-hotels', **{'If-None-Match': etag})
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+        # Another page or filter is another representation
+        self.assertNotEqual(self.get('approved-hotels', {'max_price': 50})['ETag'], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.create(hotel=self.hotel, category=self.category, number='102')
+            invalidate_catalog()
+        self.assertEqual(self.get('approved-hotels', **{'If-None-Match': etag}).status_code, 200)
+
+    def test_bookings_follow_their_owner_and_hotel(self):
+        bookings_etag = self.get('booking-list')['ETag']
+        rooms = {'hotel_id': self.hotel.id, 'check_in': '2030-02-01', 'check_out': '2030-02-03'}
+        rooms_etag = self.get('available-rooms', rooms)['ETag']
+        other = User.objects.create_user(email='other@example.com', first_name='O', last_name='U', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_room(other, self.room, date(2030, 2, 1), date(2030, 2, 2))
+        # Someone else's booking leaves this client's list alone but changes availability
+        self.assertEqual(self.get('booking-list', **{'If-None-Match': bookings_etag}).status_code, 304)
+        response = self.get('available-rooms', rooms, **{'If-None-Match': rooms_etag})
+        self.assertEqual((response.status_code, response.data['results']), (200, []))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = reserve_room(self.client_user, self.room, date(2030, 3, 1), date(2030, 3, 2))
+        self.assertEqual(self.get('booking-list', **{'If-None-Match': bookings_etag}).status_code, 200)
+        etag = self.get('booking-list')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            transition(booking, 'CANCELLED')
+        self.assertEqual(self.get('booking-list', **{'If-None-Match': etag}).status_code, 200)
+
+    def test_deleting_a_room_or_hotel_changes_its_bookings(self):
+        self.book(self.room, date(2030, 2, 1), date(2030, 2, 2))
+        admin = self.bearer(self.admin)
+        for name, target in [('room-detail', self.room), ('hotel-detail', self.hotel)]:
+            etag = self.get('booking-list')['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(admin.delete(reverse(name, args=[target.pk])).status_code, 204)
+            response = self.get('booking-list', **{'If-None-Match': etag})
+            self.assertEqual((response.status_code, response.data['results']), (200, []))
+            if name == 'room-detail':
+                self.room = Room.objects.create(hotel=self.hotel, category=self.category, number='102')
+                self.book(self.room, date(2030, 2, 1), date(2030, 2, 2))
+
+    def test_if_modified_since(self):
+        response = self.get('approved-hotels')
+        self.assertEqual(self.get('approved-hotels', **{'If-Modified-Since': response['Last-Modified']}).status_code, 304)
+
+    def test_tonight_is_part_of_the_validators(self):
+        rooms = {'hotel_id': self.hotel.id}
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2030, 2, 1)):
+            response = self.get('available-rooms', rooms)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            self.assertEqual(self.get('available-rooms', rooms, **{'If-None-Match': etag}).status_code, 304)
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2030, 2, 2)):
+            self.assertEqual(self.get('available-rooms', rooms, **{'If-None-Match': etag}).status_code, 200)
+            response = self.get('available-rooms', rooms, **{'If-Modified-Since': last_modified})
+            self.assertEqual(response.status_code, 200)
+
+    async def test_async_views_validate_too(self):
+        auth = {'Authorization': f"Bearer {self.client_user.tokens()['access']}"}
+        response = await self.async_client.get('/api/async/bookings/', headers=auth)
+        response = await self.async_client.get('/api/async/bookings/', headers={**auth, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        url = f'/api/async/available-rooms/?hotel_id={self.hotel.id}'
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2030, 2, 1)):
+            etag = (await self.async_client.get(url, headers=auth))['ETag']
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2030, 2, 2)):
+            response = await self.async_client.get(url, headers={**auth, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class FastJSONTests(HotelFixturesMixin, TestCase):
+    def test_renders_the_same_bytes_as_drf(self):
+        payloads = [
+            {'name': 'Caf\u00e9 \u2028 \U0001f3e8', 'price': Decimal('12.50'), 'ratio': 0.1, 'big': 2 ** 70},
+            [{'at': timezone.now(), 'day': date(2030, 1, 2), 'id': uuid.uuid4(), 1: None, 'ok': True}],
+            {'detail': ErrorDetail('Not found.', code='not_found'), 'lazy': gettext_lazy('Active')},
+            ReturnList([{'nested': {'list': (1, 2), 'set': []}}], serializer=None),
+            {'floats': [1e16, -1e-7, 1e-5, 5e-324, 1.5e300, 0.0001, 1e15, -0.0, 2.5]},
+            [1e16],
+            1e-7,
+            {'text': ':1e5 ,0.00001'},
+        ]
+        for payload in payloads:
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        # DRF refuses NaN; orjson writes null
+        self.assertEqual(FastJSONRenderer().render({'x': float('nan')}), b'{"x":null}')
+        self.assertEqual(
+            FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+        )
+
+    def test_parses_and_rejects_like_drf(self):
+        body = '{"name": "Caf\u00e9", "nights": [1, 2]}'.encode()
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), {'name': 'Caf\u00e9', 'nights': [1, 2]})
+        for bad in [b'{"a": ', b'{"a": NaN}']:
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(bad))
+
+    def test_sparse_fieldsets_load_only_what_is_asked(self):
+        self.book(self.room, date(2030, 1, 1), date(2030, 1, 3))
+        full = self.api.get(reverse('booking-list'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(reverse('booking-list'), {'fields': 'id,check_in'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'check_in'])
+        self.assertEqual(response.data['results'][0]['check_in'], full.data['results'][0]['check_in'])
+        select = next(q['sql'] for q in queries if 'FROM "hotel_booking"' in q['sql'])
+        self.assertNotIn('payment_status', select)
+        # Cursor pagination still gets its ordering columns
+        self.assertIn('created_at', select)
+
+        response = self.api.get(reverse('booking-list'), {'exclude': 'user,room'})
+        self.assertNotIn('user', response.data['results'][0])
+        self.assertIn('payment_status', response.data['results'][0])
+
+    def test_sparse_catalog_entries_are_cached_apart(self):
+        self.api = self.bearer(self.admin)
+        url = reverse('approved-hotel-detail', args=[self.hotel.id])
+        self.assertEqual(self.api.get(url, {'fields': 'id'}).data, {'id': self.hotel.id})
+        self.assertIn('name', self.api.get(url).data)
+
+
+class RowListTests(HotelFixturesMixin, TestCase):
+    def test_rows_match_the_serializers(self):
+        Review.objects.create(client=self.client_user, hotel=self.hotel, text='Lovely')
+        for night in range(3):
+            self.book(self.room, date(2030, 1, 1) + timedelta(days=night), date(2030, 1, 2) + timedelta(days=night))
+        cases = [
+            ('booking-list', BookingSerializer, Booking.objects.all()),
+            ('review-list', ReviewSerializer, Review.objects.all()),
+            ('approved-hotels', HotelSerializer, Hotel.objects.all()),
+        ]
+        for name, serializer_class, queryset in cases:
+            self.api = self.bearer(self.admin if name == 'review-list' else self.client_user)
+            expected = serializer_class(queryset.order_by('-created_at', '-id'), many=True).data
+            response = self.api.get(reverse(name))
+            self.assertEqual(response.data['results'], expected)
+            self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+    def test_list_fetches_values_and_pages_by_cursor(self):
+        for night in range(3):
+            self.book(self.room, date(2030, 1, 1) + timedelta(days=night), date(2030, 1, 2) + timedelta(days=night))
+        view = BookingViewSet(action='list', request=mock.Mock(method='GET', query_params={}), format_kwarg=None)
+        self.assertIsInstance(view.filter_queryset(Booking.objects.all()).first(), dict)
+
+        seen, url = [], reverse('booking-list') + '?page_size=2'
+        while url:
+            response = self.api.get(url)
+            seen += [booking['id'] for booking in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, list(Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_serializers_it_cannot_compile_are_left_alone(self):
+        # image is a file field: its URL comes from storage
+        self.assertIsNone(compile_fields(RoomSerializer(), Room))
+        self.assertIsNotNone(compile_fields(HotelSerializer(), Hotel))
+        self.api = self.bearer(self.admin)
+        response = self.api.get(reverse('room-list'))
+        self.assertEqual(response.data['results'][0]['image'], None)
+
+    def test_benchmark_reports_identical_output(self):
+        out = io.StringIO()
+        call_command('bench_serializers', rows=20, repeat=1, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual([result['serializer'] for result in results], ['HotelSerializer', 'BookingSerializer'])
+        self.assertTrue(all(result['identical'] and result['rows'] == 20 for result in results))
+        self.assertFalse(Hotel.objects.filter(name__startswith='serializer-bench').exists())
+
+
+@override_settings(THROTTLE_BUDGETS={
+    'login': {'ip': '3/min', 'email': '2/min', 'role': '5/min'},
+    'password-reset': {'ip': '1/hour'},
+})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttle_cache().clear()
+        local_buckets.clear()
+        User.objects.create_user(
+            email='guest@example.com', first_name='Guest', last_name='User', password='secret123', is_verified=True,
+        )
+
+    def login(self, email='guest@example.com', ip='10.0.0.1', **extra):
+        return APIClient().post(reverse('login'), {'email': email, 'password': 'wrong-password'}, REMOTE_ADDR=ip, **extra)
+
+    def test_email_bucket_rejects_before_hashing(self):
+        with mock.patch('hotel.serializers.authenticate', return_value=None) as authenticate:
+            self.assertEqual([self.login().status_code for _ in range(3)], [401, 401, 429])
+        self.assertEqual(authenticate.call_count, 2)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 30)
+        # Another address from another IP still gets through
+        self.assertEqual(self.login('other@example.com', '10.0.0.2').status_code, 401)
+
+    def test_ip_and_role_buckets(self):
+        statuses = [self.login(f'guest{i}@example.com').status_code for i in range(4)]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        # Anonymous callers share no bucket: a burst from many IPs locks nobody else out
+        statuses = [self.login(f'guest@{i}.example.com', f'10.0.1.{i}').status_code for i in range(8)]
+        self.assertEqual(statuses, [401] * 8)
+        # Signed-in callers of a role do share one
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {User.objects.get(email='guest@example.com').tokens()['access']}")
+        statuses = [
+            api.post(reverse('login'), {'email': f'guest@{i}.example.org', 'password': 'wrong-password'},
+                     REMOTE_ADDR=f'10.0.2.{i}').status_code
+            for i in range(6)
+        ]
+        self.assertEqual(statuses, [401] * 5 + [429])
+
+    def test_forged_forwarded_for_does_not_get_a_new_bucket(self):
+        statuses = [
+            self.login(f'guest{i}@example.com', HTTP_X_FORWARDED_FOR=f'192.0.2.{i}').status_code for i in range(4)
+        ]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_forwarded_for_is_read_behind_a_proxy(self):
+        statuses = [
+            self.login(f'guest{i}@example.com', HTTP_X_FORWARDED_FOR=f'192.0.2.{i}').status_code for i in range(4)
+        ]
+        self.assertEqual(statuses, [401, 401, 401, 401])
+
+    def test_buckets_refill_over_time(self):
+        now = time.time()
+        with mock.patch('hotel.throttling.time.time', return_value=now):
+            for _ in range(2):
+                self.login()
+            self.assertEqual(self.login().status_code, 429)
+        with mock.patch('hotel.throttling.time.time', return_value=now + 31):
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login().status_code, 429)
+
+    def test_falls_back_to_in_process_buckets(self):
+        with mock.patch('hotel.throttling.throttle_cache', side_effect=ConnectionError('cache down')):
+            statuses = [self.login().status_code for _ in range(3)]
+        self.assertEqual(statuses, [401, 401, 429])
+
+    def test_budgets_are_per_endpoint_and_can_be_disabled(self):
+        with mock.patch('hotel.serializers.send_email'):
+            responses = [APIClient().post(reverse('password-reset'), {'email': 'guest@example.com'}) for _ in range(2)]
+        self.assertEqual([response.status_code for response in responses], [200, 429])
+        with override_settings(THROTTLE_ENABLED=False):
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login().status_code, 401)
+
+    def test_rates(self):
+        self.assertEqual(parse_rate('5/min'), (5, 60))
+        self.assertEqual(parse_rate('100/hour'), (100, 3600))
+        for rate in ['5', 'five/min', '5/fortnight', '0/s']:
+            with self.assertRaises(ImproperlyConfigured):
+                parse_rate(rate)
+
+
+class OneTimePasswordTests(TestCase):
+    def setUp(self):
+        throttle_cache().clear()
+        self.user = User.objects.create_user(
+            email='new@example.com', first_name='New', last_name='Guest', password='secret123',
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com', first_name='Other', last_name='Guest', password='secret123',
+        )
+        OneTimePassword.objects.create(user=self.user, code='111111')
+        OneTimePassword.objects.create(user=self.other, code='222222')
+
+    def verify(self, email, otp):
+        return APIClient().post(reverse('verify'), {'email': email, 'otp': otp})
+
+    def test_code_only_verifies_its_own_user(self):
+        self.assertEqual(self.verify('new@example.com', '222222').status_code, 404)
+        self.assertEqual(self.verify('new@example.com', '').status_code, 400)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.verify('new@example.com', '111111')
+        self.assertEqual(response.data['status'], 'Email verified successfully')
+        selects = [query for query in captured.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+        self.assertFalse(OneTimePassword.objects.filter(user=self.user).exists())
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.is_verified)
+
+    def test_expired_code_is_rejected(self):
+        OneTimePassword.objects.filter(user=self.user).update(
+            created_at=timezone.now() - OneTimePassword.LIFETIME - timedelta(seconds=1),
+        )
+        self.assertEqual(self.verify('new@example.com', '111111').status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_verified)
+
+    def test_resent_code_starts_a_new_lifetime(self):
+        OneTimePassword.objects.filter(user=self.user).update(created_at=timezone.now() - timedelta(days=1))
+        utils.sendOtpEmail('new@example.com')
+        self.assertTrue(OneTimePassword.objects.get(user=self.user).is_valid())
+
+    def test_purge_deletes_expired_codes_in_batches(self):
+        expired = timezone.now() - OneTimePassword.LIFETIME - timedelta(minutes=1)
+        users = [
+            User.objects.create_user(email=f'old{i}@example.com', first_name='Old', last_name='Guest', password=None)
+            for i in range(5)
+        ]
+        OneTimePassword.objects.bulk_create(
+            OneTimePassword(user=user, code='333333', created_at=expired) for user in users
+        )
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(utils.purge_expired_otps(batch_size=2), 5)
+        deletes = [query for query in captured.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(OneTimePassword.objects.count(), 2)
+
+        out = io.StringIO()
+        call_command('purge_otps', stdout=out)
+        self.assertIn('Removed 0', out.getvalue())
+
+
+class TokenUserStateTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {self.client_user.tokens()['access']}")
+
+    def test_deactivated_user_is_refused(self):
+        self.assertEqual(self.api.get(reverse('profile')).status_code, 200)
+        self.client_user.is_active = False
+        self.client_user.save()
+        self.assertEqual(self.api.get(reverse('profile')).status_code, 401)
+
+    async def test_async_views_refuse_a_deactivated_user(self):
+        auth = {'Authorization': f"Bearer {self.client_user.tokens()['access']}"}
+        self.assertEqual((await self.async_client.get('/api/async/bookings/', headers=auth)).status_code, 200)
+        self.client_user.is_active = False
+        await self.client_user.asave()
+        self.assertEqual((await self.async_client.get('/api/async/bookings/', headers=auth)).status_code, 401)
+
+    def test_deleted_user_is_refused_before_writing(self):
+        self.client_user.delete()
+        response = self.api.post(reverse('booking-list'), {
+            'room': self.room.id, 'check_in': '2030-11-01', 'check_out': '2030-11-02',
+        })
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_active_state_is_cached(self):
+        auth_cache().delete(active_user_key(self.client_user.pk))
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(3):
+                self.assertEqual(self.api.get(reverse('profile')).status_code, 200)
+        self.assertEqual(len(captured.captured_queries), 1)
+
+
+class HotelSearchTests(HotelFixturesMixin, TestCase):
+    def add_hotel(self, name, address, **fields):
+        hotel = Hotel.objects.create(name=name, address=address, admin=self.admin, is_approved=True, **fields)
+        category = RoomCategory.objects.create(hotel=hotel, name='Single', price='80.00')
+        Room.objects.create(hotel=hotel, category=category, number='1')
+        return hotel
+
+    def names(self, query):
+        return [hotel.name for hotel in search_hotels(query)]
+
+    def test_matches_words_prefixes_and_typos(self):
+        self.add_hotel('Coral Reef Resort', '9 Ocean Drive, Malindi')
+        self.add_hotel('Mountain Lodge', '4 Seaside Close, Nanyuki')
+        self.assertEqual(self.names('seaside'), ['Seaside', 'Mountain Lodge'])
+        self.assertEqual(self.names('cor res'), ['Coral Reef Resort'])
+        self.assertEqual(self.names('malindi'), ['Coral Reef Resort'])
+        self.assertEqual(self.names('coarl resrot'), ['Coral Reef Resort'])
+        self.assertEqual(self.names('nothing like it'), [])
+
+    def test_index_follows_hotel_changes(self):
+        hidden = self.add_hotel('Hidden Oasis', '1 Desert Road', is_declined=True)
+        self.assertEqual(self.names('oasis'), [])
+        hidden.is_declined = False
+        hidden.save()
+        self.assertEqual(self.names('oasis'), ['Hidden Oasis'])
+        hidden.name = 'Palm Court'
+        hidden.save()
+        self.assertEqual(self.names('oasis'), [])
+        self.assertEqual(self.names('palm'), ['Palm Court'])
+        hidden.delete()
+        self.assertEqual(self.names('palm'), [])
+
+    def test_search_endpoint(self):
+        url = reverse('hotel-search')
+        self.assertEqual(self.api.get(url).status_code, 400)
+        response = self.api.get(url, {'q': 'beach', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hotel['id'] for hotel in response.data['results']], [self.hotel.id])
+
+
+class HotelFilterTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lodge = Hotel.objects.create(name='Lodge', address='2 Hill Road', admin=self.admin, is_approved=True)
+        single = RoomCategory.objects.create(hotel=self.lodge, name='Single', price='80.00')
+        suite = RoomCategory.objects.create(hotel=self.lodge, name='Suite', price='450.00')
+        Room.objects.create(hotel=self.lodge, category=single, number='1')
+        Room.objects.create(hotel=self.lodge, category=suite, number='2')
+
+    def names(self, **params):
+        response = self.api.get(reverse('approved-hotels'), params)
+        self.assertEqual(response.status_code, 200)
+        return [hotel['name'] for hotel in response.data['results']]
+
+    def test_filters_by_price_category_and_dates(self):
+        self.assertEqual(self.names(min_price=90, max_price=200), ['Seaside'])
+        self.assertEqual(self.names(category='suite'), ['Lodge'])
+        # Every condition must hold for the same room
+        self.assertEqual(self.names(category='Double', max_price=90), [])
+        self.book(self.room, date(2030, 1, 1), date(2030, 1, 5))
+        self.assertEqual(self.names(check_in='2030-01-02', check_out='2030-01-03'), ['Lodge'])
+        self.assertEqual(self.names(check_in='2030-01-05'), ['Lodge', 'Seaside'])
+
+    def test_rejects_bad_stays(self):
+        response = self.api.get(reverse('approved-hotels'), {'check_in': '2030-01-05', 'check_out': '2030-01-05'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_orders_by_indexed_columns_only(self):
+        self.assertEqual(self.names(ordering='name'), ['Lodge', 'Seaside'])
+        self.assertEqual(self.names(ordering='-name'), ['Seaside', 'Lodge'])
+        # Unindexed columns fall back to the default, newest first
+        self.assertEqual(self.names(ordering='address'), ['Lodge', 'Seaside'])
+
+    def test_facets_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(reverse('approved-hotel-facets'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 1)
+        self.assertEqual(response.data['price_bands'], [
+            {'band': '0-100', 'hotels': 1}, {'band': '100-200', 'hotels': 1},
+            {'band': '200-400', 'hotels': 0}, {'band': '400+', 'hotels': 1},
+        ])
+        self.assertEqual(response.data['categories'], [
+            {'name': 'double', 'hotels': 1}, {'name': 'single', 'hotels': 1}, {'name': 'suite', 'hotels': 1},
+        ])
+        narrowed = self.api.get(reverse('approved-hotel-facets'), {'max_price': 100})
+        self.assertEqual([c['name'] for c in narrowed.data['categories']], ['double', 'single'])
+
+    def test_room_filters(self):
+        self.api = self.bearer(self.admin)
+        response = self.api.get(reverse('room-list'), {'max_price': 100})
+        self.assertEqual(sorted(room['number'] for room in response.data['results']), ['1', '101'])
+
+
+class ImageVariantTests(HotelFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.executor = ThreadPoolExecutor(1)
+        self.addCleanup(self.executor.shutdown)
+
+    def upload(self, size=(2000, 1000), name='lobby.png'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_renders_hashed_variants_off_the_request_path(self):
+        self.hotel.image = self.upload()
+        self.hotel.save()
+        self.assertEqual(media.process_pending(self.executor), 1)
+        self.assertEqual(media.process_pending(self.executor), 0)
+        self.hotel.refresh_from_db()
+        variants = self.hotel.image_variants
+        self.assertEqual((variants['large']['width'], variants['large']['height']), (1600, 800))
+        self.assertEqual((variants['thumbnail']['width'], variants['thumbnail']['height']), (320, 160))
+        self.assertRegex(variants['medium']['webp'], r'^hotel_images/variants/[0-9a-f]{32}\.webp$')
+
+        urls = HotelSerializer(self.hotel).data['image_variants']
+        self.assertEqual(urls['thumbnail']['jpeg'], '/media/' + variants['thumbnail']['jpeg'])
+        response = self.client.get(urls['thumbnail']['webp'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 160)))
+
+    def test_new_upload_replaces_variants(self):
+        self.room.image = self.upload(size=(100, 50), name='room.png')
+        self.room.save()
+        media.process_pending(self.executor)
+        self.room.refresh_from_db()
+        # Small images are not scaled up
+        self.assertEqual(self.room.image_variants['large']['width'], 100)
+        self.room.image = self.upload(size=(400, 400), name='room.png')
+        self.room.save()
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.image_variants, {})
+        media.process_pending(self.executor)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.image_variants['large']['width'], 400)
+
+    def test_room_variants_move_the_available_rooms_etag(self):
+        self.room.image = self.upload(size=(100, 50), name='room.png')
+        self.room.save()
+        rooms = {'hotel_id': self.hotel.id}
+        etag = self.api.get(reverse('available-rooms'), rooms)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            media.process_pending(self.executor)
+        response = self.api.get(reverse('available-rooms'), rooms, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('thumbnail', response.data['results'][0]['image_variants'])
+
+    def test_broken_upload_is_recorded_once(self):
+        self.hotel.image = SimpleUploadedFile('broken.png', b'not an image', content_type='image/png')
+        self.hotel.save()
+        self.assertEqual(media.process_pending(self.executor), 1)
+        self.hotel.refresh_from_db()
+        self.assertIn('error', self.hotel.image_variants)
+        self.assertEqual(HotelSerializer(self.hotel).data['image_variants'], {})
+        self.assertEqual(media.pending_count(), {'hotel': 0, 'room': 0})
+
+
+class MediaStreamingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.data = bytes(range(256)) * 40
+        default_storage.save('room_videos/tour.mp4', ContentFile(self.data))
+        self.url = '/media/room_videos/tour.mp4'
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_serves_single_ranges(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.data))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        response, body = self.get(Range='bytes=100-199')
+        self.assertEqual((response.status_code, body), (206, self.data[100:200]))
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+        response, body = self.get(Range='bytes=-10')
+        self.assertEqual((response.status_code, body), (206, self.data[-10:]))
+        response, body = self.get(Range='bytes=10000-')
+        self.assertEqual((response.status_code, body), (206, self.data[10000:]))
+        response, _ = self.get(Range=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+        # Several ranges are answered with the whole file
+        response, body = self.get(Range='bytes=0-1,5-6')
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_conditional_requests(self):
+        response, _ = self.get()
+        etag = response['ETag']
+        response, _ = self.get(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response, body = self.get(Range='bytes=0-9', **{'If-Range': etag})
+        self.assertEqual((response.status_code, body), (206, self.data[:10]))
+        response, body = self.get(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_accel_redirect_and_unsafe_paths(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response, body = self.get(Range='bytes=0-9')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/room_videos/tour.mp4')
+        self.assertEqual((response.status_code, body), (200, b''))
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/room_videos/').status_code, 404)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class ChunkedUploadTests(HotelFixturesMixin, TestCase):
+    chunk_size = 256 * 1024
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, UPLOAD_SESSION_DIR=f'{media_root.name}/parts')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.api = self.bearer(self.admin)
+        self.data = bytes(range(256)) * 2500  # Two full chunks and a short one
+
+    def open(self, **fields):
+        payload = {
+            'target': 'room', 'object_id': self.room.id, 'field': 'video', 'filename': 'tour.mp4',
+            'size': len(self.data), 'chunk_size': self.chunk_size,
+            'sha256': hashlib.sha256(self.data).hexdigest(), **fields,
+        }
+        return self.api.post(reverse('upload-list'), payload, format='json')
+
+    def send(self, session_id, index, data=None, checksum=None):
+        if data is None:
+            data = self.data[index * self.chunk_size:(index + 1) * self.chunk_size]
+        return self.api.put(
+            reverse('upload-chunk', args=[session_id, index]), data, content_type='application/octet-stream',
+            headers={'X-Chunk-Sha256': checksum or hashlib.sha256(data).hexdigest()},
+        )
+
+    def test_upload_with_a_bearer_token(self):
+        # request.user is then a TokenPrincipal, not a User
+        self.api = self.bearer(self.admin)
+        session_id = self.open().data['id']
+        for index in range(3):
+            self.assertEqual(self.send(session_id, index).status_code, 200)
+        self.assertEqual(self.api.post(reverse('upload-complete', args=[session_id])).status_code, 200)
+        self.assertEqual(self.api.delete(reverse('upload-detail', args=[session_id])).status_code, 204)
+        self.assertEqual(self.open(object_id=0).status_code, 400)
+
+    def test_chunks_in_any_order_then_attach(self):
+        response = self.open()
+        self.assertEqual(response.status_code, 201)
+        session_id = response.data['id']
+        self.assertEqual(response.data['chunk_count'], 3)
+        self.assertEqual(self.send(session_id, 2).status_code, 200)
+        self.assertEqual(self.send(session_id, 0).status_code, 200)
+        # Not finished yet: the client learns what is left to send
+        response = self.api.post(reverse('upload-complete', args=[session_id]))
+        self.assertEqual((response.status_code, response.data['missing_chunks']), (409, [1]))
+        self.assertEqual(self.api.get(reverse('upload-detail', args=[session_id])).data['received_chunks'], [0, 2])
+
+        self.assertEqual(self.send(session_id, 1).status_code, 200)
+        response = self.api.post(reverse('upload-complete', args=[session_id]))
+        self.assertEqual(response.status_code, 200)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.video.name, 'room_videos/tour.mp4')
+        with self.room.video.open('rb') as fh:
+            self.assertEqual(fh.read(), self.data)
+        self.assertEqual(self.api.post(reverse('upload-complete', args=[session_id])).status_code, 400)
+        self.assertEqual(self.send(session_id, 0).status_code, 400)
+
+    def test_rejects_bad_chunks(self):
+        session_id = self.open().data['id']
+        self.assertEqual(self.send(session_id, 0, checksum='0' * 64).status_code, 400)
+        self.assertEqual(self.send(session_id, 0, data=b'short').status_code, 400)
+        self.assertEqual(self.send(session_id, 3).status_code, 400)
+        # A retry replaces the bad delivery
+        self.assertEqual(self.send(session_id, 0).status_code, 200)
+        self.assertEqual(UploadChunk.objects.filter(session_id=session_id).count(), 1)
+
+    def test_failed_resend_unmarks_the_chunk(self):
+        session_id = self.open(sha256='').data['id']
+        for index in range(3):
+            self.send(session_id, index)
+        # The bad bytes overwrite the good copy, so the chunk must be sent again
+        garbled = bytes(self.chunk_size)
+        self.assertEqual(self.send(session_id, 1, data=garbled, checksum='0' * 64).status_code, 400)
+        response = self.api.post(reverse('upload-complete', args=[session_id]))
+        self.assertEqual((response.status_code, response.data['missing_chunks']), (409, [1]))
+        self.send(session_id, 1)
+        self.assertEqual(self.api.post(reverse('upload-complete', args=[session_id])).status_code, 200)
+        self.room.refresh_from_db()
+        with self.room.video.open('rb') as fh:
+            self.assertEqual(fh.read(), self.data)
+
+    def test_whole_file_checksum_and_ownership(self):
+        session_id = self.open(sha256='0' * 64).data['id']
+        for index in range(3):
+            self.send(session_id, index)
+        self.assertEqual(self.api.post(reverse('upload-complete', args=[session_id])).status_code, 400)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).status, 'OPEN')
+
+        other = Hotel.objects.create(name='Other', address='x', admin=self.client_user, is_approved=True)
+        self.assertEqual(self.open(target='hotel', object_id=other.id).status_code, 400)
+        self.assertEqual(self.open(chunk_size=1024).status_code, 400)
+
+    def test_abandoned_upload_can_be_deleted(self):
+        session_id = self.open().data['id']
+        self.send(session_id, 0)
+        part = uploads.part_path(UploadSession.objects.get(pk=session_id))
+        self.assertTrue(part.exists())
+        other = self.bearer(User.objects.create_user(
+            email='other-admin@example.com', first_name='Other', last_name='Admin',
+            password='secret123', role='hotel_admin', is_verified=True,
+        ))
+        self.assertEqual(other.delete(reverse('upload-detail', args=[session_id])).status_code, 404)
+        self.assertEqual(self.api.delete(reverse('upload-detail', args=[session_id])).status_code, 204)
+        self.assertFalse(part.exists())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(UploadChunk.objects.exists())
+
+    def test_abandoned_uploads_are_purged(self):
+        session_id = self.open().data['id']
+        part = uploads.part_path(UploadSession.objects.get(pk=session_id))
+        self.assertTrue(part.exists())
+        UploadSession.objects.filter(pk=session_id).update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(uploads.purge_stale_sessions(), 1)
+        self.assertFalse(part.exists())
+        self.assertFalse(UploadSession.objects.exists())
+
+
+class BenchmarkHarnessTests(TestCase):
+    def setUp(self):
+        # As in the test client: keep the test transaction's connection open between requests
+        signals.request_finished.disconnect(close_old_connections)
+        self.addCleanup(signals.request_finished.connect, close_old_connections)
+        self.fixture = benchmark.seed_fixture(hotels=2, rooms_per_hotel=2, requests=3)
+        self.application = get_wsgi_application()
+
+    def run_route(self, name):
+        scenario = next(scenario for scenario in benchmark.SCENARIOS if scenario.name == name)
+        return benchmark.run_scenario(self.application, scenario, self.fixture, requests=3, concurrency=1, warmup=1)
+
+    def test_reports_latency_and_queries_per_route(self):
+        result = self.run_route('booking-list')
+        self.assertEqual(result['statuses'], {'200': 3})
+        self.assertEqual(result['queries_per_request'], 1)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        result = self.run_route('booking-pay')
+        self.assertEqual(result['unexpected'], 0)
+        self.assertEqual(Booking.objects.filter(payment_status='PAID').count(), 3)
+
+    def test_compare_flags_extra_queries(self):
+        baseline = {'routes': {'booking-list': {'p95_ms': 5.0, 'queries_per_request': 1}}}
+        current = {'routes': {'booking-list': {'p95_ms': 5.2, 'queries_per_request': 2}}}
+        self.assertEqual(len(benchmark.compare(baseline, current)), 1)
+        self.assertEqual(benchmark.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(benchmark.percentile([1, 2, 3, 4], 99), 4)
+
+
+class DatasetGeneratorTests(TestCase):
+    def generate(self, seed=7):
+        return DatasetGenerator(
+            hotels=3, rooms=20, bookings=200, reviews=10, clients=5, seed=seed, batch_size=64,
+            report=lambda message, done: None,
+        ).run()
+
+    def test_loads_requested_volumes_without_overlapping_stays(self):
+        totals = self.generate()
+        self.assertEqual((totals['hotels'], totals['rooms'], totals['bookings']), (3, 20, 200))
+        self.assertEqual(Booking.objects.count(), 200)
+        for room in Room.objects.all():
+            stays = sorted(Booking.objects.filter(room=room).values_list('check_in', 'check_out'))
+            for (_, previous_out), (next_in, _) in zip(stays, stays[1:]):
+                self.assertLessEqual(previous_out, next_in)
+        paid = Booking.objects.filter(payment_status__in=['PAID', 'CHECKED_OUT']).count()
+        self.assertEqual(sum(DailyRevenue.objects.values_list('rooms_paid', flat=True)), paid)
+
+    def test_same_seed_reproduces_the_data(self):
+        self.generate()
+        first = list(Booking.objects.order_by('id').values_list('room_id', 'check_in', 'check_out', 'payment_status'))
+        Hotel.objects.all().delete()
+        User.objects.all().delete()
+        self.generate()
+        second = list(Booking.objects.order_by('id').values_list('room_id', 'check_in', 'check_out', 'payment_status'))
+        offset = second[0][0] - first[0][0]
+        self.assertEqual([(room + offset, *rest) for room, *rest in first], second)
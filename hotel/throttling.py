@@ -0,0 +1,152 @@
+"""
+Token-bucket rate limiting for the endpoints that are expensive to call:
+login (a PBKDF2 hash per attempt), email verification, registration and
+password reset (an email each) and Google sign-in (a call to Google).
+
+A request takes one token from each bucket its endpoint's budget names:
+one per client IP, one per email address in the request, and, for signed-in
+callers, one shared by every caller of the same role. Anonymous callers have
+no role bucket: one client rotating IPs and emails could drain a bucket they
+all share and lock everyone else out. Budgets are set per endpoint in settings.THROTTLE_BUDGETS. The client IP
+is the peer address, or read from X-Forwarded-For past the number of
+proxies in REST_FRAMEWORK['NUM_PROXIES'], so a client cannot name its own.
+
+Buckets live in the "throttle" cache so that every worker draws from the
+same ones, and in this process while that cache is unreachable. DRF runs
+throttles in APIView.initial(), before the view's serializer does any work.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60): a bucket of 5 tokens, refilled at 5 per minute."""
+    count, _, period = rate.partition('/')
+    try:
+        capacity, seconds = int(count), PERIODS[period.strip().lower()]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}, expected e.g. "5/min".')
+    if capacity < 1:
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}, the bucket must hold a token.')
+    return capacity, seconds
+
+
+def spend(state, capacity, period, now):
+    """
+    Take a token from a bucket in `state` ((tokens, time), or None for a new,
+    full bucket). Returns the new state and 0, or the seconds until a token
+    is available when the bucket is empty.
+    """
+    tokens, stamp = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) * period / capacity
+
+
+class LocalBuckets:
+    """Buckets held in this process, oldest dropped first past `max_keys`."""
+    max_keys = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = OrderedDict()
+
+    def take(self, key, capacity, period, now):
+        with self.lock:
+            state, wait = spend(self.states.pop(key, None), capacity, period, now)
+            self.states[key] = state
+            if len(self.states) > self.max_keys:
+                self.states.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.states.clear()
+
+
+local_buckets = LocalBuckets()
+
+
+def throttle_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'throttle')]
+
+
+def bucket_key(scope, kind, value):
+    return f'throttle:{scope}:{kind}:{hashlib.md5(str(value).encode()).hexdigest()}'
+
+
+def take(key, capacity, period):
+    """
+    Take a token from bucket `key`: 0 if one was taken, else the seconds to
+    wait. Two workers can read a bucket before either writes it back, so a
+    shared bucket may let a burst through a few tokens over; that is
+    acceptable for abuse protection and costs no lock.
+    """
+    now = time.time()
+    try:
+        cache = throttle_cache()
+        state, wait = spend(cache.get(key), capacity, period, now)
+        # An idle bucket is full again after `period`, the same as a missing one
+        cache.set(key, state, timeout=period + 1)
+        return wait
+    except Exception as e:
+        logger.warning(f'Throttle cache unavailable, using in-process buckets: {e}')
+        return local_buckets.take(key, capacity, period, now)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles views that set `throttle_scope` to a key of
+    settings.THROTTLE_BUDGETS, e.g. {'login': {'ip': '20/min', 'email':
+    '5/min'}}. Other views are not limited.
+    """
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope or not getattr(settings, 'THROTTLE_ENABLED', True):
+            return True
+        for kind, rate in getattr(settings, 'THROTTLE_BUDGETS', {}).get(scope, {}).items():
+            value = self.identify(kind, request)
+            if value is None:
+                continue
+            capacity, period = parse_rate(rate)
+            wait = take(bucket_key(scope, kind, value), capacity, period)
+            if wait:
+                # Buckets already drawn from keep the spent token: the attempt counts
+                self.retry_after = wait
+                return False
+        return True
+
+    def identify(self, kind, request):
+        if kind == 'ip':
+            return self.get_ident(request)
+        if kind == 'role':
+            user = request.user
+            return (getattr(user, 'role', None) or 'user') if user.is_authenticated else None
+        if kind == 'email':
+            # Only parses the body, which the view is about to do anyway
+            email = request.data.get('email') if hasattr(request.data, 'get') else None
+            return email.strip().lower() if isinstance(email, str) and email.strip() else None
+        raise ImproperlyConfigured(f'Unknown throttle bucket {kind!r}, expected ip, email or role.')
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,188 @@
+"""
+Resumable chunked uploads of hotel and room media.
+
+A client opens a session with the file's size and a chunk size, PUTs the
+chunks in any order (each with its sha256), retries only the ones that
+failed, and completes the session to attach the file to the model. Chunks
+are written straight to their offset in one preallocated part file, so
+nothing is held in memory and no reassembly pass is needed.
+"""
+import hashlib
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models.functions import Now
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_catalog
+from .models import Hotel, Room, UploadChunk, UploadSession
+
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+# Bytes copied from the request to disk at a time
+READ_BLOCK_SIZE = 64 * 1024
+TARGETS = {'hotel': Hotel, 'room': Room}
+
+
+def part_path(session):
+    return Path(settings.UPLOAD_SESSION_DIR) / f'{session.pk}.part'
+
+
+def owned_objects(user, target):
+    # By id: `user` may be the TokenPrincipal of a bearer token rather than a User
+    if target == 'hotel':
+        return Hotel.objects.filter(admin_id=user.pk)
+    return Room.objects.filter(hotel__admin_id=user.pk)
+
+
+def open_session(user, target, object_id, field, filename, size, chunk_size, sha256=''):
+    """
+    Start an upload to `field` of one of the user's hotels or rooms and
+    reserve the space for it on disk.
+    """
+    if not owned_objects(user, target).filter(pk=object_id).exists():
+        raise ValidationError({'object_id': f'No {target} of yours has this id.'})
+    if not 0 < size <= settings.UPLOAD_MAX_SIZE:
+        raise ValidationError({'size': f'Uploads must be between 1 byte and {settings.UPLOAD_MAX_SIZE} bytes.'})
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise ValidationError({'chunk_size': f'chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}.'})
+    session = UploadSession.objects.create(
+        user_id=user.pk, target=target, object_id=object_id, field=field,
+        filename=os.path.basename(filename), size=size, chunk_size=chunk_size, sha256=sha256.lower(),
+    )
+    path = part_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('wb') as fh:
+        # Sparse on most filesystems: blocks are only allocated as chunks arrive
+        fh.truncate(size)
+    return session
+
+
+def write_chunk(session, index, stream, length, sha256):
+    """
+    Copy chunk `index` from `stream` to its place in the part file and
+    record it. Sending a chunk again overwrites it, so retries are safe.
+    """
+    if session.status != 'OPEN':
+        raise ValidationError('This upload is already complete.')
+    if not 0 <= index < session.chunk_count:
+        raise ValidationError({'index': f'Chunks are numbered 0 to {session.chunk_count - 1}.'})
+    offset = index * session.chunk_size
+    expected = min(session.chunk_size, session.size - offset)
+    if length != expected:
+        raise ValidationError(f'Chunk {index} must be {expected} bytes, got {length}.')
+    if not sha256:
+        raise ValidationError('The chunk checksum (X-Chunk-Sha256 header) is required.')
+
+    digest = hashlib.sha256()
+    try:
+        with part_path(session).open('r+b') as fh:
+            fh.seek(offset)
+            remaining = expected
+            while remaining:
+                block = stream.read(min(READ_BLOCK_SIZE, remaining))
+                if not block:
+                    raise ValidationError(f'Chunk {index} ended after {expected - remaining} bytes.')
+                digest.update(block)
+                fh.write(block)
+                remaining -= len(block)
+        if digest.hexdigest() != sha256.lower():
+            raise ValidationError(f'Chunk {index} does not match its checksum.')
+    except Exception:
+        # The bytes in place are no longer a good copy, even if an earlier delivery was:
+        # the chunk counts as missing until it is sent again
+        UploadChunk.objects.filter(session=session, index=index).delete()
+        raise
+
+    # One upsert, whether this is the first delivery or a retry
+    UploadChunk.objects.bulk_create(
+        [UploadChunk(session=session, index=index, size=expected, sha256=digest.hexdigest())],
+        update_conflicts=True, unique_fields=['session', 'index'], update_fields=['size', 'sha256', 'received_at'],
+    )
+
+
+def missing_chunks(session):
+    received = set(session.chunks.values_list('index', flat=True))
+    return [index for index in range(session.chunk_count) if index not in received]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_session(session):
+    """
+    Check that every chunk (and the whole-file checksum, if one was given)
+    arrived, then move the part file into the model's storage and point
+    the field at it.
+    """
+    missing = missing_chunks(session)
+    if missing:
+        raise ValidationError({'missing_chunks': missing})
+    # Guarded like a booking transition: only one request can complete it
+    claimed = UploadSession.objects.filter(pk=session.pk, status='OPEN').update(
+        status='COMPLETE', completed_at=Now(),
+    )
+    if not claimed:
+        raise ValidationError('This upload is already complete.')
+    try:
+        if session.sha256 and file_sha256(part_path(session)) != session.sha256:
+            raise ValidationError('The file does not match its checksum.')
+        name = attach(session)
+    except Exception:
+        UploadSession.objects.filter(pk=session.pk).update(status='OPEN', completed_at=None)
+        raise
+    session.status = 'COMPLETE'
+    return name
+
+
+def attach(session):
+    model = TARGETS[session.target]
+    instance = model.objects.get(pk=session.object_id)
+    field = model._meta.get_field(session.field)
+    storage = field.storage
+    name = field.generate_filename(instance, session.filename)
+    try:
+        name = storage.get_available_name(name, max_length=field.max_length)
+        destination = storage.path(name)
+    except NotImplementedError:
+        # Remote storage: copy it up in the storage's own chunks
+        with part_path(session).open('rb') as fh:
+            name = storage.save(name, File(fh, name=session.filename), max_length=field.max_length)
+        part_path(session).unlink()
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # A rename when both directories share a filesystem
+        shutil.move(part_path(session), destination)
+
+    changes = {session.field: name}
+    if session.field == 'image':
+        changes['image_variants'] = {}
+    model.objects.filter(pk=instance.pk).update(**changes)
+    invalidate_catalog()
+    return name
+
+
+def discard_session(session):
+    part_path(session).unlink(missing_ok=True)
+    session.delete()
+
+
+def purge_stale_sessions(max_age=timedelta(days=1)):
+    """
+    Drop open uploads nobody has completed within `max_age`, and their part
+    files. Returns the number removed.
+    """
+    stale = list(UploadSession.objects.filter(status='OPEN', created_at__lt=timezone.now() - max_age))
+    for session in stale:
+        discard_session(session)
+    return len(stale)
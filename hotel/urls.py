@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'hotels', views.HotelViewSet)
@@ -9,6 +9,7 @@ router.register(r'room-categories', views.RoomCategoryViewSet)
 router.register(r'finance_reports', views.FinanceReportViewSet)
 router.register(r'rooms', views.RoomViewSet)
 router.register(r'bookings', views.BookingViewSet)
+router.register(r'uploads', views.UploadSessionViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -25,8 +26,16 @@ urlpatterns = [
     path('approve-hotel/<int:pk>/', views.HotelViewSet.as_view({'post': 'approve'}), name='approve-hotel'),
     path('decline-hotel/<int:pk>/', views.HotelViewSet.as_view({'post': 'decline'}), name='decline-hotel'),
     path('approved-hotels/', views.ApprovedHotelsView.as_view(), name='approved-hotels'),
+    path('approved-hotels/facets/', views.ApprovedHotelFacetsView.as_view(), name='approved-hotel-facets'),
+    path('approved-hotels/search/', views.HotelSearchView.as_view(), name='hotel-search'),
     path('approved-hotels/<int:pk>/', views.ApprovedHotelDetailView.as_view(), name='approved-hotel-detail'),
     path('available-rooms/', views.AvailableRoomsView.as_view(), name='available-rooms'),
+    path('outbox-status/', views.OutboxStatusView.as_view(), name='outbox-status'),
     path('send-test-email/', views.send_test_email, name='send_test_email'),
     path('delete-account/', views.DeleteAccountView.as_view(), name='delete-account'),  
+    # Async read endpoints for the ASGI deployment
+    path('async/approved-hotels/', async_views.approved_hotels, name='async-approved-hotels'),
+    path('async/approved-hotels/<int:pk>/', async_views.approved_hotel_detail, name='async-approved-hotel-detail'),
+    path('async/available-rooms/', async_views.available_rooms, name='async-available-rooms'),
+    path('async/bookings/', async_views.bookings, name='async-bookings'),
 ]
\ No newline at end of file
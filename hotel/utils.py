@@ -1,16 +1,22 @@
+import re
 import secrets
 import logging
-from django.core.mail import EmailMessage
+import threading
+import time
+import requests
 from django.conf import settings
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
+from django.utils import timezone
+from google.auth import jwt as google_jwt
 from django.contrib.auth import authenticate
 from rest_framework.exceptions import AuthenticationFailed
 from .models import User, OneTimePassword
+from .outbox import enqueue_email
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+
 def generate_otp():
     otp = ''.join([str(secrets.randbelow(10)) for _ in range(6)])
     logger.info(f"Generated OTP: {otp}")
@@ -43,39 +49,112 @@ def sendOtpEmail(email):
     """
     from_email = settings.DEFAULT_FROM_EMAIL
 
+    # A new code restarts the clock, or a resent code could arrive already expired
     OneTimePassword.objects.update_or_create(
         user=user,
-        defaults={'code': otp}
+        defaults={'code': otp, 'created_at': timezone.now()}
     )
 
-    try:
-        send_email = EmailMessage(subject=subject, body=email_body, from_email=from_email, to=[email])
-        send_email.send(fail_silently=False)
-        logger.info(f"OTP email sent to {email}")
-        return True
-    except Exception as e:
-        logger.error(f"Error sending email to {email}: {str(e)}")
-        return False
+    # Delivered by the outbox worker (manage.py run_outbox_worker)
+    enqueue_email(subject=subject, body=email_body, from_email=from_email, to=[email])
+    logger.info(f"OTP email queued for {email}")
+    return True
 
-def send_email(data):
-    try:
-        email = EmailMessage(
-            subject=data['email_subject'],
-            body=data['email_body'],
-            to=[data['to_email']],
-            from_email=settings.EMAIL_HOST_USER
+def purge_expired_otps(batch_size=1000, pause=0):
+    """
+    Delete expired one-time passwords, `batch_size` rows per statement
+    (sleeping `pause` seconds in between) so the purge never holds long
+    locks. Returns the number deleted.
+    """
+    cutoff = timezone.now() - OneTimePassword.LIFETIME
+    deleted = 0
+    while True:
+        # Oldest first, from otp_created_idx
+        batch = list(
+            OneTimePassword.objects.filter(created_at__lt=cutoff).order_by('created_at')
+            .values_list('pk', flat=True)[:batch_size]
         )
-        email.send(fail_silently=False)
-        return True
-    except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
-        return False
+        if not batch:
+            return deleted
+        deleted += OneTimePassword.objects.filter(pk__in=batch).delete()[0]
+        if len(batch) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+def send_email(data):
+    enqueue_email(
+        subject=data['email_subject'],
+        body=data['email_body'],
+        to=[data['to_email']],
+        from_email=settings.EMAIL_HOST_USER
+    )
+    return True
+
+class GoogleCertCache():
+    """
+    Google's OAuth2 signing certificates, fetched over a shared HTTP session
+    and kept for as long as the response's Cache-Control max-age allows, so
+    verifying an ID token is normally a local signature check.
+    """
+    DEFAULT_TTL = 300
+    # Unknown key ids trigger a refetch (Google rotated its keys), but not
+    # more often than this, so junk tokens can't make us hammer Google
+    MIN_REFRESH_INTERVAL = 60
+
+    def __init__(self, url=GOOGLE_CERTS_URL, fetch=None):
+        self.url = url
+        self._fetch = fetch or self._fetch_from_google
+        self._session = None
+        self._lock = threading.Lock()
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = None
+
+    def _fetch_from_google(self):
+        if self._session is None:
+            self._session = requests.Session()
+        response = self._session.get(self.url, timeout=5)
+        response.raise_for_status()
+        return response.json(), response.headers
+
+    def _ttl(self, headers):
+        match = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+        if not match:
+            return self.DEFAULT_TTL
+        return max(int(match.group(1)) - int(headers.get('Age', 0) or 0), 0)
+
+    def _refresh(self, now):
+        try:
+            certs, headers = self._fetch()
+        except Exception as e:
+            if self._certs:
+                # Keep verifying with the last known keys rather than failing every login
+                logger.error(f"Could not refresh Google certificates, using cached ones: {str(e)}")
+                self._expires_at = now + self.MIN_REFRESH_INTERVAL
+                return
+            logger.error(f"Could not fetch Google certificates: {str(e)}")
+            raise AuthenticationFailed('Unable to verify Google token, try again later')
+        self._certs = certs
+        self._fetched_at = now
+        self._expires_at = now + self._ttl(headers)
+
+    def get(self, key_id=None):
+        with self._lock:
+            now = time.monotonic()
+            unknown_key = key_id is not None and key_id not in self._certs
+            may_refetch = self._fetched_at is None or now - self._fetched_at >= self.MIN_REFRESH_INTERVAL
+            if now >= self._expires_at or (unknown_key and may_refetch):
+                self._refresh(now)
+            return self._certs
+
+google_certs = GoogleCertCache()
 
 class Google():
     @staticmethod
     def validate_google_token(token):
         try:
-            idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), settings.GOOGLE_CLIENT_ID)
+            key_id = google_jwt.decode_header(token).get('kid')
+            idinfo = google_jwt.decode(token, certs=google_certs.get(key_id), audience=settings.GOOGLE_CLIENT_ID)
             if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
                 raise ValueError('Wrong issuer.')
             return idinfo
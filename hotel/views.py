@@ -1,22 +1,44 @@
-from rest_framework import viewsets, status, generics
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from rest_framework import viewsets, status, generics, mixins
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.views.decorators.csrf import csrf_exempt
 from django.core.mail import EmailMessage
 from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import smart_str, DjangoUnicodeDecodeError
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.shortcuts import get_object_or_404
 
-from .permissions import IsSystemAdmin, IsHotelAdmin
+from .permissions import HasHotelAdminRole, IsSystemAdmin, IsHotelAdmin
+from .authentication import get_user_instance
+from .querybudget import QueryBudgetMixin
 from .utils import sendOtpEmail
+from .cache import (
+    CATALOG_VERSION_KEY, BOOKINGS_VERSION_KEY, cached_catalog, hotel_bookings_key, invalidate_catalog,
+    touch_bookings, user_bookings_key,
+)
+from .conditional import ConditionalGetMixin
+from .fieldsets import SparseFieldsetViewMixin, cache_suffix
+from .rows import RowListViewMixin
+from .outbox import queue_depth
+from .finance import record_revenue, period_bounds, aware_midnight
+from .bookings import transition
+from .search import search_hotels
+from .filters import HotelFilter, RoomFilter, facet_counts
+from .uploads import complete_session, discard_session, missing_chunks, write_chunk
 from .models import (
     Hotel,
     Review,
@@ -25,7 +47,9 @@ from .models import (
     Booking,
     User,
     OneTimePassword,
-    RoomCategory
+    RoomCategory,
+    DailyRevenue,
+    UploadSession
 )
 from .serializers import (
     GoogleSignInSerializer,
@@ -36,19 +60,23 @@ from .serializers import (
     UserRegistrationSerializer,
     ReviewSerializer,
     FinanceReportSerializer,
+    DailyRevenueSerializer,
     RoomSerializer,
     BookingSerializer,
+    GroupBookingSerializer,
     RoomCategorySerializer,
     LoginSerializer,
     DeleteAccountSerializer,
-    VerifyUserEmailSerializer
+    VerifyUserEmailSerializer,
+    UploadSessionSerializer
 )
 
 
 
-class HotelViewSet(viewsets.ModelViewSet):
+class HotelViewSet(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Hotel.objects.all()
     serializer_class = HotelSerializer
+    query_budgets = {'list': 2, 'retrieve': 2, 'pending': 2, 'approve': 3, 'decline': 3}
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -60,7 +88,20 @@ class HotelViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         # Assign admin based on the authenticated user
         admin = self.request.user
-        serializer.save(admin=admin)
+        serializer.save(admin_id=admin.pk)
+        invalidate_catalog()
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_catalog()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Bookings go with the hotel's rooms: their owners' lists change too
+            user_ids = booked_user_ids(room__hotel_id=instance.pk)
+            instance.delete()
+        invalidate_catalog()
+        touch_bookings(user_ids, [instance.pk])
 
     @action(detail=True, methods=['post'], permission_classes=[IsSystemAdmin])
     def approve(self, request, pk=None):
@@ -68,6 +109,7 @@ class HotelViewSet(viewsets.ModelViewSet):
         hotel.is_approved = True
         hotel.is_declined = False
         hotel.save()
+        invalidate_catalog()
         return Response({'status': 'hotel approved'})
 
     @action(detail=True, methods=['post'], permission_classes=[IsSystemAdmin])
@@ -76,79 +118,212 @@ class HotelViewSet(viewsets.ModelViewSet):
         hotel.is_approved = False
         hotel.is_declined = True
         hotel.save()
+        invalidate_catalog()
         return Response({'status': 'hotel declined'}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'], permission_classes=[IsSystemAdmin])
     def pending(self, request):
         pending_hotels = Hotel.objects.filter(is_approved=False, is_declined=False)
-        serializer = self.get_serializer(pending_hotels, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-class ApprovedHotelsView(generics.ListAPIView):
+        page = self.paginate_queryset(pending_hotels)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+def booked_user_ids(**lookup):
+    # Owners of the bookings a cascading delete is about to remove
+    return list(Booking.objects.filter(**lookup).values_list('user_id', flat=True).distinct())
+
+def approved_catalog():
+    # Approved hotels with at least one room; EXISTS avoids a join and DISTINCT
+    with_rooms = Exists(Room.objects.filter(hotel_id=OuterRef('pk')))
+    return Hotel.objects.filter(with_rooms, is_approved=True, is_declined=False)
+
+def catalog_version_keys(params):
+    # A stay filter keeps only hotels with a room free on those dates, so bookings anywhere can change the result
+    if params.get('check_in') or params.get('check_out'):
+        return [CATALOG_VERSION_KEY, BOOKINGS_VERSION_KEY]
+    return [CATALOG_VERSION_KEY]
+
+class CatalogConditionalMixin(ConditionalGetMixin):
+    def version_keys(self, request):
+        return catalog_version_keys(request.query_params)
+
+class ApprovedHotelsView(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, CatalogConditionalMixin,
+                         generics.ListAPIView):
     serializer_class = HotelSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {'get': 2}
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = HotelFilter
+    # Only orderings an index can serve (hotel_created_idx, hotel_name_idx)
+    ordering_fields = ['created_at', 'name']
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        queryset = Hotel.objects.filter(is_approved=True, is_declined=False)
-        # Optionally, filter only hotels with rooms if needed
-        queryset = queryset.filter(rooms__isnull=False).distinct()
-        return queryset
+        return approved_catalog()
 
     def list(self, request, *args, **kwargs):
+        # Cursor, page size, filters and ordering live in the URL, so it identifies the page
+        data = cached_catalog(
+            f'approved:{request.build_absolute_uri()}', self.build_page, catalog_version_keys(request.query_params),
+        )
+        return Response(data)
+
+    def build_page(self):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serializer.data).data
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return serializer.data
 
-class ApprovedHotelDetailView(generics.RetrieveAPIView):
+class ApprovedHotelFacetsView(QueryBudgetMixin, CatalogConditionalMixin, GenericAPIView):
+    """
+    Hotel counts per price band and per room category for the approved
+    catalog, narrowed by the same filters as ApprovedHotelsView.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budgets = {'get': 1}
+
+    def get(self, request):
+        filterset = HotelFilter(request.query_params, queryset=approved_catalog(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        def build():
+            # Count only the matching rooms, not every room of a matching hotel
+            return facet_counts(filterset.rooms().filter(hotel__in=filterset.qs.values('pk')))
+
+        return Response(cached_catalog(
+            f'facets:{request.build_absolute_uri()}', build, catalog_version_keys(request.query_params),
+        ))
+
+class HotelSearchView(QueryBudgetMixin, CatalogConditionalMixin, GenericAPIView):
+    serializer_class = HotelSerializer
+    permission_classes = [IsAuthenticated]
+    # Word matches, then on SQLite the vocabulary and corrected matches, then the rows
+    query_budgets = {'get': 4}
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'A search term is required.'})
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'limit must be a number.'})
+        data = cached_catalog(
+            f'search:{limit}:{query.lower()}{cache_suffix(request)}',
+            lambda: self.get_serializer(search_hotels(query, limit), many=True).data,
+        )
+        return Response({'results': data})
+
+class ApprovedHotelDetailView(QueryBudgetMixin, SparseFieldsetViewMixin, CatalogConditionalMixin,
+                              generics.RetrieveAPIView):
     queryset = Hotel.objects.filter(is_approved=True, is_declined=False)
     serializer_class = HotelSerializer
     permission_classes = [IsAuthenticated, IsHotelAdmin]
+    query_budgets = {'get': 2}
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        key = f'hotel:{kwargs["pk"]}{cache_suffix(request)}'
+        data = cached_catalog(key, lambda: self.get_serializer(self.get_object()).data)
+        return Response(data)
 
-class RoomCategoryViewSet(viewsets.ModelViewSet):
+class RoomCategoryViewSet(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = RoomCategory.objects.all()
     serializer_class = RoomCategorySerializer
     permission_classes = [IsAuthenticated, IsHotelAdmin]
+    query_budgets = {'list': 2, 'retrieve': 2}
 
     def get_queryset(self):
         user = self.request.user
         if user.is_hotel_admin:
-            return RoomCategory.objects.filter(hotel__admin=user, hotel__is_approved=True)
+            # IsHotelAdmin reads the hotel of each object
+            return RoomCategory.objects.filter(
+                hotel__admin_id=user.pk, hotel__is_approved=True
+            ).select_related('hotel')
         return RoomCategory.objects.none()
 
-class AvailableRoomsView(generics.ListAPIView):
+    # Prices and category names feed the catalog filters and facets
+    def perform_create(self, serializer):
+        serializer.save()
+        invalidate_catalog()
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_catalog()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Its rooms, and their bookings, go with it
+            user_ids = booked_user_ids(room__category_id=instance.pk)
+            instance.delete()
+        invalidate_catalog()
+        touch_bookings(user_ids, [instance.hotel_id])
+
+def stay_dates(params):
+    # Without explicit dates, report rooms that are free tonight
+    try:
+        check_in = parse_date(params['check_in']) if 'check_in' in params else timezone.localdate()
+        check_out = parse_date(params['check_out']) if 'check_out' in params else check_in + timedelta(days=1)
+    except ValueError:
+        check_in = check_out = None
+    if check_in is None or check_out is None:
+        raise ValidationError({'detail': 'check_in and check_out must be dates in YYYY-MM-DD format.'})
+    if check_in >= check_out:
+        raise ValidationError({'detail': 'check_out must be after check_in.'})
+    return check_in, check_out
+
+def stay_validator_state(params):
+    # The stay dates are part of the response but, for "tonight", not of the URL
+    check_in, check_out = stay_dates(params)
+    not_before = 0 if 'check_in' in params else int(aware_midnight(check_in).timestamp())
+    return (check_in.isoformat(), check_out.isoformat()), not_before
+
+class AvailableRoomsView(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, ConditionalGetMixin,
+                         generics.ListAPIView):
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {'get': 2}
+
+    def version_keys(self, request):
+        # Rooms come from the catalog, their availability from the hotel's bookings
+        hotel_id = request.query_params.get('hotel_id', '')
+        if not hotel_id.isdigit():
+            return None
+        return [CATALOG_VERSION_KEY, hotel_bookings_key(int(hotel_id))]
+
+    def validator_state(self, request):
+        return stay_validator_state(request.query_params)
 
     def get_queryset(self):
         hotel_id = self.request.query_params.get('hotel_id')
-        queryset = Room.objects.filter(hotel_id=hotel_id, is_available=True)
+        check_in, check_out = self.get_stay_dates()
+        queryset = Room.objects.filter(hotel_id=hotel_id).available_between(check_in, check_out)
         return queryset
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    def get_stay_dates(self):
+        return stay_dates(self.request.query_params)
+
+class ReviewViewSet(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {'list': 2, 'retrieve': 2, 'respond': 3}
 
     def get_queryset(self):
         if self.request.user.is_hotel_admin:
-            return Review.objects.filter(hotel__admin=self.request.user)
+            return Review.objects.filter(hotel__admin_id=self.request.user.pk).select_related('hotel')
         elif self.request.user.is_client:
-            return Review.objects.filter(user=self.request.user)
+            return Review.objects.filter(client_id=self.request.user.pk)
         else:
             return Review.objects.none()
 
     @action(detail=True, methods=['post'])
     def respond(self, request, pk=None):
         review = self.get_object()
-        if request.user.is_hotel_admin and review.hotel.admin != request.user:
+        if request.user.is_hotel_admin and review.hotel.admin_id != request.user.pk:
             return Response({'status': 'not authorized'}, status=status.HTTP_403_FORBIDDEN)
         response_text = request.data.get('response', '')
         review.response = response_text
@@ -156,91 +331,178 @@ class ReviewViewSet(viewsets.ModelViewSet):
         review.save()
         return Response({'status': 'response added'})
 
-class FinanceReportViewSet(viewsets.ModelViewSet):
+class FinanceReportViewSet(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = FinanceReport.objects.all()
     serializer_class = FinanceReportSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {'list': 2, 'filter_by_year_month': 2, 'revenue': 2}
 
     def get_queryset(self):
         if self.request.user.is_hotel_admin:
-            hotel = self.request.user.hotel
-            return FinanceReport.objects.filter(hotel=hotel)
+            return FinanceReport.objects.filter(hotel__admin_id=self.request.user.pk)
         else:
             return FinanceReport.objects.none()
 
+    def get_period(self):
+        try:
+            year = int(self.request.query_params['year'])
+            month = self.request.query_params.get('month')
+            month = int(month) if month else None
+            return period_bounds(year, month)
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': 'year (and optionally month 1-12) must be given as numbers.'})
+
     @action(detail=False, methods=['get'])
     def filter_by_year_month(self, request):
         if not self.request.user.is_hotel_admin:
             return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
-        hotel = self.request.user.hotel
-        year = request.query_params.get('year')
-        month = request.query_params.get('month')
-
-        queryset = FinanceReport.objects.filter(hotel=hotel)
-
-        if year:
-            queryset = queryset.filter(created_at__year=year)
-        if month:
-            queryset = queryset.filter(created_at__month=month)
+        # Range predicates instead of __year/__month so the query can use an index
+        start, end = self.get_period()
+        queryset = self.get_queryset().filter(
+            created_at__gte=aware_midnight(start), created_at__lt=aware_midnight(end)
+        )
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-class RoomViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def revenue(self, request):
+        if not self.request.user.is_hotel_admin:
+            return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        # Reads at most one pre-aggregated row per hotel per day in the period
+        start, end = self.get_period()
+        rows = DailyRevenue.objects.filter(
+            hotel__admin_id=request.user.pk, day__gte=start, day__lt=end
+        ).order_by('day', 'hotel_id')
+        hotel_id = request.query_params.get('hotel_id')
+        if hotel_id:
+            if not hotel_id.isdigit():
+                raise ValidationError({'detail': 'hotel_id must be given as a number.'})
+            rows = rows.filter(hotel_id=int(hotel_id))
+        days = DailyRevenueSerializer(rows, many=True).data
+        return Response({
+            'start': start,
+            'end': end,
+            'rooms_paid': sum(row.rooms_paid for row in rows),
+            'money_earned': str(sum((row.money_earned for row in rows), Decimal('0.00'))),
+            'rooms_cancelled': sum(row.rooms_cancelled for row in rows),
+            'days': days,
+        })
+
+class RoomViewSet(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated, IsHotelAdmin]
+    query_budgets = {'list': 2, 'retrieve': 2}
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = RoomFilter
+    ordering_fields = ['created_at']
+    ordering = ('-created_at', '-id')
 
     def perform_create(self, serializer):
         hotel = serializer.validated_data['hotel']
         if hotel.is_approved:
             serializer.save()
+            # A hotel's first room puts it into the approved catalog
+            invalidate_catalog()
         else:
             raise ValidationError("Only approved hotels can register rooms.")
 
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_catalog()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            user_ids = booked_user_ids(room_id=instance.pk)
+            instance.delete()
+        invalidate_catalog()
+        touch_bookings(user_ids, [instance.hotel_id])
+
     def get_queryset(self):
         user = self.request.user
         if user.is_hotel_admin:
-            return Room.objects.filter(hotel__admin=user, hotel__is_approved=True)
+            # IsHotelAdmin reads the hotel of each object
+            return Room.objects.filter(hotel__admin_id=user.pk, hotel__is_approved=True).select_related('hotel')
         return Room.objects.none()
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(QueryBudgetMixin, RowListViewMixin, SparseFieldsetViewMixin, ConditionalGetMixin,
+                     viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {'list': 2, 'retrieve': 2, 'pay': 8, 'cancel': 8, 'checkout': 2}
+
+    def version_keys(self, request):
+        if self.action not in ['list', 'retrieve']:
+            return None
+        return [BOOKINGS_VERSION_KEY] if request.user.is_staff else [user_bookings_key(request.user.pk)]
 
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Booking.objects.all()
-        return Booking.objects.filter(user=self.request.user)
+            queryset = Booking.objects.all()
+        else:
+            queryset = Booking.objects.filter(user_id=self.request.user.pk)
+        if self.action in ['pay', 'cancel', 'checkout']:
+            # Pay and cancel read the room's price and hotel; every transition reads its hotel
+            queryset = queryset.select_related('room__category')
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        hotel_id = instance.room.hotel_id
+        instance.delete()
+        touch_bookings([instance.user_id], [hotel_id])
+
+    @action(detail=False, methods=['post'])
+    def group(self, request):
+        serializer = GroupBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save(user=request.user)
+        return Response(self.get_serializer(bookings, many=True).data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'])
     def pay(self, request, pk=None):
         booking = self.get_object()
-        payment_amount = request.data.get('payment_amount')
-        if payment_amount and float(payment_amount) >= booking.room.category.price:
-            booking.payment_status = 'PAID'
-            booking.save()
+        if booking.payment_status != 'RESERVED':
+            return Response({'status': 'booking cannot be paid'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            payment_amount = Decimal(str(request.data.get('payment_amount')))
+        except InvalidOperation:
+            payment_amount = None
+        if payment_amount is not None and payment_amount.is_finite() and payment_amount >= booking.room.category.price:
+            with transaction.atomic():
+                transition(booking, 'PAID')
+                record_revenue(booking.room.hotel_id, timezone.localdate(), rooms_paid=1, money_earned=payment_amount)
             return Response({'status': 'payment successful'}, status=status.HTTP_200_OK)
         return Response({'status': 'insufficient payment amount'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         booking = self.get_object()
-        if booking.payment_status == 'RESERVED' and booking.user == request.user:
-            booking.payment_status = 'CANCELLED'
-            booking.save()
-            booking.room.is_available = True
-            booking.room.save()
+        if booking.payment_status == 'RESERVED' and booking.user_id == request.user.pk:
+            with transaction.atomic():
+                transition(booking, 'CANCELLED')
+                record_revenue(booking.room.hotel_id, timezone.localdate(), rooms_cancelled=1)
             return Response({'status': 'reservation cancelled'}, status=status.HTTP_200_OK)
         return Response({'status': 'cancellation not allowed'}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'])
+    def checkout(self, request, pk=None):
+        booking = self.get_object()
+        if booking.payment_status != 'PAID':
+            return Response({'status': 'only paid bookings can be checked out'}, status=status.HTTP_400_BAD_REQUEST)
+        transition(booking, 'CHECKED_OUT', is_checked_out=True)
+        return Response({'status': 'checked out'}, status=status.HTTP_200_OK)
+
 class RegisterUserView(GenericAPIView):
     serializer_class = UserRegistrationSerializer
+    throttle_scope = 'register'
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid(raise_exception=True):
@@ -255,27 +517,34 @@ class RegisterUserView(GenericAPIView):
 
 class VerifyUserEmail(GenericAPIView):
     serializer_class = VerifyUserEmailSerializer
+    throttle_scope = 'verify-email'
+
     def post(self, request):
+        email = request.data.get('email')
         otp_code = request.data.get('otp')
-        
-        if not otp_code:
-            return Response({'status': 'OTP code is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
+        if not email or not otp_code:
+            return Response({'status': 'Email and OTP code are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One lookup through the user's email and otp_user_code_idx
         try:
-            user_code = get_object_or_404(OneTimePassword, code=otp_code)
-            user = user_code.user
-            if not user.is_verified:
-                user.is_verified = True
-                user.save()
-                return Response({'status': 'Email verified successfully'}, status=status.HTTP_200_OK)
-            return Response({'status': 'Email already verified'}, status=status.HTTP_200_OK)
-        
+            user_code = OneTimePassword.objects.select_related('user').get(user__email=email, code=str(otp_code))
         except OneTimePassword.DoesNotExist:
             return Response({'status': 'Invalid or missing OTP code'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            return Response({'status': 'An error occurred', 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not user_code.is_valid():
+            return Response({'status': 'OTP code has expired'}, status=status.HTTP_400_BAD_REQUEST)
+        user = user_code.user
+        if user.is_verified:
+            return Response({'status': 'Email already verified'}, status=status.HTTP_200_OK)
+        with transaction.atomic():
+            user.is_verified = True
+            user.save(update_fields=['is_verified'])
+            # A code verifies once
+            user_code.delete()
+        return Response({'status': 'Email verified successfully'}, status=status.HTTP_200_OK)
+
 class LoginUserView(GenericAPIView):
     serializer_class = LoginSerializer
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data, context={'request': request})
@@ -300,6 +569,7 @@ class TestAuthenticationView(GenericAPIView):
 
 class PasswordResetRequest(GenericAPIView):
     serializer_class = PasswordResetSerializer
+    throttle_scope = 'password-reset'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data, context={'request': request})
@@ -327,6 +597,7 @@ class SetNewPassword(GenericAPIView):
 
 class GoogleSignInView(GenericAPIView):
     serializer_class = GoogleSignInSerializer
+    throttle_scope = 'google'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -345,6 +616,54 @@ class LogoutUserView(GenericAPIView):
         serializer.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class OutboxStatusView(GenericAPIView):
+    permission_classes = [IsSystemAdmin]
+
+    def get(self, request):
+        return Response(queue_depth(), status=status.HTTP_200_OK)
+
+class UploadSessionViewSet(QueryBudgetMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads of hotel and room images and videos (hotel/uploads.py):
+    POST to open a session, PUT each chunk's raw bytes to chunks/<index>/
+    with an X-Chunk-Sha256 header, then POST complete/.
+    """
+    serializer_class = UploadSessionSerializer
+    # Sessions are scoped to their user in get_queryset; they have no hotel to check
+    permission_classes = [IsAuthenticated, HasHotelAdminRole]
+    query_budgets = {'create': 3, 'retrieve': 2, 'destroy': 4, 'chunk': 2, 'complete': 6}
+
+    def get_queryset(self):
+        queryset = UploadSession.objects.filter(user_id=self.request.user.pk)
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('chunks')
+        return queryset
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        session = self.get_object()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        # The body is read from the stream as it is written, never parsed into request.data
+        write_chunk(session, int(index), request.stream, length, request.headers.get('X-Chunk-Sha256', ''))
+        return Response({'index': int(index), 'size': length}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        missing = missing_chunks(session)
+        if missing:
+            return Response({'detail': 'Some chunks have not been received.', 'missing_chunks': missing},
+                            status=status.HTTP_409_CONFLICT)
+        name = complete_session(session)
+        return Response({'status': session.status, 'name': name}, status=status.HTTP_200_OK)
+
+    def perform_destroy(self, instance):
+        discard_session(instance)
+
 class PendingHotelsView(generics.ListAPIView):
     serializer_class = HotelSerializer
     permission_classes = [IsSystemAdmin]
@@ -377,7 +696,7 @@ class DeleteAccountView(GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        user = request.user
+        user = get_user_instance(request.user)
         user.delete()
         
         return Response({
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'django_filters',
     'hotel',
     'corsheaders',
     'whitenoise.runserver_nostatic',  # Add this for static files in production
@@ -89,14 +90,74 @@ DATABASES = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'hotel.authentication.ActiveTokenAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'hotel.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 50,
+    # Only acts on views that declare a filterset_class (see hotel/filters.py)
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # orjson-backed JSON with the same output as DRF's (see hotel/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'hotel.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Only acts on views that set a throttle_scope (see THROTTLE_BUDGETS)
+    'DEFAULT_THROTTLE_CLASSES': ['hotel.throttling.TokenBucketThrottle'],
+    # Reverse proxies in front of the app: throttles only trust X-Forwarded-For
+    # entries they added, with 0 the peer address is the client
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+    'DEFAULT_PARSER_CLASSES': [
+        'hotel.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Caches. The catalog cache backs the approved-hotel listings; use a
+# file-based (or shared) backend when running several worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': env('CATALOG_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('CATALOG_CACHE_LOCATION', default='catalog'),
+        'TIMEOUT': 3600,
+    },
+    # Rate-limit buckets; must be shared by all workers (DatabaseCache works too)
+    'throttle': {
+        'BACKEND': env('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('THROTTLE_CACHE_LOCATION', default='throttle'),
+    },
+}
+
+# Views over their query budget (hotel.querybudget) raise when enforced, log otherwise
+QUERY_BUDGET_ENFORCE = DEBUG
+
+# Token buckets for the expensive auth endpoints (hotel/throttling.py): per
+# client IP and per email in the request. A 'role' bucket, shared by every
+# signed-in caller of a role, never applies to anonymous callers. Views opt
+# in with `throttle_scope`.
+THROTTLE_BUDGETS = {
+    'login': {'ip': '20/min', 'email': '5/min'},
+    'verify-email': {'ip': '10/min', 'email': '5/min'},
+    'register': {'ip': '10/hour', 'email': '3/hour'},
+    'password-reset': {'ip': '10/hour', 'email': '3/hour'},
+    'google': {'ip': '30/min'},
+}
+THROTTLE_ENABLED = env.bool('THROTTLE_ENABLED', default=True)
+
+# Whether a token's user still exists and is active is cached this many
+# seconds (hotel/authentication.py); saving or deleting a user updates it
+AUTH_CACHE_ALIAS = 'throttle'
+ACTIVE_USER_CACHE_TTL = 60
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Requests are authorised from token claims; the user row is loaded lazily
+    "TOKEN_USER_CLASS": "hotel.authentication.TokenPrincipal",
 }
 
 AUTH_USER_MODEL = "hotel.User"
@@ -128,6 +189,18 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploaded images and videos; image variants live under */variants/ (see hotel/media.py)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+# Internal nginx location aliased to MEDIA_ROOT (e.g. '/protected-media/'). When set,
+# /media/ responses carry X-Accel-Redirect and nginx sends the file itself.
+MEDIA_ACCEL_REDIRECT = env('MEDIA_ACCEL_REDIRECT', default='')
+
+# Chunked uploads (hotel/uploads.py): part files are kept outside MEDIA_ROOT until
+# complete, ideally on the same filesystem so finishing an upload is a rename
+UPLOAD_SESSION_DIR = env('UPLOAD_SESSION_DIR', default=str(BASE_DIR / 'upload_sessions'))
+UPLOAD_MAX_SIZE = env.int('UPLOAD_MAX_SIZE', default=2 * 1024 ** 3)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -140,6 +213,11 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = env('EMAIL_HOST_USER')
 
+# Outgoing mail is queued in the outbox and sent by `manage.py run_outbox_worker`
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 30  # seconds, doubled after every failed attempt
+
 # Google OAuth configuration
 GOOGLE_CLIENT_ID = env('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = env('GOOGLE_CLIENT_SECRET')
@@ -1,7 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
+
+from hotel.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('hotel.urls')),
+    re_path(r'^media/(?P<path>.+)$', serve_media, name='media'),
 ]